@@ -101,8 +101,7 @@ class ChatApp {
         this.showLoading();
 
         try {
-            const response = await this.callAPI(message);
-            this.addMessage(response, 'assistant');
+            await this.streamAPI(message);
         } catch (error) {
             console.error('Error sending message:', error);
             this.addMessage('Lo siento, hubo un error al procesar tu mensaje. Por favor, intenta de nuevo.', 'assistant');
@@ -157,6 +156,118 @@ class ChatApp {
         return data.response || 'No se recibió respuesta del servidor.';
     }
 
+    // Consume /api/chat/stream (Server-Sent Events) y va renderizando la respuesta de a tokens.
+    // Si el backend no tiene el endpoint de streaming, vuelve al /api/chat clasico.
+    async streamAPI(message) {
+        const startTime = Date.now();
+
+        this.logClientEvent('message_sent', {
+            message: message,
+            timestamp: new Date().toISOString(),
+            streaming: true
+        });
+
+        const response = await fetch('/api/chat/stream', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+                'X-Session-ID': this.sessionId
+            },
+            body: JSON.stringify({ message })
+        });
+
+        if (!response.ok || !response.body) {
+            this.logClientEvent('stream_unavailable', {
+                status: response.status,
+                message: message
+            });
+            const text = await this.callAPI(message);
+            this.addMessage(text, 'assistant');
+            return;
+        }
+
+        const stream = { textElement: null, historyEntry: null, text: '', firstTokenTime: null };
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+
+            // Los eventos SSE vienen separados por una linea en blanco
+            let separator;
+            while ((separator = buffer.indexOf('\n\n')) !== -1) {
+                const rawEvent = buffer.slice(0, separator);
+                buffer = buffer.slice(separator + 2);
+                this.handleStreamEvent(this.parseSSE(rawEvent), stream, message, startTime);
+            }
+        }
+
+        if (!stream.textElement) {
+            this.addMessage('No se recibió respuesta del servidor.', 'assistant');
+        }
+    }
+
+    parseSSE(rawEvent) {
+        const event = { event: 'message', data: null };
+        const dataLines = [];
+        rawEvent.split('\n').forEach(line => {
+            if (line.startsWith('event:')) {
+                event.event = line.slice(6).trim();
+            } else if (line.startsWith('data:')) {
+                dataLines.push(line.slice(5).trim());
+            }
+        });
+        if (dataLines.length) {
+            event.data = JSON.parse(dataLines.join('\n'));
+        }
+        return event;
+    }
+
+    handleStreamEvent({ event, data }, stream, message, startTime) {
+        if (event === 'node') {
+            this.logClientEvent('stream_node', data);
+        } else if (event === 'token') {
+            if (!stream.textElement) {
+                // Primer token: saco el spinner y creo el mensaje que se va a ir llenando
+                stream.firstTokenTime = Date.now();
+                this.hideLoading();
+                stream.textElement = this.addMessage('', 'assistant');
+                stream.historyEntry = this.messageHistory[this.messageHistory.length - 1];
+            }
+            stream.text += data.token;
+            stream.textElement.textContent = stream.text;
+            this.scrollToBottom();
+        } else if (event === 'done') {
+            if (!stream.textElement) {
+                this.hideLoading();
+                stream.textElement = this.addMessage('', 'assistant');
+                stream.historyEntry = this.messageHistory[this.messageHistory.length - 1];
+            }
+            stream.text = data.response || stream.text;
+            stream.textElement.textContent = stream.text;
+            stream.historyEntry.text = stream.text;
+
+            this.logClientEvent('message_received', {
+                response: stream.text,
+                responseTime: Date.now() - startTime,
+                timeToFirstToken: stream.firstTokenTime ? stream.firstTokenTime - startTime : null,
+                serverProcessingTime: data.processing_time_ms,
+                serverTimeToFirstToken: data.time_to_first_token_ms,
+                originalMessage: message
+            });
+        } else if (event === 'error') {
+            this.logClientEvent('api_error', {
+                error: data && data.error,
+                responseTime: Date.now() - startTime,
+                message: message
+            });
+            throw new Error(data && data.error ? data.error : 'Stream error');
+        }
+    }
+
     addMessage(text, sender) {
         const messageDiv = document.createElement('div');
         messageDiv.className = `message ${sender}-message`;
@@ -195,6 +306,8 @@ class ChatApp {
 
         // Store message in history
         this.messageHistory.push({ text, sender, timestamp: new Date() });
+
+        return messageText;
     }
 
     scrollToBottom() {
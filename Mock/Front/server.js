@@ -12,6 +12,16 @@ app.use(cors());
 app.use(bodyParser.json());
 app.use(express.static(path.join(__dirname, 'public')));
 
+// Headers para el backend. X-Session-ID solo se reenvia si el cliente lo mando: el backend guarda el
+// historial de la conversacion por sesion, y con un valor por defecto todos compartirian la misma
+function backendHeaders(req) {
+    const headers = { 'Content-Type': 'application/json' };
+    if (req.headers['x-session-id']) {
+        headers['X-Session-ID'] = req.headers['x-session-id'];
+    }
+    return headers;
+}
+
 // Serve the main HTML file
 app.get('/', (req, res) => {
     res.sendFile(path.join(__dirname, 'public', 'index.html'));
@@ -30,9 +40,7 @@ app.post('/api/chat', async (req, res) => {
         const apiUrl = process.env.API_URL || 'http://api:5000';
         const response = await fetch(`${apiUrl}/api/chat`, {
             method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-            },
+            headers: backendHeaders(req),
             body: JSON.stringify({ message })
         });
 
@@ -49,6 +57,38 @@ app.post('/api/chat', async (req, res) => {
     }
 });
 
+// Endpoint de streaming (SSE): reenvia los eventos del backend tal cual llegan
+app.post('/api/chat/stream', async (req, res) => {
+    try {
+        const { message } = req.body;
+
+        if (!message) {
+            return res.status(400).json({ error: 'Message is required' });
+        }
+
+        const apiUrl = process.env.API_URL || 'http://api:5000';
+        const response = await fetch(`${apiUrl}/api/chat/stream`, {
+            method: 'POST',
+            headers: backendHeaders(req),
+            body: JSON.stringify({ message })
+        });
+
+        if (!response.ok) {
+            return res.status(response.status).json({ error: `API error: ${response.status}` });
+        }
+
+        res.setHeader('Content-Type', 'text/event-stream');
+        res.setHeader('Cache-Control', 'no-cache');
+        res.setHeader('Connection', 'keep-alive');
+        res.flushHeaders();
+        response.body.pipe(res);
+
+    } catch (error) {
+        console.error('Error:', error);
+        res.status(500).json({ error: 'Internal server error', details: error.message });
+    }
+});
+
 // Endpoint de salud
 app.get('/api/health', (req, res) => {
     res.json({ status: 'OK', message: 'Nico Clone Frontend is running' });
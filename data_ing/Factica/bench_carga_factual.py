@@ -0,0 +1,155 @@
+import os
+import sys
+import json
+import time
+import random
+import socket
+import argparse
+import tempfile
+import threading
+import openai
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "poc"))
+from stub_llm import levantar_stub_llm, StubLLMHandler
+from embedding_cache import CacheEmbeddings
+import create_factual_embeddings as cfe
+
+"""
+Benchmark y prueba de la carga factual contra servicios locales: el stub de la API de OpenAI
+(poc/stub_llm.py) para los embeddings y un indice simulado con limite de payload y fallas al azar.
+
+1. Camino anterior: un llamado de embeddings por (experiencia, skill) y un solo upsert gigante.
+2. Carga nueva con fallas transitorias (reintentos) y una caida a mitad de la subida; la segunda corrida
+   retoma desde el checkpoint.
+3. Corrida sin cambios (no sube nada) y con algunas experiencias modificadas (sube solo esas).
+
+Uso:
+    python bench_carga_factual.py --experiencias 300 --skills 8
+"""
+
+
+class HandlerSinNagle(StubLLMHandler):
+    def setup(self):
+        super().setup()
+        # Sin TCP_NODELAY cada request chico espera el ACK demorado (~40 ms) y tapa la latencia simulada
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+
+class IndiceSimulado:
+    """Indice en memoria con la interfaz de Pinecone (upsert/delete), latencia, limite de payload y fallas."""
+
+    def __init__(self, latencia_ms=20, max_payload_mb=2.0, prob_falla=0.0, caer_despues_de=None):
+        self.latencia_ms = latencia_ms
+        self.max_payload = max_payload_mb * 1024 * 1024
+        self.prob_falla = prob_falla
+        self.caer_despues_de = caer_despues_de  # upserts exitosos antes de fallar siempre
+        self.vectores = {}
+        self.upserts = 0
+        self.fallas = 0
+        self._lock = threading.Lock()
+
+    def upsert(self, vectors):
+        time.sleep(self.latencia_ms / 1000)
+        if len(json.dumps(vectors)) > self.max_payload:
+            raise ValueError("payload demasiado grande para un upsert")
+        with self._lock:
+            if self.caer_despues_de is not None and self.upserts >= self.caer_despues_de:
+                raise ConnectionError("servicio caido")
+            if random.random() < self.prob_falla:
+                self.fallas += 1
+                raise ConnectionError("falla transitoria")
+            for v in vectors:
+                self.vectores[v["id"]] = v
+            self.upserts += 1
+        return {"upserted_count": len(vectors)}
+
+    def delete(self, ids):
+        with self._lock:
+            for id_ in ids:
+                self.vectores.pop(id_, None)
+
+
+def factual_sintetico(n: int, skills: int, semilla: int = 0) -> list:
+    rng = random.Random(semilla)
+    return [{
+        "empresa": f"Empresa {i}",
+        "rol": rng.choice(["Data Engineer", "AI Engineer", "Backend Developer"]),
+        "periodo": f"{2010 + i % 12}-{2012 + i % 12}",
+        "skills": [f"skill_{i}_{j}" for j in range(skills)]
+    } for i in range(n)]
+
+
+def cache_nuevo():
+    # Sin disco: cada corrida empieza sin embeddings cacheados
+    return CacheEmbeddings(directorio=None)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Carga factual anterior vs por lotes con checkpoint, contra servicios locales")
+    parser.add_argument("--experiencias", type=int, default=300)
+    parser.add_argument("--skills", type=int, default=8)
+    parser.add_argument("--latencia_embedding_ms", type=float, default=5)
+    parser.add_argument("--pares_anterior", type=int, default=300, help="Pares a embeber uno por uno con el camino anterior")
+    args = parser.parse_args()
+
+    servidor, base_url = levantar_stub_llm(latencia_embedding_ms=args.latencia_embedding_ms, handler=HandlerSinNagle)
+    cliente = openai.OpenAI(base_url=base_url, api_key="stub")
+    llamados = {"embeddings": 0}
+
+    def embed_lote(textos):
+        llamados["embeddings"] += 1
+        return [d.embedding for d in cliente.embeddings.create(input=textos, model=cfe.EMBEDDING_MODEL).data]
+
+    experiencias = factual_sintetico(args.experiencias, args.skills)
+    with tempfile.TemporaryDirectory() as directorio:
+        factual_path = os.path.join(directorio, "factual.json")
+        snapshot = os.path.join(directorio, "factual_index")
+        checkpoint = os.path.join(directorio, "checkpoint.json")
+        with open(factual_path, "w", encoding="utf-8") as f:
+            json.dump(experiencias, f)
+        registros = cfe.armar_registros(experiencias)
+        print(f"{len(registros)} vectores ({args.experiencias} experiencias x {args.skills} skills)\n")
+
+        # 1. Camino anterior
+        inicio = time.perf_counter()
+        for r in registros[:args.pares_anterior]:
+            embed_lote([r["contenido"]])
+        por_par = (time.perf_counter() - inicio) / args.pares_anterior
+        print(f"Anterior: un llamado por par -> {por_par * 1000:.1f} ms/par, "
+              f"{por_par * len(registros):.1f} s estimados para {len(registros)} vectores")
+        vectores = [{"id": r["id"], "values": [0.0] * cfe.DIMENSION, "metadata": r["metadata"]} for r in registros]
+        try:
+            IndiceSimulado().upsert(vectores)
+            print("Anterior: upsert unico OK")
+        except ValueError as e:
+            print(f"Anterior: upsert unico de {len(vectores)} vectores falla ({e})")
+
+        # 2. Carga nueva con fallas transitorias y una caida a mitad de camino
+        indice = IndiceSimulado(prob_falla=0.1, caer_despues_de=len(registros) // cfe.CHUNK_UPSERT // 2)
+        llamados["embeddings"] = 0
+        cfe.ESPERA_BASE_S, cfe.ESPERA_MAX_S = 0.01, 0.1  # esperas cortas para el benchmark
+        try:
+            cfe.main(factual_path, snapshot, checkpoint, embed_lote=embed_lote, index=indice, cache=cache_nuevo())
+        except RuntimeError as e:
+            print(f"-> corrida interrumpida: {e}")
+        print(f"-> {llamados['embeddings']} llamados de embeddings, {len(indice.vectores)} vectores en el indice, "
+              f"{indice.fallas} fallas transitorias reintentadas\n")
+
+        indice.caer_despues_de = None
+        llamados["embeddings"] = 0
+        resultado = cfe.main(factual_path, snapshot, checkpoint, embed_lote=embed_lote, index=indice, cache=cache_nuevo())
+        print(f"-> retomada: {resultado['subidos']} subidos, {llamados['embeddings']} llamados de embeddings, "
+              f"{len(indice.vectores)}/{len(registros)} vectores en el indice\n")
+
+        # 3. Sin cambios y con cambios
+        resultado = cfe.main(factual_path, snapshot, checkpoint, embed_lote=embed_lote, index=indice, cache=cache_nuevo())
+        print(f"-> sin cambios: {resultado['subidos']} subidos\n")
+        for exp in experiencias[:3]:
+            exp["rol"] = "Tech Lead"
+        experiencias[3]["skills"] = experiencias[3]["skills"][:-1]
+        with open(factual_path, "w", encoding="utf-8") as f:
+            json.dump(experiencias, f)
+        llamados["embeddings"] = 0
+        resultado = cfe.main(factual_path, snapshot, checkpoint, embed_lote=embed_lote, index=indice, cache=cache_nuevo())
+        print(f"-> 3 experiencias modificadas y 1 skill borrado: {resultado['subidos']} subidos, "
+              f"{llamados['embeddings']} llamados de embeddings, {len(indice.vectores)} vectores en el indice")
+    servidor.shutdown()
@@ -1,66 +1,274 @@
 import os
+import sys
 import json
-import openai
-from pinecone import Pinecone, ServerlessSpec
+import time
+import random
+import hashlib
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
 
+# El cache de embeddings vive en poc/ y lo comparte con el chat
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "poc"))
+from embedding_cache import desde_entorno as cache_embeddings_desde_entorno
+from vector_store import IndiceLocal
+
 
 """ Asegurarse de tener el .env con las APIS (OCULTAS en el gitignore!!)"""
+
+"""
+Carga de los vectores factuales (un vector por skill de cada experiencia) en Pinecone y en el snapshot local.
+- Los embeddings se piden en lotes (muchos textos por llamado) y pasan por el cache de embeddings.
+- Se sube en chunks de --chunk vectores con --concurrencia upserts en paralelo, cada uno con reintentos
+  y backoff exponencial (con jitter).
+- Un checkpoint (id -> hash del contenido) se actualiza despues de cada chunk subido: si la corrida se
+  corta, la siguiente retoma desde donde quedo, y los vectores cuyo texto y metadata no cambiaron desde la
+  ultima corrida no se vuelven a subir. Los ids que ya no existen en factual.json se borran del indice.
+- El cliente de embeddings (embed_lote) y el indice (upsert/delete) se pueden inyectar, para probar contra
+  servicios locales (ver bench_carga_factual.py).
+"""
+
 load_dotenv()
 
-openai.api_key = os.getenv("OPENAI_API_KEY")
-pc = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
 index_name = "nico-factual"
+EMBEDDING_MODEL = "text-embedding-3-small"
+DIMENSION = 1536
+FACTUAL_PATH = "db_personality/factual.json"
+SNAPSHOT_DIR = os.getenv("VECTOR_STORE_DIR", "db_personality/factual_index")
+CHECKPOINT_PATH = os.getenv("FACTUAL_CHECKPOINT_PATH", "db_personality/factual_checkpoint.json")
+LOTE_EMBEDDINGS = 256   # textos por llamado a la API de embeddings (el limite de OpenAI es 2048)
+CHUNK_UPSERT = 100      # vectores por upsert (Pinecone recomienda ~100 para 1536 dimensiones)
+REINTENTOS = 5
+ESPERA_BASE_S = 0.5
+ESPERA_MAX_S = 20.0
+
+
+def embed_lote_openai(textos):
+    import openai
+    openai.api_key = os.getenv("OPENAI_API_KEY")
+    return [d.embedding for d in openai.embeddings.create(input=textos, model=EMBEDDING_MODEL).data]
+
+
+def crear_index():
+    """Indice de Pinecone; lo crea si no existe. La dimension coincide con el modelo de openAI"""
+    from pinecone import Pinecone, ServerlessSpec
+    pc = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
+    if index_name not in pc.list_indexes().names():
+        pc.create_index(
+            name=index_name,
+            dimension=DIMENSION,
+            metric="cosine",
+            spec=ServerlessSpec(cloud="aws", region="us-east-1")
+        )
+        print(f"Índice '{index_name}' creado")
+    return pc.Index(index_name)
+
+
+def con_reintentos(funcion, *args, **kwargs):
+    """Llama a funcion y reintenta ante cualquier error con backoff exponencial y jitter
+    (ESPERA_BASE_S, 2x, 4x... hasta ESPERA_MAX_S). Si falla REINTENTOS veces, propaga el ultimo error."""
+    intentos = REINTENTOS
+    for intento in range(intentos):
+        try:
+            return funcion(*args, **kwargs)
+        except Exception as e:
+            if intento == intentos - 1:
+                raise
+            espera = min(ESPERA_MAX_S, ESPERA_BASE_S * 2 ** intento) * random.uniform(0.5, 1.0)
+            print(f"Error ({type(e).__name__}: {e}); reintento {intento + 1}/{intentos - 1} en {espera:.1f} s")
+            time.sleep(espera)
+
+
+def armar_registros(experiencias):
+    """Un registro {id, contenido, metadata, hash} por skill de cada experiencia."""
+    registros = []
+    for i, exp in enumerate(experiencias):
+        empresa = exp.get("empresa", "")
+        rol = exp.get("rol", "")
+        periodo = exp.get("periodo", "")
+        skills = exp.get("skills", [])
+        for skill in skills:
+            contenido = f"Empresa: {empresa}\nRol: {rol}\nPeríodo: {periodo}\nSkill: {skill}\n"
+            if "skill_details" in exp and skill in exp["skill_details"]:
+                skill_detail = exp["skill_details"][skill]
+                contenido += f"Nivel: {skill_detail.get('nivel', 'N/A')}\n"
+                contenido += f"Cómo aprendí: {skill_detail.get('como_aprendi', 'N/A')}\n"
+                contenido += f"Proyectos: {skill_detail.get('proyectos', 'N/A')}\n"
+            metadata = {
+                "empresa": empresa,
+                "rol": rol,
+                "periodo": periodo,
+                "skill": skill,
+                "skills": skills
+            }
+            registros.append({
+                # ID único para cada vector
+                "id": f"{i}-{skill}",
+                "contenido": contenido,
+                "metadata": metadata,
+                "hash": hash_contenido(contenido, metadata)
+            })
+    return registros
+
+
+def hash_contenido(contenido: str, metadata: dict) -> str:
+    """Hash del texto embebido, la metadata y el modelo: si no cambia, el vector subido sigue valiendo."""
+    datos = json.dumps([EMBEDDING_MODEL, contenido, metadata], ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(datos.encode("utf-8")).hexdigest()
+
+
+class Checkpoint:
+    """Estado de la ultima carga: hash de cada vector embebido en el snapshot y de cada vector subido.
+    Se reescribe de forma atomica (archivo temporal + os.replace) despues de cada chunk."""
+
+    def __init__(self, path):
+        self.path = path
+        self.embebidos = {}
+        self.subidos = {}
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                datos = json.load(f)
+            self.embebidos = datos.get("embebidos", {})
+            self.subidos = datos.get("subidos", {})
+
+    def guardar(self):
+        if not self.path:
+            return
+        with self._lock:
+            datos = json.dumps({"embebidos": self.embebidos, "subidos": self.subidos}, ensure_ascii=False)
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            temporal = f"{self.path}.tmp"
+            with open(temporal, "w", encoding="utf-8") as f:
+                f.write(datos)
+            os.replace(temporal, self.path)
+
+    def marcar_subidos(self, registros):
+        with self._lock:
+            for r in registros:
+                self.subidos[r["id"]] = r["hash"]
+        self.guardar()
+
+    def marcar_borrados(self, ids):
+        with self._lock:
+            for id_ in ids:
+                self.subidos.pop(id_, None)
+        self.guardar()
+
+
+def vectores_previos(snapshot_dir, checkpoint: Checkpoint, registros) -> dict:
+    """Vectores del snapshot anterior cuyo contenido no cambio (id -> lista). Evita re-embeber aunque el
+    cache de embeddings este deshabilitado. El snapshot guarda vectores normalizados, igual que los de OpenAI."""
+    vigentes = {r["id"] for r in registros if checkpoint.embebidos.get(r["id"]) == r["hash"]}
+    if not vigentes or not os.path.exists(os.path.join(snapshot_dir, "vectores.npy")):
+        return {}
+    anterior = IndiceLocal.cargar(snapshot_dir, mmap=True)
+    return {id_: anterior.vectores[fila].tolist() for fila, id_ in enumerate(anterior.ids) if id_ in vigentes}
+
+
+def embeber(registros, embed_lote, cache, previos: dict, lote: int = LOTE_EMBEDDINGS) -> list:
+    """Vectores {"id", "values", "metadata"} en el orden de registros. Los que faltan se piden de a `lote` textos."""
+    faltantes = [r for r in registros if r["id"] not in previos]
+    nuevos = {}
+    for inicio in range(0, len(faltantes), lote):
+        tramo = faltantes[inicio:inicio + lote]
+        # El cache junta los textos que no tiene en un solo llamado a embed_lote
+        vectores = cache.obtener([r["contenido"] for r in tramo], EMBEDDING_MODEL,
+                                 lambda textos: con_reintentos(embed_lote, textos))
+        for r, v in zip(tramo, vectores):
+            nuevos[r["id"]] = v.tolist()
+    print(f"Embeddings: {len(previos)} reusados del snapshot, {len(faltantes)} pedidos en lotes de {lote}")
+    return [{"id": r["id"], "values": previos.get(r["id"]) or nuevos[r["id"]], "metadata": r["metadata"]}
+            for r in registros]
+
+
+def subir(index, vectores, registros, checkpoint: Checkpoint, chunk: int = CHUNK_UPSERT, concurrencia: int = 4) -> int:
+    """Sube en chunks concurrentes los vectores cuyo hash no coincide con el checkpoint.
+    Borra del indice los ids subidos antes que ya no existen. Devuelve la cantidad de vectores subidos."""
+    por_id = {r["id"]: r for r in registros}
+    pendientes = [v for v in vectores if checkpoint.subidos.get(v["id"]) != por_id[v["id"]]["hash"]]
+    obsoletos = [id_ for id_ in checkpoint.subidos if id_ not in por_id]
+    print(f"Upsert: {len(pendientes)} vectores nuevos o modificados, "
+          f"{len(vectores) - len(pendientes)} sin cambios, {len(obsoletos)} a borrar")
+
+    if obsoletos:
+        for inicio in range(0, len(obsoletos), 1000):
+            ids = obsoletos[inicio:inicio + 1000]
+            con_reintentos(index.delete, ids=ids)
+            checkpoint.marcar_borrados(ids)
+
+    chunks = [pendientes[i:i + chunk] for i in range(0, len(pendientes), chunk)]
+    subidos = 0
+    errores = []
+    with ThreadPoolExecutor(max_workers=concurrencia) as pool:
+        futuros = {pool.submit(con_reintentos, index.upsert, vectors=c): c for c in chunks}
+        for futuro in as_completed(futuros):
+            c = futuros[futuro]
+            try:
+                futuro.result()
+            except Exception as e:
+                # Los demas chunks siguen y quedan en el checkpoint; este se retoma en la proxima corrida
+                errores.append(e)
+                continue
+            checkpoint.marcar_subidos([por_id[v["id"]] for v in c])
+            subidos += len(c)
+            print(f"{subidos}/{len(pendientes)} vectores subidos")
+    if errores:
+        raise RuntimeError(f"{len(errores)} de {len(chunks)} chunks fallaron despues de los reintentos; "
+                           f"volver a correr para retomar") from errores[0]
+    return subidos
+
+
+def main(factual_path=FACTUAL_PATH, snapshot_dir=SNAPSHOT_DIR, checkpoint_path=CHECKPOINT_PATH,
+         embed_lote=None, index=None, usar_pinecone=None, cache=None,
+         chunk=CHUNK_UPSERT, concurrencia=4, lote_embeddings=LOTE_EMBEDDINGS):
+    """
+    Embebe factual.json, escribe el snapshot local y sube a Pinecone lo que cambio.
+    Args:
+        embed_lote (callable): lista de textos -> lista de vectores. Por defecto, OpenAI.
+        index: objeto con upsert(vectors=...) y delete(ids=...). Por defecto, el indice de Pinecone.
+        usar_pinecone (bool): por defecto, VECTOR_BACKEND=pinecone (con local/ivf/auto el chat usa
+            solo el snapshot local y no hace falta Pinecone). Si se pasa index, se sube a ese indice.
+        cache: cache de embeddings (por defecto, el de EMBEDDING_CACHE_DIR).
+    Returns:
+        dict: vectores, subidos y segundos.
+    """
+    inicio = time.perf_counter()
+    if usar_pinecone is None:
+        usar_pinecone = index is not None or os.getenv("VECTOR_BACKEND", "pinecone").lower() == "pinecone"
+    embed_lote = embed_lote or embed_lote_openai
+    # Cache de embeddings por contenido: un texto identico no se vuelve a embeber entre corridas
+    cache = cache or cache_embeddings_desde_entorno()
+    checkpoint = Checkpoint(checkpoint_path)
+
+    # Cargar datos factuales
+    with open(factual_path, "r", encoding="utf-8") as f:
+        registros = armar_registros(json.load(f))
+
+    previos = vectores_previos(snapshot_dir, checkpoint, registros)
+    vectores = embeber(registros, embed_lote, cache, previos, lote=lote_embeddings)
+
+    # Snapshot local (vectores.npy + metadata.jsonl) para el indice en proceso del chat.
+    # Se escribe antes de subir: si la subida se corta, la proxima corrida reusa estos vectores.
+    IndiceLocal.desde_vectores(vectores).guardar(snapshot_dir)
+    checkpoint.embebidos = {r["id"]: r["hash"] for r in registros}
+    checkpoint.guardar()
+    print(f"Snapshot local con {len(vectores)} vectores guardado")
+
+    subidos = 0
+    if usar_pinecone:
+        index = index or crear_index()
+        subidos = subir(index, vectores, registros, checkpoint, chunk=chunk, concurrencia=concurrencia)
+    segundos = time.perf_counter() - inicio
+    print(f"¡Listo! {len(vectores)} vectores, {subidos} subidos en {segundos:.1f} s")
+    return {"vectores": len(vectores), "subidos": subidos, "segundos": segundos}
+
 
-# Crear el índice si no existe. La dimension coincide con el modelo de openAI
-if index_name not in pc.list_indexes().names():
-    pc.create_index(
-        name=index_name,
-        dimension=1536,
-        metric="cosine",
-        spec=ServerlessSpec(cloud="aws", region="us-east-1")
-    )
-    print(f"Índice '{index_name}' creado")
-
-index = pc.Index(index_name)
-
-# Cargar datos factuales
-with open("db_personality/factual.json", "r", encoding="utf-8") as f:
-    experiencias = json.load(f)
-
-# Preparar y subir los vectores
-vectors = []
-for i, exp in enumerate(experiencias):
-    empresa = exp.get("empresa", "")
-    rol = exp.get("rol", "")
-    periodo = exp.get("periodo", "")
-    skills = exp.get("skills", [])
-    for skill in skills:
-        contenido = f"Empresa: {empresa}\nRol: {rol}\nPeríodo: {periodo}\nSkill: {skill}\n"
-        if "skill_details" in exp and skill in exp["skill_details"]:
-            skill_detail = exp["skill_details"][skill]
-            contenido += f"Nivel: {skill_detail.get('nivel', 'N/A')}\n"
-            contenido += f"Cómo aprendí: {skill_detail.get('como_aprendi', 'N/A')}\n"
-            contenido += f"Proyectos: {skill_detail.get('proyectos', 'N/A')}\n"
-        
-        # Obtener embedding. Chequear dimensionalidad
-        embedding = openai.embeddings.create(
-            input=contenido,
-            model="text-embedding-3-small"
-        ).data[0].embedding
-        # ID único para cada vector
-        vector_id = f"{i}-{skill}"
-        # Metadata
-        metadata = {
-            "empresa": empresa,
-            "rol": rol,
-            "periodo": periodo,
-            "skill": skill,
-            "skills": skills
-        }
-        vectors.append({"id": vector_id, "values": embedding, "metadata": metadata})
-
-# Subir a Pinecone
-print(f"Subiendo {len(vectors)} vectores a Pinecone...")
-index.upsert(vectors)
-print("¡Listo!") 
\ No newline at end of file
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Embeddings de factual.json: snapshot local y upsert a Pinecone")
+    parser.add_argument("--chunk", type=int, default=CHUNK_UPSERT, help="Vectores por upsert")
+    parser.add_argument("--concurrencia", type=int, default=4, help="Upserts en paralelo")
+    parser.add_argument("--lote_embeddings", type=int, default=LOTE_EMBEDDINGS, help="Textos por llamado de embeddings")
+    args = parser.parse_args()
+    main(chunk=args.chunk, concurrencia=args.concurrencia, lote_embeddings=args.lote_embeddings)
@@ -1,34 +1,202 @@
 import os
 import json
-from collections import Counter, defaultdict
+import time
+import argparse
+from operator import itemgetter
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
 
 """
-Este script analiza las conversaciones analizadas y calcula el promedio de Big Five de los bloques.
-
-Esto es valido para primeras aproximaciones y datasets pequeños.
-Para datasets grandes, se tiene que usar otro enfoque como paralelizar en dask y usar chunks.
+Este script analiza las conversaciones analizadas y calcula el promedio de Big Five de los bloques,
+global y por grupo (tema, emocion, formalidad y tema x emocion).
 
+Los archivos *_conversaciones_analizadas.json se leen de a uno y los bloques se agregan por tramos:
+por cada agrupacion se guarda, en arrays de NumPy, la cantidad, la media y la suma de cuadrados de las
+desviaciones (M2) de cada grupo, y cada tramo se combina con la formula de Chan (Welford por lotes).
+La memoria depende de la cantidad de grupos, no de la de bloques. Los agregados parciales de varios
+procesos se combinan igual (AgregadorBigFive.combinar), asi que los archivos se reparten entre workers.
 """
 
-
+KEYS = ["bf_openness", "bf_conscientiousness", "bf_extraversion", "bf_agreeableness", "bf_neuroticism"]
+_rasgos = itemgetter(*KEYS)
+_FALTA = object()  # el bloque no tiene la clave de grupo
 
 folders = ["formal", "informal"]
-all_blocks = []
-blocks_by_folder = defaultdict(list)
 
-# 1. Leer todos los archivos *_conversaciones_analizadas.json
-def cargar_bloques():
+# Agrupaciones de matrices_promedio_por_grupo.json. La formalidad es la carpeta del archivo.
+AGRUPACIONES = {
+    "por_tema": ["tema"],
+    "por_emocion": ["emo_user"],
+    "por_formalidad": ["carpeta"],
+    "por_tema_emocion": ["tema", "emo_user"],
+    "por_tema_emocion_formalidad": ["tema", "emo_user", "carpeta"]
+}
+
+
+class _Grupos:
+    """Cantidad, media y M2 por grupo de una agrupacion. Los arrays crecen al aparecer grupos nuevos."""
+
+    def __init__(self, group_keys):
+        self.group_keys = list(group_keys)
+        self.indices = {}  # grupo (tupla) -> fila
+        self.n = np.zeros(0, dtype=np.int64)
+        self.media = np.zeros((0, len(KEYS)))
+        self.m2 = np.zeros((0, len(KEYS)))
+
+    def _fila(self, grupo) -> int:
+        fila = self.indices.get(grupo)
+        if fila is None:
+            fila = self.indices[grupo] = len(self.indices)
+            if fila >= len(self.n):
+                capacidad = max(8, 2 * len(self.n))
+                self.n = np.concatenate([self.n, np.zeros(capacidad - len(self.n), dtype=np.int64)])
+                self.media = np.vstack([self.media, np.zeros((capacidad - len(self.media), len(KEYS)))])
+                self.m2 = np.vstack([self.m2, np.zeros((capacidad - len(self.m2), len(KEYS)))])
+        return fila
+
+    def _combinar_filas(self, filas, n_b, media_b, m2_b):
+        """Chan et al.: combina (n, media, M2) de las filas con los de otro conjunto de datos."""
+        n_a = self.n[filas]
+        n = n_a + n_b
+        delta = media_b - self.media[filas]
+        peso = (n_b / np.maximum(n, 1))[:, None]
+        self.media[filas] += delta * peso
+        self.m2[filas] += m2_b + delta ** 2 * (n_a * peso[:, 0])[:, None]
+        self.n[filas] = n
+
+    def actualizar(self, valores, columnas):
+        """Agrega un tramo. valores: matriz (n, 5); columnas: una lista de n valores por clave de grupo
+        (_FALTA si el bloque no tiene esa clave)."""
+        claves = list(zip(*columnas)) if columnas else [()] * len(valores)
+        if any(_FALTA in columna for columna in columnas):
+            presentes = [i for i, clave in enumerate(claves) if _FALTA not in clave]
+            valores = valores[presentes]
+            claves = [claves[i] for i in presentes]
+        if not claves:
+            return
+        # Codigo local de cada grupo del tramo y su fila en los arrays del agregado
+        codigos = {}
+        locales = np.array([codigos.setdefault(clave, len(codigos)) for clave in claves], dtype=np.int64)
+        filas = np.array([self._fila(clave) for clave in codigos], dtype=np.int64)
+        # Estadisticos del tramo por grupo, vectorizados con bincount
+        n_b = np.bincount(locales, minlength=len(filas))
+        media_b = np.stack([np.bincount(locales, weights=valores[:, j], minlength=len(filas))
+                            for j in range(len(KEYS))], axis=1) / n_b[:, None]
+        desvio = valores - media_b[locales]
+        m2_b = np.stack([np.bincount(locales, weights=desvio[:, j] ** 2, minlength=len(filas))
+                         for j in range(len(KEYS))], axis=1)
+        self._combinar_filas(filas, n_b, media_b, m2_b)
+
+    def combinar(self, otro: "_Grupos"):
+        if not otro.indices:
+            return
+        filas = np.array([self._fila(grupo) for grupo in otro.indices], dtype=np.int64)
+        origen = np.array(list(otro.indices.values()), dtype=np.int64)
+        self._combinar_filas(filas, otro.n[origen], otro.media[origen], otro.m2[origen])
+
+    def promedios(self) -> dict:
+        return {grupo: dict(zip(KEYS, np.round(self.media[fila], 3).tolist())) for grupo, fila in self.indices.items()}
+
+    def conteos(self) -> dict:
+        return {grupo: int(self.n[fila]) for grupo, fila in self.indices.items()}
+
+    def varianzas(self) -> dict:
+        """Varianza muestral por grupo (0 si el grupo tiene un solo bloque)."""
+        return {grupo: dict(zip(KEYS, (self.m2[fila] / max(self.n[fila] - 1, 1)).tolist()))
+                for grupo, fila in self.indices.items()}
+
+
+class AgregadorBigFive:
+    """
+    Agregado en streaming del Big Five: global y por cada agrupacion.
+    Args:
+        agrupaciones (dict): nombre -> lista de claves del bloque (ej: {"por_tema": ["tema"]}).
+    """
+
+    def __init__(self, agrupaciones=AGRUPACIONES):
+        self.grupos = {"global": _Grupos([])}
+        self.grupos.update({nombre: _Grupos(claves) for nombre, claves in agrupaciones.items()})
+        self.bloques = 0
+
+    def actualizar(self, bloques):
+        """Agrega un tramo de bloques (lista de dicts). Solo cuentan los bloques con los cinco rasgos."""
+        filas, validos = [], []
+        for b in bloques:
+            try:
+                filas.append(_rasgos(b))
+            except KeyError:
+                continue
+            validos.append(b)
+        self.bloques += len(bloques)
+        if not validos:
+            return
+        valores = np.array(filas, dtype=np.float64)
+        claves = {gk for grupos in self.grupos.values() for gk in grupos.group_keys}
+        columnas = {gk: [b.get(gk, _FALTA) for b in validos] for gk in claves}
+        for grupos in self.grupos.values():
+            grupos.actualizar(valores, [columnas[gk] for gk in grupos.group_keys])
+
+    def combinar(self, otro: "AgregadorBigFive") -> "AgregadorBigFive":
+        """Suma al agregado el de otro proceso (mismas agrupaciones). Devuelve self."""
+        for nombre, grupos in otro.grupos.items():
+            self.grupos.setdefault(nombre, _Grupos(grupos.group_keys)).combinar(grupos)
+        self.bloques += otro.bloques
+        return self
+
+    def promedio_global(self) -> dict:
+        return self.grupos["global"].promedios().get((), {k: 0.0 for k in KEYS})
+
+    def matriz(self, nombre) -> dict:
+        return self.grupos[nombre].promedios()
+
+    def matriz_con_conteos(self, nombre) -> dict:
+        """Promedios por grupo con la cantidad de bloques ("n"), para descartar grupos con poco soporte."""
+        conteos = self.grupos[nombre].conteos()
+        return {grupo: {**promedios, "n": conteos[grupo]} for grupo, promedios in self.matriz(nombre).items()}
+
+
+def archivos_analizados(folders=folders):
+    """(carpeta, path) de cada *_conversaciones_analizadas.json."""
     for folder in folders:
         if not os.path.exists(folder):
             continue
-        for fname in os.listdir(folder):
+        for fname in sorted(os.listdir(folder)):
             if fname.endswith("_conversaciones_analizadas.json"):
-                path = os.path.join(folder, fname)
-                with open(path, "r", encoding="utf-8") as f:
-                    bloques = json.load(f)
-                    all_blocks.extend(bloques)
-                    blocks_by_folder[folder].extend(bloques)
+                yield folder, os.path.join(folder, fname)
+
+
+def iterar_tramos(archivos, tamaño=50000):
+    """Bloques de a tramos; en memoria hay a lo sumo un archivo y un tramo. Los bloques sin "carpeta"
+    toman la carpeta del archivo (formal/informal) como formalidad."""
+    for folder, path in archivos:
+        with open(path, "r", encoding="utf-8") as f:
+            bloques = json.load(f)
+        for inicio in range(0, len(bloques), tamaño):
+            tramo = bloques[inicio:inicio + tamaño]
+            for b in tramo:
+                b.setdefault("carpeta", folder)
+            yield tramo
+
+
+def agregar_archivos(archivos, agrupaciones=AGRUPACIONES, tamaño=50000) -> AgregadorBigFive:
+    agregador = AgregadorBigFive(agrupaciones)
+    for tramo in iterar_tramos(archivos, tamaño):
+        agregador.actualizar(tramo)
+    return agregador
+
+
+def agregar(folders=folders, workers=1, agrupaciones=AGRUPACIONES, tamaño=50000) -> AgregadorBigFive:
+    """Agrega todos los archivos; con workers > 1 los reparte entre procesos y combina los parciales."""
+    archivos = list(archivos_analizados(folders))
+    if workers <= 1 or len(archivos) <= 1:
+        return agregar_archivos(archivos, agrupaciones, tamaño)
+    partes = [archivos[i::workers] for i in range(workers)]
+    total = AgregadorBigFive(agrupaciones)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for parcial in pool.map(agregar_archivos, partes, [agrupaciones] * workers, [tamaño] * workers):
+            total.combinar(parcial)
+    return total
+
 
 def promedio_bigfive(bloques):
     """
@@ -38,51 +206,46 @@ def promedio_bigfive(bloques):
     Returns:
         dict: Diccionario con el promedio de Big Five.
     """
-
-    keys = ["bf_openness", "bf_conscientiousness", "bf_extraversion", "bf_agreeableness", "bf_neuroticism"]
-    arr = np.array([[b.get(k, 0.0) for k in keys] for b in bloques if all(k in b for k in keys)])
-    if len(arr) == 0:
-        return {k: 0.0 for k in keys}
-    return dict(zip(keys, np.round(arr.mean(axis=0), 3)))
+    agregador = AgregadorBigFive({})
+    agregador.actualizar(bloques)
+    return agregador.promedio_global()
 
 def matriz_promedio_por_grupo(bloques, group_keys):
     """
     Calcula el promedio de Big Five agrupando por las claves indicadas (ej: ['tema'], ['emo_user'], ['tema','emo_user'], etc.)
     Devuelve un dict: {grupo: {bf_openness:..., ...}}
     """
-    from collections import defaultdict
-    keys = ["bf_openness", "bf_conscientiousness", "bf_extraversion", "bf_agreeableness", "bf_neuroticism"]
-    grupos = defaultdict(list)
-    for b in bloques:
-        if all(k in b for k in keys) and all(gk in b for gk in group_keys):
-            grupo = tuple(b[gk] for gk in group_keys)
-            grupos[grupo].append([b[k] for k in keys])
-    matriz = {}
-    for grupo, vals in grupos.items():
-        arr = np.array(vals)
-        avg = np.round(arr.mean(axis=0), 3)
-        matriz[grupo] = dict(zip(keys, avg))
-    return matriz
+    agregador = AgregadorBigFive({"matriz": group_keys})
+    agregador.actualizar(bloques)
+    return agregador.matriz("matriz")
 
 def stringify_keys(d):
     return {str(k): v for k, v in d.items()}
 
+def escribir_json(datos, path):
+    """Escritura atomica: el PoC recarga estos archivos en caliente y nunca tiene que ver uno a medias."""
+    temporal = f"{path}.tmp"
+    with open(temporal, "w", encoding="utf-8") as f:
+        json.dump(datos, f, indent=2, ensure_ascii=False)
+    os.replace(temporal, path)
+
 if __name__ == "__main__":
-    cargar_bloques()
+    parser = argparse.ArgumentParser(description="Promedios de Big Five global y por grupo, en streaming")
+    parser.add_argument("--workers", type=int, default=1, help="Procesos entre los que se reparten los archivos")
+    parser.add_argument("--tramo", type=int, default=50000, help="Bloques por tramo de agregacion")
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    agregador = agregar(workers=args.workers, tamaño=args.tramo)
+    segundos = time.perf_counter() - inicio
+    print(f"{agregador.bloques} bloques agregados en {segundos:.1f} s")
+
     # Matriz promedio global
-    promedio_global = promedio_bigfive(all_blocks)
-    with open("promedio_bigfive_global.json", "w", encoding="utf-8") as f:
-        json.dump(promedio_global, f, indent=2, ensure_ascii=False)
+    promedio_global = agregador.promedio_global()
+    escribir_json(promedio_global, "promedio_bigfive_global.json")
     print("✅ Promedio Big Five global guardado en promedio_bigfive_global.json")
 
     # Matrices promedio por grupo
-    matrices = {
-        "por_tema": matriz_promedio_por_grupo(all_blocks, ["tema"]),
-        "por_emocion": matriz_promedio_por_grupo(all_blocks, ["emo_user"]),
-        "por_formalidad": matriz_promedio_por_grupo(all_blocks, ["carpeta"] if "carpeta" in all_blocks[0] else []),
-        "por_tema_emocion": matriz_promedio_por_grupo(all_blocks, ["tema", "emo_user"])
-    }
-    matrices = {k: stringify_keys(v) for k, v in matrices.items()}
-    with open("matrices_promedio_por_grupo.json", "w", encoding="utf-8") as f:
-        json.dump(matrices, f, indent=2, ensure_ascii=False)
-    print("✅ Matrices promedio por grupo guardadas en matrices_promedio_por_grupo.json") 
\ No newline at end of file
+    matrices = {nombre: stringify_keys(agregador.matriz_con_conteos(nombre)) for nombre in AGRUPACIONES}
+    escribir_json(matrices, "matrices_promedio_por_grupo.json")
+    print("✅ Matrices promedio por grupo guardadas en matrices_promedio_por_grupo.json")
@@ -0,0 +1,123 @@
+import argparse
+import json
+import os
+import resource
+import tempfile
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import analisis_simplificado_conversaciones as asc
+
+"""
+Benchmark de la agregacion de Big Five sobre millones de bloques sinteticos.
+Compara la version anterior (todos los bloques en una lista global y listas de Python por grupo) con el
+agregador en streaming, en un proceso y repartido entre varios. Cada variante corre en su propio proceso
+para medir su pico de memoria (ru_maxrss). Verifica que los promedios coincidan.
+
+Uso:
+    python bench_agregacion.py --bloques 2000000 --archivos 40 --workers 4
+"""
+
+TEMAS = ["trabajo", "amistad", "familia", "salud", "emociones", "ocio", "estudios", "dinero", "viajes", "tecnología",
+         "deportes", "comida", "política", "entretenimiento", "amor"]
+EMOCIONES = ["others", "joy", "sadness", "anger", "surprise", "disgust", "fear"]
+
+
+def escribir_corpus(directorio: str, bloques: int, archivos: int, semilla: int = 0):
+    """Archivos *_conversaciones_analizadas.json repartidos entre formal/ e informal/."""
+    rng = np.random.default_rng(semilla)
+    por_archivo = bloques // archivos
+    for a in range(archivos):
+        folder = os.path.join(directorio, "formal" if a % 2 == 0 else "informal")
+        os.makedirs(folder, exist_ok=True)
+        bf = np.round(rng.random((por_archivo, 5)), 3)
+        temas = rng.integers(0, len(TEMAS), por_archivo)
+        emociones = rng.integers(0, len(EMOCIONES), por_archivo)
+        bloques_archivo = [{
+            "conversacion_id": i, "num_mensajes": 10, "texto": "Nico: hola",
+            "emo_user": EMOCIONES[emociones[i]], "emo_score": 0.5, "tema": TEMAS[temas[i]], "tema_score": 0.5,
+            **dict(zip(asc.KEYS, bf[i].tolist()))
+        } for i in range(por_archivo)]
+        with open(os.path.join(folder, f"chat{a}_conversaciones_analizadas.json"), "w", encoding="utf-8") as f:
+            json.dump(bloques_archivo, f)
+
+
+# ---------- version anterior (copia) ----------
+def anterior(folders):
+    all_blocks = []
+    blocks_by_folder = defaultdict(list)
+    for folder in folders:
+        for fname in os.listdir(folder):
+            if fname.endswith("_conversaciones_analizadas.json"):
+                with open(os.path.join(folder, fname), "r", encoding="utf-8") as f:
+                    bloques = json.load(f)
+                    all_blocks.extend(bloques)
+                    blocks_by_folder[folder].extend(bloques)
+
+    def promedio_bigfive(bloques):
+        arr = np.array([[b.get(k, 0.0) for k in asc.KEYS] for b in bloques if all(k in b for k in asc.KEYS)])
+        return dict(zip(asc.KEYS, np.round(arr.mean(axis=0), 3).tolist()))
+
+    def matriz_promedio_por_grupo(bloques, group_keys):
+        grupos = defaultdict(list)
+        for b in bloques:
+            if all(k in b for k in asc.KEYS) and all(gk in b for gk in group_keys):
+                grupos[tuple(b[gk] for gk in group_keys)].append([b[k] for k in asc.KEYS])
+        return {g: dict(zip(asc.KEYS, np.round(np.array(v).mean(axis=0), 3).tolist())) for g, v in grupos.items()}
+
+    return {
+        "global": promedio_bigfive(all_blocks),
+        "por_tema": matriz_promedio_por_grupo(all_blocks, ["tema"]),
+        "por_emocion": matriz_promedio_por_grupo(all_blocks, ["emo_user"]),
+        "por_tema_emocion": matriz_promedio_por_grupo(all_blocks, ["tema", "emo_user"])
+    }
+
+
+def nueva(folders, workers):
+    agregador = asc.agregar(folders, workers=workers)
+    resultado = {"global": agregador.promedio_global()}
+    resultado.update({nombre: agregador.matriz(nombre) for nombre in ["por_tema", "por_emocion", "por_tema_emocion"]})
+    return resultado
+
+
+def correr(funcion, *args):
+    """Corre en el proceso actual (un worker del pool) y devuelve resultado, segundos y pico de RSS en MB."""
+    inicio = time.perf_counter()
+    resultado = funcion(*args)
+    segundos = time.perf_counter() - inicio
+    return resultado, segundos, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def diferencias(a: dict, b: dict) -> int:
+    """Promedios (grupo, rasgo) que no coinciden al redondear a 3 decimales (con tolerancia de 1 en el ultimo)."""
+    malos = 0
+    for nombre in a:
+        grupos_a = a[nombre] if nombre != "global" else {(): a[nombre]}
+        grupos_b = b[nombre] if nombre != "global" else {(): b[nombre]}
+        for grupo, valores in grupos_a.items():
+            malos += sum(abs(valores[k] - grupos_b[grupo][k]) > 0.0011 for k in asc.KEYS)
+    return malos
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Agregacion de Big Five anterior vs en streaming")
+    parser.add_argument("--bloques", type=int, default=2000000)
+    parser.add_argument("--archivos", type=int, default=40)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directorio:
+        escribir_corpus(directorio, args.bloques, args.archivos)
+        folders = [os.path.join(directorio, "formal"), os.path.join(directorio, "informal")]
+        print(f"{args.bloques} bloques en {args.archivos} archivos")
+        print(f"{'version':<24} {'seg':>7} {'bloques/s':>12} {'pico RSS (MB)':>14}")
+        variantes = [("anterior", anterior, (folders,)), ("streaming 1 proceso", nueva, (folders, 1)),
+                     (f"streaming {args.workers} procesos", nueva, (folders, args.workers))]
+        referencia = None
+        for nombre, funcion, parametros in variantes:
+            # Cada variante en un proceso nuevo, para que el pico de memoria sea solo el suyo
+            with ProcessPoolExecutor(max_workers=1) as pool:
+                resultado, segundos, rss = pool.submit(correr, funcion, *parametros).result()
+            referencia = referencia or resultado
+            print(f"{nombre:<24} {segundos:>7.2f} {args.bloques / segundos:>12,.0f} {rss:>14.0f}"
+                  f"   (promedios distintos: {diferencias(referencia, resultado)})")
@@ -0,0 +1,94 @@
+import argparse
+import random
+import re
+import string
+import time
+import parser as anon
+
+"""
+Benchmark del anonimizador con vocabularios de censura grandes.
+Compara la version anterior (un re.sub por palabra y por categoria, compilado en cada llamada) con el
+anonimizador compilado (un solo regex en trie) por mensaje y por lote, y verifica que el texto curado
+sea el mismo. La version anterior se mide sobre los primeros --mensajes_anterior mensajes.
+
+Uso:
+    python bench_anonimizador.py --terminos 10 100 1000 5000 --mensajes 50000
+"""
+
+FRASES = [
+    "hola como estas", "todo bien por suerte", "el finde fuimos a la costa con la familia",
+    "mañana tengo una reunion de trabajo temprano", "mandame el cv a juan.perez@mail.com",
+    "mi numero es 1155512345", "viste el partido de anoche?", "dale, nos vemos a las 8",
+]
+
+
+def vocabulario(n: int, rng) -> dict:
+    """n terminos (palabras inventadas y algunas de dos palabras) repartidos en cuatro categorias."""
+    categorias = {c: [] for c in ["discriminación", "política", "religión", "sexual"]}
+    nombres = list(categorias)
+    vistos = set()
+    while len(vistos) < n:
+        palabra = "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(4, 9)))
+        if rng.random() < 0.05:
+            palabra += " " + "".join(rng.choice(string.ascii_lowercase) for _ in range(5))
+        if palabra not in vistos:
+            vistos.add(palabra)
+            categorias[nombres[len(vistos) % 4]].append(palabra)
+    return categorias
+
+
+def mensajes_sinteticos(n: int, categorias: dict, rng) -> list:
+    """Mensajes de chat; uno de cada cinco incluye un termino censurado (a veces en mayusculas)."""
+    terminos = [t for palabras in categorias.values() for t in palabras]
+    mensajes = []
+    for _ in range(n):
+        texto = rng.choice(FRASES)
+        if rng.random() < 0.2:
+            termino = rng.choice(terminos)
+            texto += " " + (termino.upper() if rng.random() < 0.3 else termino)
+        mensajes.append(texto)
+    return mensajes
+
+
+def anonimizar_anterior(texto: str, categorias: dict) -> str:
+    """Copia de la version previa de anonimizar_texto."""
+    texto = re.sub(r'\b[\w\.-]+@[\w\.-]+\.\w{2,4}\b', '[EMAIL]', texto)
+    texto = re.sub(r'\b\d{8,15}\b', '[TELEFONO]', texto)
+    for categoria, palabras in categorias.items():
+        for palabra in palabras:
+            texto = re.sub(rf'\b{palabra}\b', f"[CENSURADO_{categoria.upper()}]", texto, flags=re.IGNORECASE)
+    return texto
+
+
+def mensajes_por_seg(funcion, n: int) -> float:
+    inicio = time.perf_counter()
+    funcion()
+    return n / (time.perf_counter() - inicio)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mensajes/s del anonimizador anterior vs compilado")
+    parser.add_argument("--terminos", type=int, nargs="+", default=[10, 100, 1000, 5000])
+    parser.add_argument("--mensajes", type=int, default=50000)
+    parser.add_argument("--mensajes_anterior", type=int, default=500)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    print(f"{'terminos':>9} {'anterior':>12} {'por mensaje':>12} {'por lote':>12} {'compilar (s)':>13} {'iguales':>8}")
+    for n in args.terminos:
+        categorias = vocabulario(n, rng)
+        mensajes = mensajes_sinteticos(args.mensajes, categorias, rng)
+        subconjunto = mensajes[:args.mensajes_anterior]
+
+        inicio = time.perf_counter()
+        anon.configurar_censura(categorias)
+        compilar = time.perf_counter() - inicio
+
+        referencia = []
+        tasa_anterior = mensajes_por_seg(
+            lambda: referencia.extend(anonimizar_anterior(m, categorias) for m in subconjunto), len(subconjunto))
+        tasa_mensaje = mensajes_por_seg(lambda: [anon.anonimizar_texto(m) for m in mensajes], len(mensajes))
+        resultado = []
+        tasa_lote = mensajes_por_seg(lambda: resultado.extend(anon.anonimizar_lote(mensajes)), len(mensajes))
+        iguales = resultado[:len(referencia)] == referencia and resultado == [anon.anonimizar_texto(m) for m in mensajes]
+        print(f"{n:>9} {tasa_anterior:>12,.0f} {tasa_mensaje:>12,.0f} {tasa_lote:>12,.0f} {compilar:>13.3f} {str(iguales):>8}")
+    print("(mensajes/s)")
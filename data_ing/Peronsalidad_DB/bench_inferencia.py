@@ -0,0 +1,119 @@
+import argparse
+import json
+import random
+import time
+import torch
+import torch.nn.functional as F
+import pipeline_conversacion as pc
+
+"""
+Benchmark de la inferencia de pipeline_conversacion.py en CPU.
+Compara el camino anterior (cada conversacion por los tres modelos con batch de 1) con la inferencia
+por lotes ordenados por largo, a varios tamaños de lote. Verifica que el JSON resultante sea el mismo.
+
+Uso:
+    python bench_inferencia.py --conversaciones 64 --batch_sizes 1 4 8 16 32
+    python bench_inferencia.py --input_json formal/example_parsed_anon.json
+"""
+
+FRASES = [
+    "hola como estas", "todo bien por suerte", "el finde fuimos a la costa con la familia",
+    "mañana tengo una reunion de trabajo temprano", "viste el partido de anoche?", "que lindo dia para salir a correr",
+    "estoy preparando el final de la facultad", "me salio el deploy en aws por fin", "hoy cocino un asado",
+    "no me siento muy bien, creo que me resfrie", "cuanto salio el pasaje?", "que pelicula vemos hoy?",
+]
+
+
+def conversaciones_sinteticas(n: int, semilla: int = 0) -> list:
+    """Conversaciones de largo variable (de 2 a 60 mensajes), como en un export real."""
+    rng = random.Random(semilla)
+    conversaciones = []
+    for cid in range(n):
+        mensajes = [{"remitente": rng.choice(["Nico", "juan doe"]), "mensaje": rng.choice(FRASES),
+                     "datetime": "2023-05-12 14:32:10"} for _ in range(rng.randint(2, 60))]
+        conversaciones.append({"conversacion_id": cid, "inicio": mensajes[0]["datetime"], "fin": mensajes[-1]["datetime"],
+                               "remitentes": ["Nico", "juan doe"], "mensajes": mensajes})
+    return conversaciones
+
+
+# ---------- camino anterior (copia de la version previa, batch de 1) ----------
+def emocion_anterior(texto):
+    try:
+        inputs = pc.emo_tokenizer(texto, return_tensors="pt", truncation=True, max_length=512)
+        with torch.no_grad():
+            probs = F.softmax(pc.emo_model(**inputs).logits, dim=-1)[0]
+            idx = torch.argmax(probs).item()
+            if idx < len(pc.emo_labels):
+                return {"emo_user": pc.emo_labels[idx], "emo_score": round(probs[idx].item(), 3)}
+            return {"emo_user": "unknown", "emo_score": 0.0}
+    except Exception:
+        return {"emo_user": "unknown", "emo_score": 0.0}
+
+def tema_anterior(texto):
+    try:
+        if not texto.strip():
+            return {"tema": "otros", "tema_score": 0.0}
+        resultado = pc.topic_classifier(texto, candidate_labels=pc.TOPIC_LABELS, multi_label=False)
+        return {"tema": resultado['labels'][0], "tema_score": round(resultado['scores'][0], 3)}
+    except Exception:
+        return {"tema": "otros", "tema_score": 0.0}
+
+def bigfive_anterior(texto):
+    try:
+        inputs = pc.bf_tokenizer(texto, return_tensors="pt", truncation=True, max_length=512)
+        with torch.no_grad():
+            probs = torch.sigmoid(pc.bf_model(**inputs).logits)[0]
+            return {f"bf_{trait.lower()}": round(probs[i].item(), 3) for i, trait in enumerate(pc.bf_labels)}
+    except Exception:
+        return {f"bf_{trait.lower()}": 0.5 for trait in pc.bf_labels}
+
+def analizar_anterior(conversaciones):
+    resultados = []
+    for conv in conversaciones:
+        texto = " ".join([f"{m['remitente']}: {m['mensaje']}" for m in conv["mensajes"]])
+        resultados.append({
+            "conversacion_id": conv["conversacion_id"],
+            "remitentes": conv["remitentes"],
+            "fecha_inicio": conv["inicio"],
+            "fecha_fin": conv["fin"],
+            "num_mensajes": len(conv["mensajes"]),
+            "texto": texto,
+            **emocion_anterior(texto),
+            **tema_anterior(texto),
+            **bigfive_anterior(texto)
+        })
+    return resultados
+
+
+def diferencias(a: list, b: list) -> int:
+    """Cantidad de conversaciones cuyo JSON no coincide."""
+    return sum(json.dumps(x, sort_keys=True) != json.dumps(y, sort_keys=True) for x, y in zip(a, b))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Conversaciones/seg de la inferencia batch 1 vs por lotes")
+    parser.add_argument("--conversaciones", type=int, default=64, help="Conversaciones sinteticas a analizar")
+    parser.add_argument("--input_json", default=None, help="Mensajes parseados reales en lugar de sinteticos")
+    parser.add_argument("--batch_sizes", type=int, nargs="+", default=[1, 4, 8, 16, 32])
+    args = parser.parse_args()
+
+    if args.input_json:
+        with open(args.input_json, "r", encoding="utf-8") as f:
+            mensajes = pc.filtrar_mensajes_triviales(json.load(f))
+        conversaciones = pc.segmentar_conversaciones_por_dia_y_gap(mensajes)
+    else:
+        conversaciones = conversaciones_sinteticas(args.conversaciones)
+    pc.cargar_modelos()
+    print(f"{len(conversaciones)} conversaciones, {torch.get_num_threads()} threads de torch")
+
+    inicio = time.perf_counter()
+    referencia = analizar_anterior(conversaciones)
+    segundos = time.perf_counter() - inicio
+    print(f"{'camino':<22} {'conv/s':>8} {'distintas':>10}")
+    print(f"{'anterior (batch 1)':<22} {len(conversaciones) / segundos:>8.2f} {0:>10}")
+
+    for batch_size in args.batch_sizes:
+        inicio = time.perf_counter()
+        resultados = pc.analizar_conversaciones(conversaciones, batch_size=batch_size)
+        segundos = time.perf_counter() - inicio
+        print(f"{f'lotes (batch {batch_size})':<22} {len(conversaciones) / segundos:>8.2f} "
+              f"{diferencias(referencia, resultados):>10}")
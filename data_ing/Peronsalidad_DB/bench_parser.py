@@ -0,0 +1,110 @@
+import argparse
+import os
+import random
+import re
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from parser import parse_whatsapp, iterar_whatsapp, parse_whatsapp_jsonl
+
+"""
+Benchmark del parser de exports de WhatsApp.
+Genera un export sintetico (con mensajes multilinea) y mide MB/s de la version anterior (re.match con
+el patron sin compilar y dos strptime por linea) contra el parser en streaming, en lista y escribiendo
+JSON Lines. Tambien mide el pico de memoria de armar la lista vs escribir en streaming.
+
+Uso:
+    python bench_parser.py --mb 200 --mb_memoria 20
+"""
+
+FRASES = [
+    "hola como estas", "todo bien por suerte", "el finde fuimos a la costa con la familia",
+    "mañana tengo una reunion de trabajo temprano", "viste el partido de anoche?", "dale, nos vemos a las 8",
+]
+
+
+def export_sintetico(path: str, mb: float, semilla: int = 0, anio_largo: bool = False):
+    """Escribe un export de ~mb megabytes. Uno de cada diez mensajes tiene lineas de continuacion."""
+    rng = random.Random(semilla)
+    t = datetime(2019, 1, 1, 9, 0, 0)
+    formato = "%-d/%-m/%Y" if anio_largo else "%-d/%-m/%y"
+    objetivo = int(mb * 1024 * 1024)
+    escritos = 0
+    with open(path, "w", encoding="utf-8") as f:
+        while escritos < objetivo:
+            t += timedelta(seconds=rng.randint(5, 4000))
+            linea = f"[{t.strftime(formato)} {t.strftime('%H:%M:%S')}] {rng.choice(['Nico', 'juan doe'])}: {rng.choice(FRASES)}\n"
+            if rng.random() < 0.1:
+                linea += "".join(f"{rng.choice(FRASES)}\n" for _ in range(rng.randint(1, 3)))
+            f.write(linea)
+            escritos += len(linea.encode("utf-8"))
+
+
+def parse_anterior(file_path, chat_tag="Informal"):
+    """Copia de la version previa de parse_whatsapp (descarta las lineas de continuacion)."""
+    pattern = r"\[(\d{1,2}/\d{1,2}/\d{2,4}) (\d{1,2}:\d{2}:\d{2})\] ([^:]+): (.+)"
+    parsed_messages = []
+    with open(file_path, "r", encoding="utf-8") as f:
+        for line in f:
+            match = re.match(pattern, line)
+            if match:
+                fecha_raw, hora, remitente, mensaje = match.groups()
+                try:
+                    fecha = datetime.strptime(fecha_raw, "%d/%m/%y").strftime("%Y-%m-%d")
+                except ValueError:
+                    fecha = datetime.strptime(fecha_raw, "%d/%m/%Y").strftime("%Y-%m-%d")
+                if "cifrados de extremo a extremo" in mensaje.lower():
+                    continue
+                parsed_messages.append({"fecha": fecha, "hora": hora, "remitente": remitente,
+                                        "mensaje": mensaje.strip(), "chat_tag": chat_tag})
+    return parsed_messages
+
+
+def contar(path):
+    return sum(1 for _ in iterar_whatsapp(path))
+
+
+def medir(funcion, *args):
+    inicio = time.perf_counter()
+    resultado = funcion(*args)
+    return time.perf_counter() - inicio, resultado
+
+
+def pico_memoria_mb(funcion, *args) -> float:
+    tracemalloc.start()
+    funcion(*args)
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return pico / 1024 / 1024
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="MB/s del parser de WhatsApp anterior vs en streaming")
+    parser.add_argument("--mb", type=float, default=200, help="Tamaño del export sintetico")
+    parser.add_argument("--mb_memoria", type=float, default=20, help="Tamaño del export para medir el pico de memoria")
+    parser.add_argument("--anio_largo", action="store_true", help="Fechas con año de 4 digitos (dd/mm/aaaa)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directorio:
+        export = os.path.join(directorio, "export.txt")
+        salida = os.path.join(directorio, "export.jsonl")
+        export_sintetico(export, args.mb, anio_largo=args.anio_largo)
+        mb = os.path.getsize(export) / 1024 / 1024
+        print(f"Export sintetico de {mb:.1f} MB")
+        print(f"{'parser':<30} {'MB/s':>8} {'mensajes':>10}")
+
+        segundos, mensajes = medir(parse_anterior, export)
+        print(f"{'anterior (lista)':<30} {mb / segundos:>8.1f} {len(mensajes):>10}   (sin continuaciones)")
+        del mensajes
+        segundos, mensajes = medir(parse_whatsapp, export)
+        print(f"{'parse_whatsapp (lista)':<30} {mb / segundos:>8.1f} {len(mensajes):>10}")
+        del mensajes
+        segundos, n = medir(contar, export)
+        print(f"{'iterar_whatsapp (generador)':<30} {mb / segundos:>8.1f} {n:>10}")
+        segundos, n = medir(parse_whatsapp_jsonl, export, salida)
+        print(f"{'parse_whatsapp_jsonl':<30} {mb / segundos:>8.1f} {n:>10}")
+
+        export_sintetico(export, args.mb_memoria, anio_largo=args.anio_largo)
+        print(f"\nPico de memoria con un export de {args.mb_memoria:.0f} MB:")
+        print(f"  anterior (lista):      {pico_memoria_mb(parse_anterior, export):8.1f} MB")
+        print(f"  parse_whatsapp_jsonl:  {pico_memoria_mb(parse_whatsapp_jsonl, export, salida):8.1f} MB")
@@ -0,0 +1,90 @@
+import argparse
+import json
+import random
+import time
+from datetime import datetime, timedelta
+import pandas as pd
+from pipeline_conversacion import segmentar_conversaciones_por_dia_y_gap
+
+"""
+Benchmark de la segmentacion de conversaciones sobre un chat sintetico de 1M de mensajes.
+Compara la version anterior (loop fila por fila con df.loc e iterrows) con la vectorizada y verifica
+que los cortes de conversacion (y el JSON resultante) sean identicos.
+La version anterior es O(n) con una constante muy alta: se mide sobre los primeros --n_anterior mensajes.
+
+Uso:
+    python bench_segmentacion.py --mensajes 1000000 --n_anterior 20000
+"""
+
+
+def chat_sintetico(n: int, semilla: int = 0) -> list:
+    """Mensajes con gaps de segundos a dias, en el formato de parse_whatsapp."""
+    rng = random.Random(semilla)
+    t = datetime(2018, 1, 1, 9, 0, 0)
+    mensajes = []
+    for _ in range(n):
+        t += timedelta(seconds=rng.choice([5, 30, 120, 600, 3600, 6 * 3600, 20 * 3600, 3 * 86400]))
+        mensajes.append({
+            "fecha": t.strftime("%Y-%m-%d"),
+            "hora": t.strftime("%H:%M:%S"),
+            "remitente": rng.choice(["Nico", "juan doe", "maria"]),
+            "mensaje": "mensaje de prueba",
+            "chat_tag": "Informal"
+        })
+    return mensajes
+
+
+def segmentar_anterior(mensajes, horas_gap=5):
+    """Copia de la version previa de segmentar_conversaciones_por_dia_y_gap."""
+    df = pd.DataFrame(mensajes)
+    df["datetime"] = pd.to_datetime(df["fecha"] + " " + df["hora"])
+    df = df.sort_values("datetime").reset_index(drop=True)
+    df["conv_id"] = 0
+    actual_id = 0
+    for i in range(1, len(df)):
+        t_actual = df.loc[i, "datetime"]
+        t_anterior = df.loc[i - 1, "datetime"]
+        cambio_dia = t_actual.date() != t_anterior.date()
+        gap_grande = (t_actual - t_anterior) > timedelta(hours=horas_gap)
+        if cambio_dia and gap_grande:
+            actual_id += 1
+        df.loc[i, "conv_id"] = actual_id
+    conversaciones = []
+    for cid, grupo in df.groupby("conv_id"):
+        mensajes = []
+        for _, row in grupo.iterrows():
+            mensajes.append({"remitente": row["remitente"], "mensaje": row["mensaje"], "datetime": str(row["datetime"])})
+        conversaciones.append({
+            "conversacion_id": int(cid),
+            "inicio": str(grupo.iloc[0]["datetime"]),
+            "fin": str(grupo.iloc[-1]["datetime"]),
+            "remitentes": list(grupo["remitente"].unique()),
+            "mensajes": mensajes
+        })
+    return conversaciones
+
+
+def medir(funcion, mensajes):
+    inicio = time.perf_counter()
+    conversaciones = funcion(mensajes)
+    return time.perf_counter() - inicio, conversaciones
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Segmentacion fila por fila vs vectorizada")
+    parser.add_argument("--mensajes", type=int, default=1000000)
+    parser.add_argument("--n_anterior", type=int, default=20000, help="Mensajes a medir con la version anterior")
+    args = parser.parse_args()
+
+    mensajes = chat_sintetico(args.mensajes)
+    subconjunto = mensajes[:args.n_anterior]
+
+    seg_anterior, conv_anterior = medir(segmentar_anterior, subconjunto)
+    seg_nueva_sub, conv_nueva_sub = medir(segmentar_conversaciones_por_dia_y_gap, subconjunto)
+    iguales = json.dumps(conv_anterior) == json.dumps(conv_nueva_sub)
+    print(f"{len(subconjunto)} mensajes: anterior {seg_anterior:.2f} s ({len(subconjunto) / seg_anterior:,.0f} msg/s), "
+          f"vectorizada {seg_nueva_sub:.3f} s -> {len(conv_nueva_sub)} conversaciones, identicas: {iguales}")
+
+    seg_nueva, conversaciones = medir(segmentar_conversaciones_por_dia_y_gap, mensajes)
+    print(f"{len(mensajes)} mensajes: vectorizada {seg_nueva:.2f} s ({len(mensajes) / seg_nueva:,.0f} msg/s), "
+          f"{len(conversaciones)} conversaciones")
+    print(f"Version anterior estimada para {len(mensajes)} mensajes: {seg_anterior * len(mensajes) / len(subconjunto):.0f} s")
@@ -0,0 +1,133 @@
+import os
+import json
+import hashlib
+from datetime import datetime
+
+"""
+Manifest de la ingesta incremental de main.py.
+Por cada export (.txt) guarda:
+- tamaño, mtime y sha256 del archivo, y el offset hasta donde se proceso (el tamaño en ese momento).
+- offset_ultimo: donde empieza el ultimo mensaje. Las lineas agregadas al export pueden ser continuacion
+  de ese mensaje, asi que se vuelve a parsear desde ahi y la version nueva reemplaza a la anterior.
+- ultimo_mensaje: fecha y hora del ultimo mensaje procesado.
+- conversacion_abierta: los mensajes (ya anonimizados y filtrados) de la ultima conversacion, que es la
+  unica que puede seguir con los mensajes nuevos.
+- conversaciones: hash del texto de cada conversacion analizada, en el orden de *_conversaciones_analizadas.json.
+- firma: hash del codigo del pipeline y sus parametros; version_modelos: modelos y etiquetas usados.
+
+Con eso main.py saltea los archivos sin cambios; si el export solo crecio (el sha256 de los primeros
+`offset` bytes coincide) parsea solo lo agregado (desde offset_ultimo), lo suma a la conversacion abierta y
+re-analiza solo las conversaciones afectadas. En cualquier otro caso reprocesa el archivo, pero reusa el
+analisis de las conversaciones cuyo texto no cambio.
+
+Este modulo no importa torch: lo usa el proceso principal antes de levantar el pool.
+"""
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MANIFEST_PATH = "manifest_ingesta.json"
+FORMATO_DATETIME = "%Y-%m-%d %H:%M:%S"
+
+
+def cargar_manifest(path=MANIFEST_PATH) -> dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def guardar_manifest(manifest: dict, path=MANIFEST_PATH):
+    """Escritura atomica: un corte a mitad de camino deja el manifest anterior entero."""
+    temporal = f"{path}.tmp"
+    with open(temporal, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    os.replace(temporal, path)
+
+
+def hash_archivo(path, hasta=None) -> str:
+    """sha256 del archivo (o de sus primeros `hasta` bytes), leido por bloques."""
+    h = hashlib.sha256()
+    restante = os.path.getsize(path) if hasta is None else hasta
+    with open(path, "rb") as f:
+        while restante > 0:
+            bloque = f.read(min(1 << 20, restante))
+            if not bloque:
+                break
+            h.update(bloque)
+            restante -= len(bloque)
+    return h.hexdigest()
+
+
+def hash_texto(texto: str) -> str:
+    return hashlib.sha1(texto.encode("utf-8")).hexdigest()
+
+
+def firma_pipeline(**parametros) -> str:
+    """Hash de parser.py, pipeline_conversacion.py y los parametros (min_len, horas_gap...).
+    Si cambia, ningun archivo se da por procesado (el analisis por conversacion se sigue reusando)."""
+    h = hashlib.sha256(json.dumps(parametros, sort_keys=True).encode("utf-8"))
+    for nombre in ("parser.py", "pipeline_conversacion.py"):
+        with open(os.path.join(BASE_DIR, nombre), "rb") as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+
+def sin_cambios(path, entrada, firma) -> bool:
+    """True si el archivo ya fue procesado tal como esta. Solo se calcula el sha256 si cambio el mtime."""
+    if not entrada or entrada.get("firma") != firma:
+        return False
+    tamaño = os.path.getsize(path)
+    if tamaño != entrada["tamaño"]:
+        return False
+    return os.path.getmtime(path) == entrada["mtime"] or hash_archivo(path) == entrada["sha256"]
+
+
+def solo_crecio(path, entrada) -> bool:
+    """True si el export es el procesado antes mas mensajes al final."""
+    return (os.path.getsize(path) > entrada["offset"]
+            and hash_archivo(path, hasta=entrada["offset"]) == entrada["sha256"])
+
+
+def a_datetime(fecha: str, hora: str) -> datetime:
+    return datetime.strptime(f"{fecha} {hora}", FORMATO_DATETIME)
+
+
+def mensajes_parseados(conversacion: dict) -> list:
+    """Mensajes de una conversacion segmentada, de vuelta en el formato de parse_whatsapp."""
+    mensajes = []
+    for m in conversacion["mensajes"]:
+        fecha, hora = m["datetime"].split(" ")
+        mensajes.append({"fecha": fecha, "hora": hora, "remitente": m["remitente"], "mensaje": m["mensaje"]})
+    return mensajes
+
+
+def estado_archivo(path) -> dict:
+    """Tamaño, mtime y sha256 del archivo al empezar a procesarlo."""
+    return {"tamaño": os.path.getsize(path), "mtime": os.path.getmtime(path), "sha256": hash_archivo(path)}
+
+
+def armar_entrada(estado, firma, version_modelos, conversaciones, resultados, ultimo_mensaje,
+                  offset_ultimo=None) -> dict:
+    """Entrada del manifest para un archivo recien procesado.
+    Args:
+        estado (dict): estado_archivo() tomado antes de parsear.
+        conversaciones (list): la ultima conversacion segmentada queda como conversacion abierta.
+        resultados (list): todos los resultados del archivo, en el orden de *_conversaciones_analizadas.json.
+        offset_ultimo (int): comienzo del ultimo mensaje (parser.offset_ultimo_mensaje). Por defecto, el tamaño.
+    """
+    abierta = None
+    if conversaciones:
+        abierta = {
+            "conversacion_id": conversaciones[-1]["conversacion_id"],
+            "inicio": conversaciones[-1]["inicio"],
+            "mensajes": mensajes_parseados(conversaciones[-1])
+        }
+    return {
+        **estado,
+        "offset": estado["tamaño"],
+        "offset_ultimo": estado["tamaño"] if offset_ultimo is None else offset_ultimo,
+        "firma": firma,
+        "version_modelos": version_modelos,
+        "ultimo_mensaje": ultimo_mensaje,
+        "conversacion_abierta": abierta,
+        "conversaciones": [hash_texto(r["texto"]) for r in resultados]
+    }
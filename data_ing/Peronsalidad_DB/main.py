@@ -1,53 +1,301 @@
 import os
-import subprocess
 import json
-from parser import parse_whatsapp, anonimizar_texto
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import multiprocessing as mp
+from parser import parse_whatsapp, iterar_whatsapp, offset_ultimo_mensaje, anonimizar_mensajes
+import ingesta_incremental as ingesta
 
 """ siempre que se lea anon, hace referencia al texto curado (anonimizado)"""
 
+"""
+Driver de ingesta por lote. Antes cada archivo lanzaba pipeline_conversacion.py con subprocess.run, y
+cada corrida volvia a importar torch y a cargar los tres modelos desde cero.
+Ahora es un solo proceso de larga vida: reparte los archivos entre un pool de procesos (uno por grupo
+de cores) y cada worker carga los modelos una sola vez, en el initializer, y los reusa para todos sus
+archivos. Al final se reporta el throughput de cada etapa.
+
+La ingesta es incremental (ver ingesta_incremental.py): los exports sin cambios se saltean, a los que solo
+crecieron se les parsean los mensajes nuevos y se re-analizan solo las conversaciones afectadas, y
+*_conversaciones_analizadas.json se actualiza en el lugar. --completo reprocesa todo.
+"""
 
 folders = ["formal", "informal"]
 
-for folder in folders:
-    if not os.path.exists(folder):
-        print(f"Carpeta no encontrada: {folder}")
-        continue
-    txt_files = [fname for fname in os.listdir(folder) if fname.endswith(".txt")]
-    for fname in txt_files:
-        #Creo la rutas I/O
-        input_path = os.path.join(folder, fname)
-        base = fname.replace(".txt", "")
-        parsed_anon_path = os.path.join(folder, f"{base}_parsed_anon.json")
-        
-        # 1. Parsear
-        print(f"Parseando {input_path} ...")
-        mensajes = parse_whatsapp(input_path, chat_tag=folder.capitalize())
-
-        # 2. Anonimizar (curar)
-        for m in mensajes:
-            m["mensaje"] = anonimizar_texto(m["mensaje"])
-        
-        # 3. Guardar anonimizados
-        with open(parsed_anon_path, "w", encoding="utf-8") as f:
-            json.dump(mensajes, f, indent=2, ensure_ascii=False)
-        print(f"Guardado {parsed_anon_path} ({len(mensajes)} mensajes)")
-        
-        
-        # 4.Ejecuto el pipleine de analisis de conversaciones.
-        """
-        El pipeline se encarga de:
-        - Filtrar mensajes triviales (menos de 6 caracteres)
-        - Agrupar mensajes por conversacion (por dia y gap de 5 horas)
-        - Analizar emociones, temas y big five de cada conversacion
-        - Guardar los resultados en un archivo JSON.
-        
-        """
-        
-        output_path = os.path.join(folder, f"{base}_conversaciones_analizadas.json")
-        print(f"Analizando conversaciones en {parsed_anon_path} ...")
-        subprocess.run([
-            "python", "pipeline_conversacion.py",
-            "--input_json", parsed_anon_path,
-            "--output_json", output_path
-        ])
-print("✅ Procesamiento por lote finalizado.") 
\ No newline at end of file
+
+def listar_archivos(folders):
+    archivos = []
+    for folder in folders:
+        if not os.path.exists(folder):
+            print(f"Carpeta no encontrada: {folder}")
+            continue
+        txt_files = [fname for fname in os.listdir(folder) if fname.endswith(".txt")]
+        archivos.extend((folder, fname) for fname in sorted(txt_files))
+    # Los archivos grandes primero, para que no quede uno grande solo al final
+    return sorted(archivos, key=lambda a: os.path.getsize(os.path.join(*a)), reverse=True)
+
+
+def inicializar_worker(num_threads):
+    """Initializer del pool: carga los modelos una vez por worker y reparte los cores entre workers."""
+    import pipeline_conversacion
+    pipeline_conversacion.cargar_modelos(num_threads=num_threads)
+
+
+def _leer_json(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _escribir_json(datos, path):
+    temporal = f"{path}.tmp"
+    with open(temporal, "w", encoding="utf-8") as f:
+        json.dump(datos, f, indent=2, ensure_ascii=False)
+    os.replace(temporal, path)
+
+
+def _ultimo_mensaje(mensajes, anterior=None):
+    fechas = [f"{m['fecha']} {m['hora']}" for m in mensajes]
+    if anterior:
+        fechas.append(anterior)
+    return max(fechas, key=lambda d: ingesta.a_datetime(*d.split(" "))) if fechas else None
+
+
+def _sin_mensaje(mensajes, mensaje):
+    """Copia de los mensajes (formato de parse_whatsapp) sin la ultima aparicion de `mensaje`."""
+    claves = ("fecha", "hora", "remitente", "mensaje")
+    mensajes = list(mensajes)
+    for i in range(len(mensajes) - 1, -1, -1):
+        if all(mensajes[i][k] == mensaje[k] for k in claves):
+            del mensajes[i]
+            break
+    return mensajes
+
+
+def procesar_incremental(pc, input_path, parsed_anon_path, output_path, chat_tag, entrada, estado, firma,
+                         batch_size, tiempos):
+    """Parsea solo lo agregado al export desde la ultima corrida, lo suma a la conversacion abierta y
+    re-analiza solo las conversaciones afectadas. Devuelve None si no se puede (y hay que reprocesar)."""
+    if not (os.path.exists(parsed_anon_path) and os.path.exists(output_path)):
+        return None
+    anteriores = _leer_json(output_path)
+    # El archivo de salida tiene que ser el que describe el manifest
+    if [ingesta.hash_texto(r["texto"]) for r in anteriores] != entrada["conversaciones"]:
+        return None
+
+    inicio = time.perf_counter()
+    # Se parsea desde el comienzo del ultimo mensaje: las lineas agregadas pueden ser continuacion de ese mensaje
+    nuevos = list(iterar_whatsapp(input_path, chat_tag=chat_tag, desde_byte=entrada["offset_ultimo"]))
+    offset_ultimo = offset_ultimo_mensaje(input_path, hasta=estado["tamaño"])
+    tiempos["parseo"] = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    anonimizar_mensajes(nuevos)
+    tiempos["anonimizacion"] = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    parseados = _leer_json(parsed_anon_path)
+    abierta = entrada["conversacion_abierta"]
+    mensajes_abierta = abierta["mensajes"] if abierta else []
+    if entrada["offset_ultimo"] < entrada["offset"]:
+        # El primer mensaje parseado es el ultimo de la corrida anterior, quizas con mas lineas: reemplaza al viejo
+        if not nuevos:
+            return None
+        mensajes_abierta = _sin_mensaje(mensajes_abierta, parseados.pop())
+    filtrados = pc.filtrar_mensajes_triviales(nuevos)
+    if abierta:
+        # Un mensaje nuevo anterior a la conversacion abierta cambiaria conversaciones ya cerradas
+        inicio_abierta = ingesta.a_datetime(*abierta["inicio"].split(" "))
+        if any(ingesta.a_datetime(m["fecha"], m["hora"]) < inicio_abierta for m in filtrados):
+            return None
+        mensajes = mensajes_abierta + filtrados
+        primer_id = abierta["conversacion_id"]
+        cerradas = anteriores[:-1]
+    else:
+        mensajes = filtrados
+        primer_id = len(anteriores)
+        cerradas = anteriores
+    conversaciones = pc.segmentar_conversaciones_por_dia_y_gap(mensajes) if mensajes else []
+    for conv in conversaciones:
+        conv["conversacion_id"] += primer_id
+    tiempos["segmentacion"] = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    previos = {anteriores[-1]["texto"]: anteriores[-1]} if abierta else {}
+    resultados = cerradas + pc.analizar_conversaciones(conversaciones, batch_size=batch_size, previos=previos)
+    tiempos["inferencia"] = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    if nuevos:
+        _escribir_json(parseados + nuevos, parsed_anon_path)
+    _escribir_json(resultados, output_path)
+    tiempos["escritura"] = time.perf_counter() - inicio
+
+    return {
+        "mensajes": len(nuevos),
+        "conversaciones": len(conversaciones),
+        "manifest": ingesta.armar_entrada(estado, firma, pc.version_modelos(), conversaciones, resultados,
+                                          _ultimo_mensaje(nuevos, entrada["ultimo_mensaje"]), offset_ultimo)
+    }
+
+
+def procesar_archivo(folder, fname, batch_size=16, entrada=None, firma=None):
+    """Parsea, anonimiza y analiza un export. Devuelve conteos, segundos por etapa y la entrada del manifest.
+    Con la entrada del manifest de la corrida anterior, procesa solo lo nuevo o reusa los analisis sin cambios."""
+    import pipeline_conversacion
+
+    tiempos = {}
+    #Creo la rutas I/O
+    input_path = os.path.join(folder, fname)
+    base = fname.replace(".txt", "")
+    parsed_anon_path = os.path.join(folder, f"{base}_parsed_anon.json")
+    output_path = os.path.join(folder, f"{base}_conversaciones_analizadas.json")
+    chat_tag = folder.capitalize()
+    estado = ingesta.estado_archivo(input_path)
+    version = pipeline_conversacion.version_modelos()
+    if entrada and entrada.get("version_modelos") != version:
+        entrada = None
+
+    if entrada and entrada.get("firma") == firma and ingesta.solo_crecio(input_path, entrada):
+        resultado = procesar_incremental(pipeline_conversacion, input_path, parsed_anon_path, output_path, chat_tag,
+                                         entrada, estado, firma, batch_size, tiempos)
+        if resultado is not None:
+            return {"archivo": input_path, "modo": "incremental", "tiempos": tiempos, **resultado}
+        tiempos = {}
+
+    # Analisis anteriores por texto: las conversaciones que no cambiaron no vuelven a pasar por los modelos
+    previos = {}
+    if entrada and os.path.exists(output_path):
+        previos = {r["texto"]: r for r in _leer_json(output_path)}
+
+    # 1. Parsear
+    inicio = time.perf_counter()
+    mensajes = parse_whatsapp(input_path, chat_tag=chat_tag)
+    offset_ultimo = offset_ultimo_mensaje(input_path, hasta=estado["tamaño"])
+    tiempos["parseo"] = time.perf_counter() - inicio
+
+    # 2. Anonimizar (curar)
+    inicio = time.perf_counter()
+    anonimizar_mensajes(mensajes)
+    tiempos["anonimizacion"] = time.perf_counter() - inicio
+
+    # 3. Guardar anonimizados
+    inicio = time.perf_counter()
+    _escribir_json(mensajes, parsed_anon_path)
+    tiempos["escritura"] = time.perf_counter() - inicio
+
+    # 4. Pipeline de analisis de conversaciones, con los modelos ya cargados en este proceso.
+    """
+    El pipeline se encarga de:
+    - Filtrar mensajes triviales (menos de 6 caracteres)
+    - Agrupar mensajes por conversacion (por dia y gap de 5 horas)
+    - Analizar emociones, temas y big five de cada conversacion (salvo las que ya estaban analizadas)
+    - Guardar los resultados en un archivo JSON.
+    """
+    inicio = time.perf_counter()
+    filtrados = pipeline_conversacion.filtrar_mensajes_triviales(mensajes)
+    conversaciones = pipeline_conversacion.segmentar_conversaciones_por_dia_y_gap(filtrados) if filtrados else []
+    tiempos["segmentacion"] = time.perf_counter() - inicio
+    inicio = time.perf_counter()
+    resultados = pipeline_conversacion.analizar_conversaciones(conversaciones, batch_size=batch_size, previos=previos)
+    tiempos["inferencia"] = time.perf_counter() - inicio
+    inicio = time.perf_counter()
+    _escribir_json(resultados, output_path)
+    tiempos["escritura"] += time.perf_counter() - inicio
+
+    return {
+        "archivo": input_path,
+        "modo": "completo",
+        "mensajes": len(mensajes),
+        "conversaciones": len(resultados),
+        "tiempos": tiempos,
+        "manifest": ingesta.armar_entrada(estado, firma, version, conversaciones, resultados, _ultimo_mensaje(mensajes),
+                                         offset_ultimo)
+    }
+
+
+def reportar(resultados, segundos_totales, workers):
+    """Throughput por etapa. Los segundos de cada etapa se suman entre workers (tiempo de CPU de worker)."""
+    mensajes = sum(r["mensajes"] for r in resultados)
+    conversaciones = sum(r["conversaciones"] for r in resultados)
+    etapas = {}
+    for r in resultados:
+        for etapa, segundos in r["tiempos"].items():
+            etapas[etapa] = etapas.get(etapa, 0.0) + segundos
+    unidades = {"parseo": ("mensajes", mensajes), "anonimizacion": ("mensajes", mensajes),
+                "segmentacion": ("mensajes", mensajes), "inferencia": ("conversaciones", conversaciones),
+                "escritura": ("archivos", len(resultados))}
+    print(f"\n{'etapa':<15} {'seg (suma workers)':>19} {'throughput por worker':>28}")
+    for etapa, segundos in etapas.items():
+        unidad, cantidad = unidades.get(etapa, ("items", 0))
+        tasa = cantidad / segundos if segundos > 0 else float("inf")
+        print(f"{etapa:<15} {segundos:>19.2f} {tasa:>18.1f} {unidad}/s")
+    print(f"\n{len(resultados)} archivos, {mensajes} mensajes, {conversaciones} conversaciones "
+          f"en {segundos_totales:.1f} s con {workers} workers "
+          f"({conversaciones / segundos_totales:.1f} conversaciones/s de punta a punta)")
+
+
+def main(folders=folders, workers=None, threads_por_worker=None, batch_size=16, completo=False,
+         manifest_path=ingesta.MANIFEST_PATH):
+    """
+    Args:
+        completo (bool): ignora el manifest y reprocesa todo (por ejemplo, despues de cambiar los modelos).
+    """
+    manifest = {} if completo else ingesta.cargar_manifest(manifest_path)
+    firma = ingesta.firma_pipeline(min_len=6, horas_gap=5)
+    archivos = []
+    for folder, fname in listar_archivos(folders):
+        path = os.path.join(folder, fname)
+        if ingesta.sin_cambios(path, manifest.get(path), firma):
+            print(f"Sin cambios: {path}")
+        else:
+            archivos.append((folder, fname))
+    if not archivos:
+        print("No hay archivos .txt nuevos o modificados para procesar.")
+        return []
+    cores = os.cpu_count() or 1
+    # Cada worker tiene su copia de los tres modelos (~2.5 GB): por defecto un worker cada 4 cores
+    workers = max(1, min(workers or cores // 4, len(archivos)))
+    # Cada worker usa su parte de los cores para torch, asi no compiten entre si
+    threads_por_worker = threads_por_worker or max(1, cores // workers)
+    print(f"Procesando {len(archivos)} archivos con {workers} workers x {threads_por_worker} threads")
+
+    def registrar(resultado):
+        # El manifest se guarda despues de cada archivo: si la corrida se corta, lo hecho queda registrado
+        resultados.append(resultado)
+        manifest[resultado["archivo"]] = resultado.pop("manifest")
+        ingesta.guardar_manifest(manifest, manifest_path)
+        print(f"Guardado {resultado['archivo']} ({resultado['modo']}, {resultado['conversaciones']} conversaciones analizadas)")
+
+    inicio = time.perf_counter()
+    resultados = []
+    if workers == 1:
+        inicializar_worker(threads_por_worker)
+        for folder, fname in archivos:
+            registrar(procesar_archivo(folder, fname, batch_size, manifest.get(os.path.join(folder, fname)), firma))
+    else:
+        # spawn: cada worker arranca limpio (sin heredar el estado de torch del proceso padre)
+        with ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context("spawn"),
+                                 initializer=inicializar_worker, initargs=(threads_por_worker,)) as pool:
+            futuros = {pool.submit(procesar_archivo, folder, fname, batch_size,
+                                   manifest.get(os.path.join(folder, fname)), firma): (folder, fname)
+                       for folder, fname in archivos}
+            for futuro in as_completed(futuros):
+                try:
+                    registrar(futuro.result())
+                except Exception as e:
+                    print(f"Error procesando {os.path.join(*futuros[futuro])}: {e}")
+    reportar(resultados, time.perf_counter() - inicio, workers)
+    print("✅ Procesamiento por lote finalizado.")
+    return resultados
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingesta por lote de exports de WhatsApp (parseo, anonimizacion y analisis)")
+    parser.add_argument("--workers", type=int, default=None, help="Procesos del pool (por defecto, uno cada 4 cores)")
+    parser.add_argument("--threads_por_worker", type=int, default=None, help="Threads de torch por worker")
+    parser.add_argument("--batch_size", type=int, default=16, help="Conversaciones por lote en la inferencia")
+    parser.add_argument("--completo", action="store_true", help="Ignora el manifest y reprocesa todos los archivos")
+    args = parser.parse_args()
+    main(workers=args.workers, threads_por_worker=args.threads_por_worker, batch_size=args.batch_size,
+         completo=args.completo)
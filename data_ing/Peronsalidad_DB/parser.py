@@ -1,9 +1,146 @@
+import io
+import os
 import re
+import sys
+import json
 from datetime import datetime
 import pandas as pd
 
 
 
+"""
+Parser de exports de WhatsApp en streaming.
+Las lineas se leen de a una y los mensajes se emiten con un generador, asi un export de varios GB se
+parsea (y se escribe como JSON Lines) con memoria constante. Los patrones se compilan una sola vez,
+el formato de fecha se decide una vez por archivo y cada fecha distinta se convierte una sola vez.
+Las lineas que no empiezan con [fecha hora] son continuacion del mensaje anterior (mensajes multilinea).
+"""
+
+# [12/5/23 14:32:10] Juan Perez: Hola, ¿cómo estás?
+PATRON_MENSAJE = re.compile(r"\[(\d{1,2}/\d{1,2}/\d{2,4}) (\d{1,2}:\d{2}:\d{2})\] ([^:]+): (.+)")
+# Lineas con encabezado pero sin "remitente: mensaje" (avisos del sistema, adjuntos con marca \u200e)
+PATRON_ENCABEZADO = re.compile(r"\u200e?\[\d{1,2}/\d{1,2}/\d{2,4} \d{1,2}:\d{2}:\d{2}\]")
+# Lo mismo sobre bytes, al comienzo de cualquier linea (con BOM opcional), para buscar desde el final del archivo
+PATRON_ENCABEZADO_BYTES = re.compile(
+    rb"^(?:\xef\xbb\xbf)?(?:\xe2\x80\x8e)?\[\d{1,2}/\d{1,2}/\d{2,4} \d{1,2}:\d{2}:\d{2}\]", re.MULTILINE)
+FORMATOS_FECHA = ("%d/%m/%y", "%d/%m/%Y")
+# json.dumps con argumentos arma un encoder nuevo en cada llamada
+_encoder_jsonl = json.JSONEncoder(ensure_ascii=False).encode
+
+
+def _es_automatico(mensaje: str) -> bool:
+    return "cifrados de extremo a extremo" in mensaje.lower()
+
+
+class _Fechas:
+    """Convierte fechas dd/mm/aa(aa) a YYYY-MM-DD. El formato se decide con la primera fecha del archivo
+    y solo se vuelve a probar el otro si una fecha no lo cumple."""
+
+    def __init__(self):
+        self.formato = None
+        self._cache = {}
+
+    def convertir(self, fecha_raw: str) -> str:
+        fecha = self._cache.get(fecha_raw)
+        if fecha is None:
+            formatos = FORMATOS_FECHA if self.formato is None else (self.formato,) + FORMATOS_FECHA
+            for formato in formatos:
+                try:
+                    fecha = datetime.strptime(fecha_raw, formato).strftime("%Y-%m-%d")
+                except ValueError:
+                    continue
+                self.formato = formato
+                break
+            else:
+                raise ValueError(f"Fecha con formato desconocido: {fecha_raw}")
+            self._cache[fecha_raw] = fecha
+        return fecha
+
+
+def iterar_whatsapp(file_path, chat_tag="Informal", desde_byte=0):
+    """
+    Generador de mensajes de un archivo de WhatsApp, en el orden del archivo.
+    Las lineas de continuacion se agregan al mensaje anterior separadas por salto de linea.
+    Args:
+        file_path (str): La ruta al archivo de WhatsApp.
+        chat_tag (str): El tag del chat.
+        desde_byte (int): Offset (comienzo de linea) desde donde leer, para parsear solo lo agregado al export.
+    Yields:
+        dict: fecha, hora, remitente, mensaje y chat_tag.
+    """
+    fechas = _Fechas()
+    actual = None
+    partes = []
+    # Si el ultimo encabezado se descarto (mensaje automatico), sus continuaciones tambien
+    descartando = False
+
+    # utf-8-sig: algunos exports traen BOM en la primera linea
+    with open(file_path, "rb", buffering=1 << 20) as crudo:
+        crudo.seek(desde_byte)
+        f = io.TextIOWrapper(crudo, encoding="utf-8-sig" if desde_byte == 0 else "utf-8")
+        for line in f:
+            match = PATRON_MENSAJE.match(line)
+            if match is None:
+                if PATRON_ENCABEZADO.match(line):
+                    descartando = True
+                elif actual is not None and not descartando:
+                    partes.append(line.rstrip("\r\n"))
+                continue
+
+            if actual is not None:
+                actual["mensaje"] = "\n".join(partes).strip()
+                yield actual
+                actual = None
+
+            fecha_raw, hora, remitente, mensaje = match.groups()
+            # Omitir mensajes automáticos
+            descartando = _es_automatico(mensaje)
+            if descartando:
+                continue
+            actual = {
+                "fecha": fechas.convertir(fecha_raw),
+                "hora": hora,
+                "remitente": remitente,
+                "mensaje": None,
+                "chat_tag": chat_tag
+            }
+            partes = [mensaje]
+
+    if actual is not None:
+        actual["mensaje"] = "\n".join(partes).strip()
+        yield actual
+
+
+def offset_ultimo_mensaje(file_path, hasta=None, bloque=1 << 20) -> int:
+    """
+    Offset del comienzo del ultimo mensaje en los primeros `hasta` bytes del archivo, buscando desde el final.
+    Las lineas que se agreguen despues pueden ser continuacion de ese mensaje, asi que la ingesta incremental
+    vuelve a parsear desde aca. Si el ultimo encabezado no es un mensaje (aviso del sistema o mensaje
+    automatico) sus continuaciones se descartan igual, y se devuelve `hasta`.
+    """
+    hasta = os.path.getsize(file_path) if hasta is None else hasta
+    with open(file_path, "rb") as f:
+        fin = hasta
+        while True:
+            inicio = max(0, fin - bloque)
+            f.seek(inicio)
+            # Unos bytes de mas para reconocer un encabezado que empieza justo en `fin`
+            datos = f.read(min(hasta, fin + 64) - inicio)
+            # Un match en la posicion 0 de un bloque intermedio puede estar a mitad de linea: lo ve el bloque anterior
+            encabezados = [m.start() for m in PATRON_ENCABEZADO_BYTES.finditer(datos)
+                           if inicio + m.start() <= fin and (m.start() > 0 or inicio == 0)]
+            if encabezados:
+                offset = inicio + encabezados[-1]
+                f.seek(offset)
+                linea = f.read(hasta - offset).split(b"\n", 1)[0]
+                match = PATRON_MENSAJE.match(linea.decode("utf-8-sig" if offset == 0 else "utf-8", errors="replace"))
+                return offset if match and not _es_automatico(match.group(4)) else hasta
+            if inicio == 0:
+                break
+            fin = inicio
+    return hasta
+
+
 def parse_whatsapp(file_path, chat_tag="Informal"):
     """
     Parsea un archivo de WhatsApp y devuelve una lista de mensajes.
@@ -11,38 +148,52 @@ def parse_whatsapp(file_path, chat_tag="Informal"):
     Args:
         file_path (str): La ruta al archivo de WhatsApp.
         chat_tag (str): El tag del chat.
-
-
+    Returns:
+        list: Mensajes (ver iterar_whatsapp). Para archivos grandes usar iterar_whatsapp o parse_whatsapp_jsonl.
     """
-    
-    pattern = r"\[(\d{1,2}/\d{1,2}/\d{2,4}) (\d{1,2}:\d{2}:\d{2})\] ([^:]+): (.+)"
-    parsed_messages = []
+    return list(iterar_whatsapp(file_path, chat_tag))
 
-    with open(file_path, "r", encoding="utf-8") as f:
-        for line in f:
-            match = re.match(pattern, line)
-            if match:
-                fecha_raw, hora, remitente, mensaje = match.groups()
 
-                # Formato standard de fecha
-                try:
-                    fecha = datetime.strptime(fecha_raw, "%d/%m/%y").strftime("%Y-%m-%d")
-                except ValueError:
-                    fecha = datetime.strptime(fecha_raw, "%d/%m/%Y").strftime("%Y-%m-%d")
+def escribir_jsonl(mensajes, output_path) -> int:
+    """Escribe mensajes (lista o generador) como JSON Lines, uno por linea, a medida que llegan.
+    Devuelve la cantidad de mensajes escritos."""
+    n = 0
+    lote = []
+    with open(output_path, "w", encoding="utf-8", buffering=1 << 20) as f:
+        for m in mensajes:
+            lote.append(_encoder_jsonl(m))
+            n += 1
+            if len(lote) >= 1000:
+                f.write("\n".join(lote) + "\n")
+                lote = []
+        if lote:
+            f.write("\n".join(lote) + "\n")
+    return n
 
-                # Omitir mensajes automáticos
-                if "cifrados de extremo a extremo" in mensaje.lower():
-                    continue
 
-                parsed_messages.append({
-                    "fecha": fecha,
-                    "hora": hora,
-                    "remitente": remitente,
-                    "mensaje": mensaje.strip(),
-                    "chat_tag": chat_tag
-                })
+def leer_jsonl(path):
+    """Generador de mensajes de un archivo JSON Lines escrito con escribir_jsonl."""
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
 
-    return parsed_messages
+
+def parse_whatsapp_jsonl(file_path, output_path, chat_tag="Informal", transformar=None) -> int:
+    """
+    Parsea un export y lo escribe como JSON Lines en streaming (memoria constante).
+    Args:
+        file_path (str): La ruta al archivo de WhatsApp.
+        output_path (str): El archivo .jsonl de salida.
+        chat_tag (str): El tag del chat.
+        transformar (callable): Opcional, se aplica al texto de cada mensaje (por ejemplo anonimizar_texto).
+    Returns:
+        int: Cantidad de mensajes escritos.
+    """
+    mensajes = iterar_whatsapp(file_path, chat_tag)
+    if transformar is not None:
+        mensajes = ({**m, "mensaje": transformar(m["mensaje"])} for m in mensajes)
+    return escribir_jsonl(mensajes, output_path)
 
 
 
@@ -57,6 +208,86 @@ CENSURA_CATEGORIAS = {
     "sexual": ["insertar palabras"]
 }
 
+"""
+Anonimizacion compilada: los patrones de mails y telefonos se compilan una vez y todas las palabras
+censuradas van en un solo regex, armado como un trie (las palabras con prefijo comun comparten rama),
+asi el costo por mensaje casi no crece con el tamaño del vocabulario. Una sola pasada reemplaza cada
+termino por la etiqueta de su categoria (si un termino esta en varias, gana la primera, como antes).
+"""
+
+PATRON_EMAIL = re.compile(r'\b[\w\.-]+@[\w\.-]+\.\w{2,4}\b')
+PATRON_TELEFONO = re.compile(r'\b\d{8,15}\b')
+
+
+def _patron_trie(terminos) -> str:
+    """Alternancia de los terminos como trie: (?:casa(?:s)?|perro). Prefiere el termino mas largo."""
+    trie = {}
+    for termino in terminos:
+        nodo = trie
+        for ch in termino:
+            nodo = nodo.setdefault(ch, {})
+        nodo[""] = {}
+
+    def armar(nodo) -> str:
+        ramas = [re.escape(ch) + armar(hijo) for ch, hijo in sorted(nodo.items()) if ch]
+        if not ramas:
+            return ""
+        fin = "" in nodo
+        if len(ramas) == 1 and not fin:
+            return ramas[0]
+        alternancia = "(?:" + "|".join(ramas) + ")"
+        return alternancia + "?" if fin else alternancia
+
+    return armar(trie)
+
+
+class Anonimizador:
+    """Anonimizador compilado para un diccionario de censura {categoria: [palabras]}."""
+
+    def __init__(self, categorias: dict):
+        self.reemplazos = {}
+        for categoria, palabras in categorias.items():
+            for palabra in palabras:
+                # La primera categoria que nombra un termino se queda con el
+                self.reemplazos.setdefault(palabra.lower(), f"[CENSURADO_{categoria.upper()}]")
+        self.patron_censura = None
+        if self.reemplazos:
+            self.patron_censura = re.compile(rf"\b{_patron_trie(self.reemplazos)}\b", re.IGNORECASE)
+
+    def _censurar(self, match) -> str:
+        termino = match.group(0)
+        reemplazo = self.reemplazos.get(termino.lower())
+        if reemplazo is None:  # mayusculas que no vuelven igual con lower() (por ejemplo ß)
+            reemplazo = next(r for t, r in self.reemplazos.items()
+                             if re.fullmatch(re.escape(t), termino, re.IGNORECASE))
+        return reemplazo
+
+    def anonimizar(self, texto: str) -> str:
+        # El patron de mail prueba en cada comienzo de palabra: solo vale la pena si hay una @
+        if "@" in texto:
+            texto = PATRON_EMAIL.sub('[EMAIL]', texto)
+        texto = PATRON_TELEFONO.sub('[TELEFONO]', texto)
+        if self.patron_censura is not None:
+            texto = self.patron_censura.sub(self._censurar, texto)
+        return texto
+
+    def anonimizar_lote(self, textos: list) -> list:
+        """Anonimiza una lista de textos con los patrones ya compilados."""
+        anonimizar = self.anonimizar
+        return [anonimizar(t) for t in textos]
+
+
+_anonimizador = Anonimizador(CENSURA_CATEGORIAS)
+
+
+def configurar_censura(categorias: dict):
+    """Reemplaza el diccionario de censura y recompila el anonimizador."""
+    global _anonimizador
+    CENSURA_CATEGORIAS.clear()
+    CENSURA_CATEGORIAS.update(categorias)
+    _anonimizador = Anonimizador(CENSURA_CATEGORIAS)
+
+
 def anonimizar_texto(texto: str) -> str:
     """
     Anonimiza un texto reemplazando entidades personales, mails y teléfonos, y censurando palabras temáticas.
@@ -65,13 +296,34 @@ def anonimizar_texto(texto: str) -> str:
     Returns:
         str: El texto curado.
     """
-    texto = re.sub(r'\b[\w\.-]+@[\w\.-]+\.\w{2,4}\b', '[EMAIL]', texto)
-    texto = re.sub(r'\b\d{8,15}\b', '[TELEFONO]', texto)
+    return _anonimizador.anonimizar(texto)
+
+
+def anonimizar_lote(textos: list) -> list:
+    """
+    Anonimiza una lista de textos (mismo resultado que anonimizar_texto sobre cada uno).
+    Args:
+        textos (list): Los textos a curar.
+    Returns:
+        list: Los textos curados, en el mismo orden.
+    """
+    return _anonimizador.anonimizar_lote(textos)
 
-    for categoria, palabras in CENSURA_CATEGORIAS.items():
-        for palabra in palabras:
-            texto = re.sub(rf'\b{palabra}\b', f"[CENSURADO_{categoria.upper()}]", texto, flags=re.IGNORECASE)
 
-    return texto
+def anonimizar_mensajes(mensajes: list, lote: int = 10000) -> list:
+    """Anonimiza el campo "mensaje" de una lista de mensajes parseados, en lotes. Modifica la lista y la devuelve."""
+    for inicio in range(0, len(mensajes), lote):
+        bloque = mensajes[inicio:inicio + lote]
+        for m, texto in zip(bloque, anonimizar_lote([m["mensaje"] for m in bloque])):
+            m["mensaje"] = texto
+    return mensajes
 
 
+if __name__ == "__main__":
+    # Uso: python parser.py export.txt salida.jsonl [chat_tag]
+    if len(sys.argv) < 3:
+        print("Uso: python parser.py export.txt salida.jsonl [chat_tag]")
+        sys.exit(1)
+    tag = sys.argv[3] if len(sys.argv) > 3 else "Informal"
+    total = parse_whatsapp_jsonl(sys.argv[1], sys.argv[2], chat_tag=tag, transformar=anonimizar_texto)
+    print(f"{total} mensajes escritos en {sys.argv[2]}")
@@ -1,35 +1,57 @@
 import os
 import json
+import time
 from datetime import datetime, timedelta
 from transformers import AutoTokenizer, AutoModelForSequenceClassification, pipeline
 import torch
 import torch.nn.functional as F
 import pandas as pd
+import numpy as np
 from tqdm import tqdm
 
 ### Configurro los modelos ###
+# Los modelos se cargan una sola vez por proceso, la primera vez que se necesitan (ver cargar_modelos).
+# Asi el driver de main.py puede importar este modulo sin pagar la carga y cada worker los carga una vez.
 
 # Emoción
 EMO_MODEL = "finiteautomata/beto-emotion-analysis"
-emo_tokenizer = AutoTokenizer.from_pretrained(EMO_MODEL)
-emo_model = AutoModelForSequenceClassification.from_pretrained(EMO_MODEL)
-emo_labels = emo_model.config.id2label
+emo_tokenizer = emo_model = emo_labels = None
 
 # Big Five
 BF_MODEL = "Minej/bert-base-personality"
-bf_tokenizer = AutoTokenizer.from_pretrained(BF_MODEL)
-bf_model = AutoModelForSequenceClassification.from_pretrained(BF_MODEL)
+bf_tokenizer = bf_model = None
 bf_labels = ['openness', 'conscientiousness', 'extraversion', 'agreeableness', 'neuroticism']
 
 # Temas (zero-shot)
 TOPIC_MODEL = "facebook/bart-large-mnli"
-topic_classifier = pipeline("zero-shot-classification", model=TOPIC_MODEL)
+topic_classifier = None
 TOPIC_LABELS = [
     "trabajo", "amistad", "familia", "salud", "emociones", 
     "ocio", "estudios", "dinero", "viajes", "tecnología",
     "deportes", "comida", "política", "entretenimiento", "amor"
 ]
 
+def version_modelos() -> str:
+    """Identifica los modelos y etiquetas del analisis: si cambian, no se reusan resultados anteriores."""
+    return json.dumps([EMO_MODEL, BF_MODEL, TOPIC_MODEL, TOPIC_LABELS, HYPOTHESIS_TEMPLATE], ensure_ascii=False)
+
+def cargar_modelos(num_threads=None):
+    """Carga los tres modelos si todavia no estan cargados en este proceso.
+    Args:
+        num_threads (int): threads de torch para este proceso (None deja el default).
+    """
+    global emo_tokenizer, emo_model, emo_labels, bf_tokenizer, bf_model, topic_classifier
+    if num_threads:
+        torch.set_num_threads(num_threads)
+    if topic_classifier is not None:
+        return
+    emo_tokenizer = AutoTokenizer.from_pretrained(EMO_MODEL)
+    emo_model = AutoModelForSequenceClassification.from_pretrained(EMO_MODEL).eval()
+    emo_labels = emo_model.config.id2label
+    bf_tokenizer = AutoTokenizer.from_pretrained(BF_MODEL)
+    bf_model = AutoModelForSequenceClassification.from_pretrained(BF_MODEL).eval()
+    topic_classifier = pipeline("zero-shot-classification", model=TOPIC_MODEL)
+
 ### Filtro mensajes triviales (cortos) ###
 
 def filtrar_mensajes_triviales(mensajes, min_len=6):
@@ -44,44 +66,41 @@ def segmentar_conversaciones_por_dia_y_gap(mensajes, horas_gap=5):
     Args:
         mensajes (list): Lista de mensajes.
         horas_gap (int): Gap de horas para nueva conversacion.
-   Uso pandas por ser un dataset pequeño.
+    Una conversacion nueva empieza cuando, respecto del mensaje anterior, cambia el dia y ademas
+    pasaron mas de horas_gap horas. Las dos condiciones se calculan vectorizadas (diff sobre la
+    columna ordenada) y el id de conversacion es la suma acumulada de los cortes.
     """
-
+    if not mensajes:
+        return []
     df = pd.DataFrame(mensajes)
     # Creo la columna de fecha y hora
     df["datetime"] = pd.to_datetime(df["fecha"] + " " + df["hora"])
     df = df.sort_values("datetime").reset_index(drop=True)
-    df["conv_id"] = 0
-    
-    #inicializo el id de la conversacion
-    actual_id = 0
-    for i in range(1, len(df)):
-        t_actual = df.loc[i, "datetime"]
-        t_anterior = df.loc[i - 1, "datetime"]
-        #Condicion de salto de dia
-        cambio_dia = t_actual.date() != t_anterior.date()
-        #Condicion de gap de horas
-        gap_grande = (t_actual - t_anterior) > timedelta(hours=horas_gap)
-        if cambio_dia and gap_grande:
-            actual_id += 1
-        df.loc[i, "conv_id"] = actual_id
+
+    #Condicion de salto de dia y de gap de horas, contra el mensaje anterior
+    fechas = df["datetime"].dt.normalize()
+    cambio_dia = fechas.ne(fechas.shift())
+    gap_grande = df["datetime"].diff() > timedelta(hours=horas_gap)
+    corte = (cambio_dia & gap_grande).to_numpy(copy=True)
+    corte[0] = False
+    conv_ids = np.cumsum(corte)
+
+    #Creo el diccionario de conversaciones. Cada conversacion es un rango contiguo de filas.
+    remitentes = df["remitente"].to_numpy()
+    textos = df["mensaje"].to_numpy()
+    fechas_str = df["datetime"].dt.strftime("%Y-%m-%d %H:%M:%S").to_numpy()
+    limites = np.flatnonzero(corte).tolist()
     conversaciones = []
-    
-    #Creo el diccionario de conversaciones
-    for cid, grupo in df.groupby("conv_id"):
-        mensajes = []
-        for _, row in grupo.iterrows():
-            mensajes.append({
-                "remitente": row["remitente"],
-                "mensaje": row["mensaje"],
-                "datetime": str(row["datetime"])
-            })
+    for cid, (desde, hasta) in enumerate(zip([0] + limites, limites + [len(df)])):
         conversaciones.append({
-            "conversacion_id": int(cid),
-            "inicio": str(grupo.iloc[0]["datetime"]),
-            "fin": str(grupo.iloc[-1]["datetime"]),
-            "remitentes": list(grupo["remitente"].unique()),
-            "mensajes": mensajes
+            "conversacion_id": int(conv_ids[desde]),
+            "inicio": fechas_str[desde],
+            "fin": fechas_str[hasta - 1],
+            "remitentes": list(dict.fromkeys(remitentes[desde:hasta])),
+            "mensajes": [
+                {"remitente": r, "mensaje": m, "datetime": d}
+                for r, m, d in zip(remitentes[desde:hasta], textos[desde:hasta], fechas_str[desde:hasta])
+            ]
         })
     return conversaciones
 
@@ -89,49 +108,142 @@ def segmentar_conversaciones_por_dia_y_gap(mensajes, horas_gap=5):
 
 ### Analisis de emocion, tema y bigfice por conversacion ###
 def analizar_emocion(texto):
-    try:
-        inputs = emo_tokenizer(texto, return_tensors="pt", truncation=True, max_length=512)
-        with torch.no_grad():
-            logits = emo_model(**inputs).logits
-            probs = F.softmax(logits, dim=-1)[0]
-            idx = torch.argmax(probs).item()
-            if idx < len(emo_labels):
-                return {"emo_user": emo_labels[idx], "emo_score": round(probs[idx].item(), 3)}
-            else:
-                return {"emo_user": "unknown", "emo_score": 0.0}
-    except Exception:
-        return {"emo_user": "unknown", "emo_score": 0.0}
+    return analizar_emocion_lote([texto], batch_size=1)[0]
 
 def analizar_tema(texto):
-    try:
-        if not texto.strip():
-            return {"tema": "otros", "tema_score": 0.0}
-        resultado = topic_classifier(texto, candidate_labels=TOPIC_LABELS, multi_label=False)
-        return {"tema": resultado['labels'][0], "tema_score": round(resultado['scores'][0], 3)}
-    except Exception:
-        return {"tema": "otros", "tema_score": 0.0}
+    return analizar_tema_lote([texto], batch_size=1)[0]
 
 def analizar_bigfive(texto):
+    return analizar_bigfive_lote([texto], batch_size=1)[0]
+
+
+### Inferencia por lotes ###
+"""
+Antes cada conversacion pasaba por los tres modelos de a una (batch de 1), con su propio pase de tokenizer.
+Ahora cada modelo tokeniza todos los textos en un solo pase, los ordena por largo y los corre en lotes
+dinamicos con padding (textos de largo parecido juntos, asi casi no se desperdicia computo en padding).
+El resultado de cada texto es el mismo que con batch de 1: el padding queda enmascarado por el attention_mask.
+"""
+
+# Tope de tokens por lote (filas * largo maximo del lote), para no explotar memoria con textos largos
+MAX_TOKENS_LOTE = 16384
+
+def lotes_por_largo(largos, batch_size, max_tokens=MAX_TOKENS_LOTE, filas_por_texto=1):
+    """Agrupa los indices de los textos en lotes de largo parecido.
+    Devuelve una lista de listas de indices (del texto mas corto al mas largo)."""
+    orden = sorted(range(len(largos)), key=lambda i: largos[i])
+    lotes, actual = [], []
+    for i in orden:
+        # El lote esta ordenado, asi que el largo del nuevo texto es el maximo del lote
+        if actual and (len(actual) >= batch_size or (len(actual) + 1) * filas_por_texto * largos[i] > max_tokens):
+            lotes.append(actual)
+            actual = []
+        actual.append(i)
+    if actual:
+        lotes.append(actual)
+    return lotes
+
+def _pad(tokenizer, encodings, filas):
+    return tokenizer.pad({k: [encodings[k][f] for f in filas] for k in encodings.keys()}, return_tensors="pt")
+
+def _inferir(textos, tokenizer, model, batch_size, postproceso, fallback):
+    """Corre un clasificador sobre todos los textos en lotes ordenados por largo.
+    postproceso(logits) -> lista de resultados del lote. Si un lote falla, sus textos devuelven fallback."""
+    resultados = [None] * len(textos)
+    if not textos:
+        return resultados
+    encodings = tokenizer(textos, truncation=True, max_length=512)
+    largos = [len(ids) for ids in encodings["input_ids"]]
+    for lote in lotes_por_largo(largos, batch_size):
+        try:
+            with torch.inference_mode():
+                logits = model(**_pad(tokenizer, encodings, lote)).logits
+            for i, resultado in zip(lote, postproceso(logits)):
+                resultados[i] = resultado
+        except Exception:
+            for i in lote:
+                resultados[i] = dict(fallback)
+    return resultados
+
+def analizar_emocion_lote(textos, batch_size=16):
+    cargar_modelos()
+    def postproceso(logits):
+        probs = F.softmax(logits, dim=-1)
+        salida = []
+        for fila in probs:
+            idx = torch.argmax(fila).item()
+            if idx < len(emo_labels):
+                salida.append({"emo_user": emo_labels[idx], "emo_score": round(fila[idx].item(), 3)})
+            else:
+                salida.append({"emo_user": "unknown", "emo_score": 0.0})
+        return salida
+    return _inferir(textos, emo_tokenizer, emo_model, batch_size, postproceso,
+                    {"emo_user": "unknown", "emo_score": 0.0})
+
+def analizar_bigfive_lote(textos, batch_size=16):
+    cargar_modelos()
+    def postproceso(logits):
+        probs = torch.sigmoid(logits)
+        return [{f"bf_{trait.lower()}": round(fila[i].item(), 3) for i, trait in enumerate(bf_labels)} for fila in probs]
+    return _inferir(textos, bf_tokenizer, bf_model, batch_size, postproceso,
+                    {f"bf_{trait.lower()}": 0.5 for trait in bf_labels})
+
+# Mismo armado que el pipeline zero-shot de transformers: un par (texto, hipotesis) por etiqueta
+HYPOTHESIS_TEMPLATE = "This example is {}."
+
+def _entailment_id(model):
+    for label, ind in model.config.label2id.items():
+        if label.lower().startswith("entail"):
+            return ind
+    return -1
+
+def analizar_tema_lote(textos, batch_size=16):
+    """Zero-shot de temas en lotes. Replica al pipeline (multi_label=False): softmax de los logits de
+    entailment sobre las etiquetas de cada texto, pero con todos los pares de varios textos en un lote."""
+    cargar_modelos()
+    resultados = [{"tema": "otros", "tema_score": 0.0} for _ in textos]
+    validos = [i for i, t in enumerate(textos) if t.strip()]
+    if not validos:
+        return resultados
+    tokenizer, model = topic_classifier.tokenizer, topic_classifier.model
+    entail = _entailment_id(model)
+    n_labels = len(TOPIC_LABELS)
+    hipotesis = [HYPOTHESIS_TEMPLATE.format(label) for label in TOPIC_LABELS]
     try:
-        inputs = bf_tokenizer(texto, return_tensors="pt", truncation=True, max_length=512)
-        with torch.no_grad():
-            logits = bf_model(**inputs).logits
-            probs = torch.sigmoid(logits)[0]
-            return {f"bf_{trait.lower()}": round(probs[i].item(), 3) for i, trait in enumerate(bf_labels)}
+        encodings = tokenizer(
+            [textos[i] for i in validos for _ in TOPIC_LABELS],
+            hipotesis * len(validos),
+            truncation="only_first"
+        )
     except Exception:
-        return {f"bf_{trait.lower()}": 0.5 for trait in bf_labels}
+        return resultados
+    # Largo de cada texto = el de su par mas largo
+    largos = [max(len(encodings["input_ids"][j * n_labels + k]) for k in range(n_labels)) for j in range(len(validos))]
+    for lote in lotes_por_largo(largos, batch_size, filas_por_texto=n_labels):
+        filas = [j * n_labels + k for j in lote for k in range(n_labels)]
+        try:
+            with torch.inference_mode():
+                logits = model(**_pad(tokenizer, encodings, filas)).logits
+            scores = F.softmax(logits[:, entail].reshape(len(lote), n_labels), dim=-1)
+            for j, fila in zip(lote, scores):
+                mejor = torch.argmax(fila).item()
+                resultados[validos[j]] = {"tema": TOPIC_LABELS[mejor], "tema_score": round(fila[mejor].item(), 3)}
+        except Exception:
+            continue
+    return resultados
 
 
 
 
 # ========== Pipeline principal al ejecutar ==========
-def main(input_json, output_json, min_len=6, horas_gap=5):
+def main(input_json, output_json, min_len=6, horas_gap=5, batch_size=16):
     """
     Pipeline principal al ejecutar el script.
     Args:
         input_json (str): Archivo JSON de mensajes (anonimizados y parseados).
         output_json (str): Archivo de salida JSON por conversación.
         min_len (int): Longitud mínima de mensaje para considerar.
+        batch_size (int): Conversaciones por lote en la inferencia de los modelos.
         el resultado es un json por conversacion con los siguientes campos:
         - conversacion_id: id de la conversacion.
         - remitentes: lista de remitentes.
@@ -143,15 +255,54 @@ def main(input_json, output_json, min_len=6, horas_gap=5):
         """
     with open(input_json, "r", encoding="utf-8") as f:
         mensajes = json.load(f)
+    resultados = procesar_mensajes(mensajes, min_len=min_len, horas_gap=horas_gap, batch_size=batch_size)
+    with open(output_json, "w", encoding="utf-8") as f:
+        json.dump(resultados, f, indent=2, ensure_ascii=False)
+    print(f"✅ Guardado: {output_json} ({len(resultados)} conversaciones)")
+
+def procesar_mensajes(mensajes, min_len=6, horas_gap=5, batch_size=16, tiempos=None):
+    """Filtra, agrupa y analiza una lista de mensajes parseados. Es el pipeline de main() sin el I/O,
+    para reusarlo desde el driver de main.py con los modelos ya cargados.
+    Args:
+        tiempos (dict): si se pasa, se le suman los segundos de cada etapa ("segmentacion", "inferencia").
+    """
+    inicio = time.perf_counter()
     mensajes_filtrados = filtrar_mensajes_triviales(mensajes, min_len=min_len)
-    conversaciones = segmentar_conversaciones_por_dia_y_gap(mensajes_filtrados, horas_gap=horas_gap)
+    conversaciones = segmentar_conversaciones_por_dia_y_gap(mensajes_filtrados, horas_gap=horas_gap) if mensajes_filtrados else []
+    medio = time.perf_counter()
+    resultados = analizar_conversaciones(conversaciones, batch_size=batch_size)
+    if tiempos is not None:
+        tiempos["segmentacion"] = tiempos.get("segmentacion", 0.0) + medio - inicio
+        tiempos["inferencia"] = tiempos.get("inferencia", 0.0) + time.perf_counter() - medio
+    return resultados
+
+# Campos del resultado que salen de la conversacion; el resto sale de los modelos
+CAMPOS_CONVERSACION = ("conversacion_id", "remitentes", "fecha_inicio", "fecha_fin", "num_mensajes", "texto")
+
+def analizar_conversaciones(conversaciones, batch_size=16, previos=None):
+    """Corre los tres modelos sobre todas las conversaciones, cada uno en lotes, y arma el resultado por conversacion.
+    Args:
+        previos (dict): texto -> resultado de una corrida anterior. Las conversaciones con el mismo texto
+            reusan ese analisis y no pasan por los modelos (ingesta incremental).
+    """
+    previos = previos or {}
+    # Concatenar texto con remitente
+    textos = [" ".join([f"{m['remitente']}: {m['mensaje']}" for m in conv["mensajes"]]) for conv in conversaciones]
+    pendientes = list(dict.fromkeys(t for t in textos if t not in previos))
+    nuevos = {}
+    if pendientes:
+        etapas = [("emocion", analizar_emocion_lote), ("tema", analizar_tema_lote), ("bigfive", analizar_bigfive_lote)]
+        analisis = []
+        for nombre, analizar in tqdm(etapas, desc=f"Analizando {len(pendientes)} conversaciones"):
+            analisis.append(analizar(pendientes, batch_size=batch_size))
+        for texto, analisis_emo, analisis_tema, analisis_bf in zip(pendientes, *analisis):
+            nuevos[texto] = {**analisis_emo, **analisis_tema, **analisis_bf}
     resultados = []
-    for conv in tqdm(conversaciones, desc="Analizando conversaciones"):
-        # Concatenar texto con remitente
-        texto = " ".join([f"{m['remitente']}: {m['mensaje']}" for m in conv["mensajes"]])
-        analisis_emo = analizar_emocion(texto)
-        analisis_tema = analizar_tema(texto)
-        analisis_bf = analizar_bigfive(texto)
+    for conv, texto in zip(conversaciones, textos):
+        if texto in nuevos:
+            analisis_modelos = nuevos[texto]
+        else:
+            analisis_modelos = {k: v for k, v in previos[texto].items() if k not in CAMPOS_CONVERSACION}
         resultado = {
             "conversacion_id": conv["conversacion_id"],
             "remitentes": conv["remitentes"],
@@ -159,14 +310,10 @@ def main(input_json, output_json, min_len=6, horas_gap=5):
             "fecha_fin": conv["fin"],
             "num_mensajes": len(conv["mensajes"]),
             "texto": texto,
-            **analisis_emo,
-            **analisis_tema,
-            **analisis_bf
+            **analisis_modelos
         }
         resultados.append(resultado)
-    with open(output_json, "w", encoding="utf-8") as f:
-        json.dump(resultados, f, indent=2, ensure_ascii=False)
-    print(f"✅ Guardado: {output_json} ({len(resultados)} conversaciones)")
+    return resultados
 
 if __name__ == "__main__":
     import argparse
@@ -177,5 +324,6 @@ if __name__ == "__main__":
     parser.add_argument("--output_json", required=True, help="Archivo de salida JSON por conversación")
     parser.add_argument("--min_len", type=int, default=6, help="Longitud mínima de mensaje para considerar")
     parser.add_argument("--horas_gap", type=int, default=5, help="Gap de horas para nueva conversación")
+    parser.add_argument("--batch_size", type=int, default=16, help="Conversaciones por lote en la inferencia")
     args = parser.parse_args()
-    main(args.input_json, args.output_json, min_len=args.min_len, horas_gap=args.horas_gap) 
\ No newline at end of file
+    main(args.input_json, args.output_json, min_len=args.min_len, horas_gap=args.horas_gap, batch_size=args.batch_size) 
\ No newline at end of file
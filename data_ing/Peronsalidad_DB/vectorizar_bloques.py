@@ -1,46 +1,148 @@
 import os
 import json
+import time
+import argparse
 import numpy as np
-from sentence_transformers import SentenceTransformer
 
 """
 Este script vectoriza los bloques de texto de las conversaciones analizadas.
 Mucho cuidado con el modelo de embeddings y la dimensionalidad.
 Corroborar que la dimensionalidad es la misma que cuando se haga el RAG
 
+Los bloques se leen archivo por archivo y se vectorizan por tramos con model.encode en lotes
+(--batch_size), o con el pool multiproceso de sentence-transformers (--procesos). Cada tramo se escribe
+en un .npy float32 preasignado y mapeado en memoria, y la metadata se escribe como JSON Lines a medida
+que avanza, asi un corpus grande no se junta entero en RAM. Al final se reportan bloques/seg.
 
+Los embeddings se guardan normalizados (norma 1) y los textos en textos.blob + textos.offsets.npy (UTF-8
+concatenado y offsets, el formato de poc/corpus_personalidad.py): con la carpeta de salida el PoC arma el
+indice de ejemplos de estilo (poc/indice_estilo.py) abriendo todo con mmap, sin copiar la matriz.
+
+Todo se escribe en archivos .tmp y al final se reemplaza con os.replace, metadata.jsonl ultimo: se puede regenerar
+sobre la carpeta que estan usando los workers (que tienen los archivos viejos mapeados) sin romperlos, y un
+indice a medio escribir nunca queda con los nombres finales.
 """
 
+# Cambiar por uno de 1536 dimensiones!!
+MODELO = 'paraphrase-multilingual-MiniLM-L12-v2'
+folders = ["formal", "informal"]
+# Orden de publicacion: metadata.jsonl va ultimo (es el que mira el PoC junto con embeddings.npy)
+ARCHIVOS_SALIDA = ("embeddings.npy", "textos.offsets.npy", "textos.blob", "metadata.jsonl")
 
-# 1. Cargar modelo de embeddings (cambiar por uno de 1536 dimensiones!!")
-model = SentenceTransformer('paraphrase-multilingual-MiniLM-L12-v2')
 
-# 2. Leer todos los bloques
-folders = ["formal", "informal"]
-all_blocks = []
-for folder in folders:
-    if not os.path.exists(folder):
-        continue
-    for fname in os.listdir(folder):
-        if fname.endswith("_conversaciones_analizadas.json"):
-            with open(os.path.join(folder, fname), "r", encoding="utf-8") as f:
-                all_blocks.extend(json.load(f))
-
-# 3. Vectorizar cada bloque
-embeddings = []
-metadata = []
-for bloque in all_blocks:
-    texto = bloque["texto"]
-    emb = model.encode(texto)
-    embeddings.append(emb)
-
-    #recorro las claves k y valores v del diccionario e incluyo la metadata que no sea texto (convversacion)
-    meta = {k: v for k, v in bloque.items() if k != "texto"}
-    metadata.append(meta)
-
-# 4. Guardar embeddings y metadata
-np.save("embeddings.npy", np.array(embeddings))
-with open("metadata.json", "w", encoding="utf-8") as f:
-    json.dump(metadata, f, indent=2, ensure_ascii=False)
-
-print(f"Listo: {len(embeddings)} bloques vectorizados y guardados.") 
\ No newline at end of file
+def cargar_modelo(nombre=MODELO):
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(nombre)
+
+
+def archivos_analizados(folders):
+    for folder in folders:
+        if not os.path.exists(folder):
+            continue
+        for fname in sorted(os.listdir(folder)):
+            if fname.endswith("_conversaciones_analizadas.json"):
+                yield os.path.join(folder, fname)
+
+
+def iterar_bloques(folders):
+    """Generador de bloques; solo hay un archivo de conversaciones analizadas en memoria a la vez.
+    Los bloques sin "carpeta" toman la carpeta del archivo (formal/informal) como formalidad."""
+    for path in archivos_analizados(folders):
+        carpeta = os.path.basename(os.path.dirname(path))
+        with open(path, "r", encoding="utf-8") as f:
+            for bloque in json.load(f):
+                bloque.setdefault("carpeta", carpeta)
+                yield bloque
+
+
+def contar_bloques(folders) -> int:
+    """Primera pasada: cantidad de bloques, para preasignar el .npy."""
+    return sum(1 for _ in iterar_bloques(folders))
+
+
+def tramos(bloques, tamaño):
+    tramo = []
+    for bloque in bloques:
+        tramo.append(bloque)
+        if len(tramo) >= tamaño:
+            yield tramo
+            tramo = []
+    if tramo:
+        yield tramo
+
+
+def vectorizar(folders=folders, salida_dir=".", batch_size=64, procesos=0, modelo=None, tramo=None):
+    """
+    Vectoriza todos los bloques y escribe embeddings.npy (float32, N x dim, filas normalizadas), metadata.jsonl
+    (una linea por fila) y los textos en textos.blob + textos.offsets.npy.
+    Args:
+        folders (list): Carpetas con los *_conversaciones_analizadas.json.
+        salida_dir (str): Carpeta de salida.
+        batch_size (int): Textos por lote de model.encode.
+        procesos (int): Si es mayor a 1, usa el pool multiproceso de sentence-transformers con esa cantidad de procesos (CPU).
+        modelo: SentenceTransformer ya cargado (por defecto se carga MODELO).
+        tramo (int): Bloques que se vectorizan y escriben por vez (por defecto 16 lotes).
+    Returns:
+        int: Cantidad de bloques vectorizados.
+    """
+    n = contar_bloques(folders)
+    if n == 0:
+        print("No hay bloques para vectorizar.")
+        return 0
+    modelo = modelo or cargar_modelo()
+    dim = modelo.get_sentence_embedding_dimension()
+    tramo = tramo or batch_size * 16
+    os.makedirs(salida_dir, exist_ok=True)
+    temporal = {nombre: os.path.join(salida_dir, nombre + ".tmp") for nombre in ARCHIVOS_SALIDA}
+    embeddings = np.lib.format.open_memmap(temporal["embeddings.npy"], mode="w+", dtype=np.float32, shape=(n, dim))
+    offsets = np.lib.format.open_memmap(temporal["textos.offsets.npy"], mode="w+", dtype=np.int64, shape=(n + 1,))
+    offsets[0] = 0
+
+    pool = modelo.start_multi_process_pool(target_devices=["cpu"] * procesos) if procesos > 1 else None
+    inicio = time.perf_counter()
+    fila = 0
+    try:
+        with open(temporal["metadata.jsonl"], "w", encoding="utf-8") as f_meta, \
+                open(temporal["textos.blob"], "wb") as f_textos:
+            for bloques in tramos(iterar_bloques(folders), tramo):
+                textos = [b["texto"] for b in bloques]
+                if pool is not None:
+                    vectores = modelo.encode_multi_process(textos, pool, batch_size=batch_size,
+                                                           normalize_embeddings=True)
+                else:
+                    vectores = modelo.encode(textos, batch_size=batch_size, convert_to_numpy=True,
+                                             normalize_embeddings=True)
+                embeddings[fila:fila + len(bloques)] = vectores
+                codificados = [t.encode("utf-8") for t in textos]
+                f_textos.write(b"".join(codificados))
+                offsets[fila + 1:fila + len(bloques) + 1] = offsets[fila] + np.cumsum([len(c) for c in codificados])
+                fila += len(bloques)
+
+                #recorro las claves k y valores v del diccionario e incluyo la metadata que no sea texto (convversacion)
+                for bloque in bloques:
+                    meta = {k: v for k, v in bloque.items() if k != "texto"}
+                    f_meta.write(json.dumps(meta, ensure_ascii=False) + "\n")
+                segundos = time.perf_counter() - inicio
+                print(f"{fila}/{n} bloques ({fila / segundos:.1f} bloques/s)")
+    finally:
+        if pool is not None:
+            modelo.stop_multi_process_pool(pool)
+        embeddings.flush()
+        offsets.flush()
+        del embeddings, offsets
+
+    # Recien con todo escrito se publican los archivos (cada os.replace es atomico)
+    for nombre in ARCHIVOS_SALIDA:
+        os.replace(temporal[nombre], os.path.join(salida_dir, nombre))
+    segundos = time.perf_counter() - inicio
+    print(f"Listo: {fila} bloques vectorizados y guardados en {segundos:.1f} s ({fila / segundos:.1f} bloques/s).")
+    return fila
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Vectoriza los bloques de conversaciones analizadas")
+    parser.add_argument("--batch_size", type=int, default=64, help="Textos por lote de model.encode")
+    parser.add_argument("--procesos", type=int, default=0, help="Procesos del pool de sentence-transformers (0 = un proceso)")
+    parser.add_argument("--salida", default=".", help="Carpeta de salida de embeddings.npy y metadata.jsonl")
+    args = parser.parse_args()
+    vectorizar(salida_dir=args.salida, batch_size=args.batch_size, procesos=args.procesos)
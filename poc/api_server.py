@@ -1,5 +1,6 @@
 from fastapi import FastAPI, HTTPException, Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from pydantic import BaseModel
 import os
@@ -7,17 +8,30 @@ import json
 from pathlib import Path
 import datetime
 import time
-from collections import defaultdict
+import asyncio
+from contextlib import asynccontextmanager
 from typing import Optional
 
 # Import the graph from graph.py
 from graph import graph
+from clients import aembed_query, vector_backend
+from response_cache import desde_entorno as response_cache_from_env
+from chat_logger import desde_entorno as chat_logger_from_env
+from rate_limiter import desde_entorno as rate_limiter_from_env
+from sesiones import desde_entorno as sessions_from_env
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Flush pending log entries on shutdown"""
+    yield
+    chat_logger.cerrar()
 
 # Initialize FastAPI
 app = FastAPI(
     title="Nico Chatbot API",
     description="API for Nico's digital twin with temporal and factual memory",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Configure CORS for production deployment
@@ -37,6 +51,9 @@ app.add_middleware(
 LOGS_DIR = Path("logs")
 LOGS_DIR.mkdir(exist_ok=True)
 
+# Append-only JSONL chat log, written by a background thread
+chat_logger = chat_logger_from_env(LOGS_DIR)
+
 # Security configuration
 SECRET_TOKEN = os.getenv("SECRET_TOKEN", "your-secret-token-here")
 REQUIRE_TOKEN = os.getenv("REQUIRE_TOKEN", "true").lower() == "true"
@@ -47,38 +64,52 @@ if REQUIRE_TOKEN and SECRET_TOKEN == "your-secret-token-here":
     print("Example: export SECRET_TOKEN='your-actual-secret-token-here'")
     exit(1)
 
+# Validate the vector backend at startup: inside the graph a bad value would only show up as a
+# retrieval error on every request
+try:
+    vector_backend()
+except ValueError as e:
+    print(f"ERROR: {e}")
+    exit(1)
+
 # Rate limiting configuration
 RATE_LIMIT_REQUESTS = int(os.getenv("RATE_LIMIT_REQUESTS", "60"))  # requests per minute
 RATE_LIMIT_WINDOW = int(os.getenv("RATE_LIMIT_WINDOW", "60"))     # seconds
 
-# Store for rate limiting by IP
-request_counts = defaultdict(list)
+# Rate limiting by IP (sliding window counter, O(1) per check; RATE_LIMIT_BACKEND=sqlite shares it across workers)
+rate_limiter = rate_limiter_from_env(RATE_LIMIT_REQUESTS, RATE_LIMIT_WINDOW)
 
 # Security dependencies
 security = HTTPBearer(auto_error=False)
 
-def clean_old_requests():
-    """Remove requests older than the rate limit window"""
-    current_time = time.time()
-    for ip in list(request_counts.keys()):
-        request_counts[ip] = [req_time for req_time in request_counts[ip] 
-                             if current_time - req_time < RATE_LIMIT_WINDOW]
+# Semantic response cache in front of the graph (None when RESPONSE_CACHE_ENABLED=false).
+# Question embeddings go through the shared embedding cache, so factual_node reuses them on a miss.
+response_cache = response_cache_from_env(aembed=aembed_query)
+
+# Conversation memory per X-Session-ID: bounded window of recent turns plus a rolling summary
+# (None when SESSION_ENABLED=false; SESSION_BACKEND=sqlite persists it and shares it across workers)
+sessions = sessions_from_env()
 
 def check_rate_limit(ip: str) -> bool:
     """Check if IP has exceeded rate limit"""
-    clean_old_requests()
-    current_time = time.time()
-    
-    if len(request_counts[ip]) >= RATE_LIMIT_REQUESTS:
-        return False
-    
-    request_counts[ip].append(current_time)
-    return True
+    return rate_limiter.permitir(ip)
 
 def get_client_ip(request: Request) -> str:
     """Get client IP address"""
     return request.headers.get('X-Forwarded-For', request.client.host)
 
+async def session_history(session_id: Optional[str]) -> list:
+    """Previous turns of the session as graph messages ([] without X-Session-ID or session store).
+    Runs in a thread: with SESSION_BACKEND=sqlite a busy database would otherwise block the event loop."""
+    if sessions is None or not session_id:
+        return []
+    return await asyncio.to_thread(sessions.mensajes, session_id)
+
+async def save_turn(session_id: Optional[str], message: str, response: str):
+    """Append a finished turn to the session (in a thread, like session_history)"""
+    if sessions is not None and session_id:
+        await asyncio.to_thread(sessions.agregar, session_id, message, response)
+
 def require_auth(credentials: Optional[HTTPAuthorizationCredentials] = Depends(security), 
                 request: Request = None) -> bool:
     """Dependency to require authentication and check rate limiting"""
@@ -118,7 +149,7 @@ class ErrorResponse(BaseModel):
     detail: Optional[str] = None
 
 def log_message(message_data: dict):
-    """Log message data to JSON file"""
+    """Log message data to the daily JSONL file"""
     timestamp = datetime.datetime.now().isoformat()
     log_entry = {
         "timestamp": timestamp,
@@ -126,26 +157,14 @@ def log_message(message_data: dict):
         "user_message": message_data.get("message", ""),
         "assistant_response": message_data.get("response", ""),
         "processing_time_ms": message_data.get("processing_time", 0),
+        "time_to_first_token_ms": message_data.get("time_to_first_token", None),
         "graph_state": message_data.get("graph_state", {}),
+        "cache_hit": message_data.get("cache_hit", False),
         "error": message_data.get("error", None)
     }
     
-    # Create log file with date
-    log_file = LOGS_DIR / f"chat_log_{datetime.datetime.now().strftime('%Y-%m-%d')}.json"
-    
-    # Load existing logs or create new list
-    try:
-        with open(log_file, 'r', encoding='utf-8') as f:
-            logs = json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        logs = []
-    
-    # Add new log entry
-    logs.append(log_entry)
-    
-    # Save updated logs
-    with open(log_file, 'w', encoding='utf-8') as f:
-        json.dump(logs, f, indent=2, ensure_ascii=False)
+    # Queued for the background writer: no disk I/O on the request path
+    chat_logger.log(log_entry)
     
     # Also log to console for debugging
     print(f"[LOG] {timestamp} - User: {log_entry['user_message'][:50]}... - Response: {log_entry['assistant_response'][:50]}...")
@@ -171,8 +190,9 @@ async def chat(
 ):
     """Main chat endpoint - processes user messages"""
     start_time = datetime.datetime.now()
+    session_id = http_request.headers.get('X-Session-ID') if http_request else None
     message_data = {
-        "session_id": http_request.headers.get('X-Session-ID', 'default') if http_request else 'default',
+        "session_id": session_id or 'default',
         "message": "",
         "response": "",
         "processing_time": 0,
@@ -188,11 +208,19 @@ async def chat(
 
         message_data["message"] = request.message
 
-        # Initialize the state with the user message
-        initial_state = {"messages": [{"role": "user", "content": request.message}]}
+        # Initialize the state with the session history and the user message
+        history = await session_history(session_id)
+        initial_state = {"messages": history + [{"role": "user", "content": request.message}]}
         
-        # Run the graph and get the final result
-        result = graph.invoke(initial_state)
+        # Answer repeated / near-duplicate questions from the cache. Answers that depend on
+        # earlier turns are neither served from nor stored in the cache.
+        use_cache = response_cache is not None and not history
+        result = await response_cache.abuscar(request.message) if use_cache else None
+        message_data["cache_hit"] = result is not None
+
+        # Run the graph asynchronously so slow LLM/Pinecone calls don't block other requests
+        if result is None:
+            result = await graph.ainvoke(initial_state)
         
         # Store graph state for logging
         message_data["graph_state"] = {
@@ -200,7 +228,10 @@ async def chat(
             "factual": result.get("factual", ""),
             "temporal": result.get("temporal", ""),
             "personality": result.get("personality", ""),
-            "response": result.get("response", "")
+            "response": result.get("response", ""),
+            "prompt_tokens": result.get("prompt_tokens", {}),
+            "timings": result.get("timings", {}),
+            "errores": result.get("errores", {})
         }
         
         # Extract the response
@@ -211,8 +242,13 @@ async def chat(
         end_time = datetime.datetime.now()
         processing_time = (end_time - start_time).total_seconds() * 1000
         message_data["processing_time"] = round(processing_time, 2)
+
+        # A degraded answer (a retrieval node failed) is not cached: it would outlive the outage
+        if use_cache and not message_data["cache_hit"] and not message_data["graph_state"]["errores"]:
+            response_cache.guardar(request.message, message_data["graph_state"], processing_time)
+        await save_turn(session_id, request.message, response)
         
-        # Log the successful interaction
+        # Log the successful interaction (only enqueued; the chat logger thread writes it)
         log_message(message_data)
         
         return ChatResponse(response=response)
@@ -232,18 +268,143 @@ async def chat(
         print(f"Error: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
+def sse_event(event: str, data: dict) -> str:
+    """Format one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.post("/api/chat/stream")
+async def chat_stream(
+    request: ChatRequest,
+    auth: bool = Depends(require_auth),
+    http_request: Request = None
+):
+    """Streaming chat endpoint - sends node events and response tokens as Server-Sent Events.
+
+    Events:
+      - node:  {"node": ..., "ms": ..., "detector": {...}} when a detector/retrieval node finishes
+      - token: {"token": ...} for each token generated by response_node
+      - done:  {"response": ..., "processing_time_ms": ..., "time_to_first_token_ms": ...}
+      - error: {"error": ...}
+    """
+    if not request.message:
+        raise HTTPException(status_code=400, detail="Message is required")
+
+    session_id = http_request.headers.get('X-Session-ID') if http_request else None
+
+    async def event_stream():
+        start_time = time.perf_counter()
+        first_token_time = None
+        final_state = {}
+        message_data = {
+            "session_id": session_id or 'default',
+            "message": request.message,
+            "response": "",
+            "processing_time": 0,
+            "time_to_first_token": None,
+            "graph_state": {},
+            "error": None
+        }
+        use_cache = False
+
+        try:
+            history = await session_history(session_id)
+            initial_state = {"messages": history + [{"role": "user", "content": request.message}]}
+            use_cache = response_cache is not None and not history
+            cached = await response_cache.abuscar(request.message) if use_cache else None
+            message_data["cache_hit"] = cached is not None
+            if cached is not None:
+                # Cache hit: the whole answer goes out as a single token
+                first_token_time = time.perf_counter()
+                final_state = dict(cached)
+                yield sse_event("token", {"token": cached.get("response", "")})
+            else:
+                async for mode, chunk in graph.astream(initial_state, stream_mode=["updates", "messages"]):
+                    if mode == "messages":
+                        # Only forward tokens from the final answer, not from the detector LLM call
+                        message_chunk, metadata = chunk
+                        if metadata.get("langgraph_node") != "response_node" or not message_chunk.content:
+                            continue
+                        if first_token_time is None:
+                            first_token_time = time.perf_counter()
+                        yield sse_event("token", {"token": message_chunk.content})
+                    else:
+                        for node, update in chunk.items():
+                            update = update or {}
+                            timings = {**final_state.get("timings", {}), **update.get("timings", {})}
+                            errores = {**final_state.get("errores", {}), **update.get("errores", {})}
+                            final_state.update(update)
+                            final_state["timings"] = timings
+                            final_state["errores"] = errores
+                            if node == "response_node":
+                                continue
+                            event = {"node": node, "ms": update.get("timings", {}).get(node)}
+                            if node == "detector_node":
+                                event["detector"] = update.get("detector", {})
+                            yield sse_event("node", event)
+
+            response = final_state.get("response", "No response generated")
+            message_data["response"] = response
+            message_data["graph_state"] = {
+                "detector": final_state.get("detector", {}),
+                "factual": final_state.get("factual", ""),
+                "temporal": final_state.get("temporal", ""),
+                "personality": final_state.get("personality", ""),
+                "response": response,
+                "prompt_tokens": final_state.get("prompt_tokens", {}),
+                "timings": final_state.get("timings", {}),
+                "errores": final_state.get("errores", {})
+            }
+        except Exception as e:
+            message_data["error"] = str(e)
+            print(f"Error: {e}")
+            yield sse_event("error", {"error": "Internal server error"})
+        finally:
+            end_time = time.perf_counter()
+            message_data["processing_time"] = round((end_time - start_time) * 1000, 2)
+            if first_token_time is not None:
+                message_data["time_to_first_token"] = round((first_token_time - start_time) * 1000, 2)
+            if message_data["error"] is None and message_data["response"]:
+                # Degraded answers are not cached (see /api/chat)
+                if use_cache and not message_data.get("cache_hit") and not message_data["graph_state"]["errores"]:
+                    response_cache.guardar(request.message, message_data["graph_state"], message_data["processing_time"])
+                await save_turn(session_id, request.message, message_data["response"])
+            log_message(message_data)
+
+        if message_data["error"] is None:
+            yield sse_event("done", {
+                "response": message_data["response"],
+                "processing_time_ms": message_data["processing_time"],
+                "time_to_first_token_ms": message_data["time_to_first_token"],
+                "cached": message_data.get("cache_hit", False)
+            })
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/api/cache/stats")
+async def cache_stats(auth: bool = Depends(require_auth)):
+    """Response cache hit rate and latency saved"""
+    if not response_cache:
+        return {"enabled": False}
+    return {"enabled": True, **response_cache.stats()}
+
+@app.get("/api/sessions/stats")
+async def session_stats(auth: bool = Depends(require_auth)):
+    """Active sessions and the memory they use"""
+    if sessions is None:
+        return {"enabled": False}
+    return {"enabled": True, **sessions.stats()}
+
 @app.get("/api/logs")
 async def get_logs(auth: bool = Depends(require_auth)):
     """Get recent logs (last 50 entries)"""
     try:
-        log_file = LOGS_DIR / f"chat_log_{datetime.datetime.now().strftime('%Y-%m-%d')}.json"
-        if log_file.exists():
-            with open(log_file, 'r', encoding='utf-8') as f:
-                logs = json.load(f)
-            # Return last 50 entries
-            return {"logs": logs[-50:]}
-        else:
-            return {"logs": []}
+        # Reads only the tail of today's files
+        logs = await asyncio.to_thread(chat_logger.leer_ultimas, 50)
+        return {"logs": logs}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -0,0 +1,84 @@
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import time
+from stub_llm import levantar_stub_llm
+
+"""
+Benchmark de carga de /api/chat contra una LLM stub local.
+Compara el handler anterior (graph.invoke bloqueando el event loop) con el camino async
+(graph.ainvoke) disparando pedidos concurrentes y reporta p50/p99 y requests/seg.
+
+Uso:
+    python bench_carga.py --pedidos 200 --concurrencia 50 --latencia_llm_ms 300
+"""
+
+def percentil(valores, p):
+    ordenados = sorted(valores)
+    idx = min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))
+    return ordenados[idx]
+
+async def disparar(cliente, ruta, pedidos, concurrencia):
+    """Dispara `pedidos` POST a `ruta` con a lo sumo `concurrencia` en vuelo."""
+    semaforo = asyncio.Semaphore(concurrencia)
+    latencias = []
+
+    async def uno(i):
+        async with semaforo:
+            inicio = time.perf_counter()
+            r = await cliente.post(ruta, json={"message": f"¿Sabés Python? ({i})"})
+            r.raise_for_status()
+            latencias.append((time.perf_counter() - inicio) * 1000)
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(uno(i) for i in range(pedidos)))
+    total = time.perf_counter() - inicio
+    return latencias, pedidos / total
+
+async def correr(app, pedidos, concurrencia):
+    import httpx
+    transporte = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transporte, base_url="http://bench", timeout=None) as cliente:
+        resultados = {}
+        for nombre, ruta in [("antes (invoke)", "/bench/chat_bloqueante"), ("despues (ainvoke)", "/api/chat")]:
+            resultados[nombre] = await disparar(cliente, ruta, pedidos, concurrencia)
+        return resultados
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de carga de /api/chat sync vs async")
+    parser.add_argument("--pedidos", type=int, default=200)
+    parser.add_argument("--concurrencia", type=int, default=50)
+    parser.add_argument("--latencia_llm_ms", type=float, default=300)
+    parser.add_argument("--latencia_embedding_ms", type=float, default=50)
+    args = parser.parse_args()
+
+    _, base_url = levantar_stub_llm(args.latencia_llm_ms, args.latencia_embedding_ms)
+    os.environ.update({
+        "OPENAI_API_KEY": "stub",
+        "OPENAI_BASE_URL": base_url,
+        "OPENAI_API_BASE": base_url,
+        # Los embeddings del stub no deben quedar en el cache en disco compartido
+        "EMBEDDING_CACHE_DIR": "",
+        "PINECONE_API_KEY": "",
+        "REQUIRE_TOKEN": "false",
+    })
+
+    from api_server import app, ChatRequest
+    from graph import graph
+
+    # Ruta con el comportamiento anterior del handler: graph.invoke dentro de una corrutina.
+    @app.post("/bench/chat_bloqueante")
+    async def chat_bloqueante(request: ChatRequest):
+        result = graph.invoke({"messages": [{"role": "user", "content": request.message}]})
+        return {"response": result.get("response", "")}
+
+    # Los nodos imprimen cada respuesta; se silencian para no ensuciar el reporte.
+    with contextlib.redirect_stdout(io.StringIO()):
+        resultados = asyncio.run(correr(app, args.pedidos, args.concurrencia))
+
+    print(f"{args.pedidos} pedidos, concurrencia {args.concurrencia}, LLM stub {args.latencia_llm_ms:.0f} ms")
+    print(f"{'camino':<20}{'p50 (ms)':>10}{'p99 (ms)':>10}{'req/s':>10}")
+    for nombre, (latencias, rps) in resultados.items():
+        print(f"{nombre:<20}{percentil(latencias, 50):>10.0f}{percentil(latencias, 99):>10.0f}{rps:>10.1f}")
@@ -0,0 +1,68 @@
+import argparse
+import contextlib
+import io
+import os
+import time
+from stub_llm import levantar_stub_llm
+
+"""
+Micro-benchmark de conexiones: cuenta cuantas conexiones TCP nuevas abre el grafo cada 100 turnos
+contra un servidor HTTP local que imita OpenAI y Pinecone.
+Compara construir los clientes en cada llamada (como se hacia antes) con el registro de clients.py.
+
+Uso:
+    python bench_conexiones.py --turnos 100
+"""
+
+def turno_sin_registro(consulta):
+    """Replica el patron anterior: clientes nuevos en cada nodo."""
+    import openai
+    from langchain_openai import ChatOpenAI
+    from langchain_core.messages import HumanMessage
+    from pinecone import Pinecone
+
+    ChatOpenAI(model="gpt-4o-mini", temperature=0.05).invoke([HumanMessage(content=consulta)])
+    pc = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
+    index = pc.Index(name="bench", host=os.getenv("PINECONE_HOST"))
+    embedding = openai.OpenAI().embeddings.create(input=consulta, model="text-embedding-3-small").data[0].embedding
+    index.query(vector=embedding, top_k=10, include_metadata=True)
+    ChatOpenAI(model="gpt-4o-mini", temperature=0.05).invoke([HumanMessage(content=consulta)])
+
+def turno_con_registro(consulta):
+    """Mismas llamadas que el grafo, con los clientes compartidos del registro."""
+    from graph import detector_node, factual_node, response_node
+    from langchain_core.messages import HumanMessage
+
+    state = {"messages": [HumanMessage(content=consulta)]}
+    state.update(detector_node(state))
+    state.update(factual_node(state))
+    response_node(state)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cuenta conexiones TCP nuevas por turno con y sin registro de clientes")
+    parser.add_argument("--turnos", type=int, default=100)
+    args = parser.parse_args()
+
+    servidor, base_url = levantar_stub_llm(latencia_llm_ms=5, latencia_embedding_ms=1)
+    os.environ.update({
+        "OPENAI_API_KEY": "stub",
+        "OPENAI_BASE_URL": base_url,
+        "OPENAI_API_BASE": base_url,
+        # Los embeddings del stub no deben quedar en el cache en disco compartido
+        "EMBEDDING_CACHE_DIR": "",
+        "PINECONE_API_KEY": "stub",
+        "PINECONE_HOST": base_url.rsplit("/v1", 1)[0],
+    })
+
+    resultados = {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        for nombre, turno in [("clientes por llamada", turno_sin_registro), ("registro compartido", turno_con_registro)]:
+            servidor.conexiones = 0
+            inicio = time.perf_counter()
+            for i in range(args.turnos):
+                turno(f"¿Sabés Python? ({i})")
+            resultados[nombre] = (servidor.conexiones, (time.perf_counter() - inicio) * 1000 / args.turnos)
+
+    print(f"{'modo':<24}{'conexiones TCP':>16}{'ms/turno':>10}")
+    for nombre, (conexiones, ms) in resultados.items():
+        print(f"{nombre:<24}{conexiones:>16}{ms:>10.1f}")
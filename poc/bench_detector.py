@@ -0,0 +1,112 @@
+import argparse
+import time
+from detector_local import detectar_local, UMBRAL_CONFIANZA
+
+"""
+Benchmark del detector por reglas (detector_local.py).
+Sobre un set de consultas etiquetadas a mano mide que fraccion de los turnos se resuelve sin llamar
+a la LLM, la precision de cada campo en los turnos aceptados y la latencia del camino local.
+
+Uso:
+    python bench_detector.py --latencia_llm_ms 700
+"""
+
+# (consulta, campos esperados). Solo se comparan los campos que aparecen en el dict.
+CONSULTAS = [
+    ("¿Sabés Python?", {"tipo": "factual", "skills": ["python"]}),
+    ("¿Tenés experiencia con Docker y Kubernetes?", {"tipo": "factual", "skills": ["docker", "kubernetes"]}),
+    ("¿Manejás SQL?", {"tipo": "factual", "skills": ["sql"]}),
+    ("¿Sabés machine learning?", {"tipo": "factual", "skills": ["machine learning"]}),
+    ("¿Usaste pytorch alguna vez?", {"tipo": "factual", "skills": ["pytorch"]}),
+    ("¿Qué tal tu inglés?", {"tipo": "factual", "skills": ["ingles"]}),
+    ("¿Trabajaste con AWS?", {"tipo": "factual", "skills": ["aws"]}),
+    ("¿Sabés javascript o react?", {"tipo": "factual", "skills": ["javascript", "react"]}),
+    ("¿Te gusta cocinar?", {"tipo": "factual", "skills": ["cocina"]}),
+    ("¿Hacés deporte?", {"tipo": "factual", "topic": "deportes"}),
+    ("¿Qué estudiaste?", {"tipo": "factual", "topic": "estudios"}),
+    ("¿Dónde hiciste el doctorado?", {"tipo": "factual", "topic": "estudios"}),
+    ("¿Qué hiciste en Meton?", {"tipo": "factual", "empresa": "Meton"}),
+    ("Contame de tu trabajo en Meton", {"tipo": "factual", "empresa": "Meton", "topic": "trabajo"}),
+    ("¿Qué hiciste antes de Meton?", {"tipo": "temporal", "empresa": "Meton", "conector_temporal": "antes"}),
+    ("¿Y después de Meton?", {"tipo": "temporal", "empresa": "Meton", "conector_temporal": "después"}),
+    ("¿Dónde trabajabas en 2020?", {"tipo": "temporal", "rango_temporal": "2020", "conector_temporal": "en"}),
+    ("¿Qué hacías durante 2019?", {"tipo": "temporal", "rango_temporal": "2019", "conector_temporal": "durante"}),
+    ("¿Qué hiciste desde 2021?", {"tipo": "temporal", "rango_temporal": "2021", "conector_temporal": "desde"}),
+    ("¿Qué proyectos hiciste hasta 2018?", {"tipo": "temporal", "rango_temporal": "2018", "conector_temporal": "hasta"}),
+    ("¿En qué trabajaste entre 2019-2021?", {"tipo": "temporal", "rango_temporal": "2019-2021"}),
+    ("¿Qué estudiabas antes de 2015?", {"tipo": "temporal", "rango_temporal": "2015", "conector_temporal": "antes"}),
+    ("¿Usabas Python en 2020?", {"tipo": "temporal", "skills": ["python"], "rango_temporal": "2020"}),
+    ("¿Qué hacías hace 5 años?", {"tipo": "temporal"}),
+    ("¿Qué hiciste el año pasado?", {"tipo": "temporal"}),
+    ("¿Qué hiciste entre Meton y tu trabajo anterior?", {"tipo": "temporal"}),
+    ("¿Cuál es tu pretensión salarial?", {"tipo": "factual", "topic": "dinero"}),
+    ("¡Gracias! Me encantó la charla", {"tipo": "factual", "emotion": "joy"}),
+    ("Hola, ¿cómo estás?", {"tipo": "factual"}),
+    ("¿Quién sos?", {"tipo": "factual"}),
+    ("¿Qué te gusta hacer en tu tiempo libre?", {"tipo": "factual", "topic": "ocio"}),
+    ("¿Viajaste mucho?", {"tipo": "factual", "topic": "viajes"}),
+    ("¿Tenés hijos?", {"tipo": "factual", "topic": "familia"}),
+    ("¿Qué música escuchás?", {"tipo": "factual", "topic": "entretenimiento"}),
+    ("¿Cuál fue tu rol en tu último proyecto?", {"tipo": "factual", "topic": "trabajo"}),
+    ("¿Por qué elegiste ciencia de datos?", {"tipo": "factual"}),
+    ("¿Qué opinás del trabajo remoto?", {"tipo": "factual", "topic": "trabajo"}),
+    ("¿Sabés git?", {"tipo": "factual", "skills": ["git"]}),
+    ("¿Cuándo empezaste a programar?", {"tipo": "temporal"}),
+    ("¿Trabajaste con LLMs?", {"tipo": "factual", "skills": ["llm"]}),
+]
+
+
+def comparar(detector: dict, esperado: dict) -> dict:
+    """Devuelve {campo: acierto} para los campos etiquetados."""
+    resultado = {}
+    for campo, valor in esperado.items():
+        obtenido = detector.get(campo)
+        if campo == "skills":
+            resultado[campo] = sorted(obtenido or []) == sorted(valor)
+        else:
+            resultado[campo] = obtenido == valor
+    return resultado
+
+def correr(umbral: float, repeticiones: int):
+    aceptadas = 0
+    aciertos = {}
+    errores = []
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        for consulta, _esperado in CONSULTAS:
+            detectar_local(consulta)
+    latencia_us = (time.perf_counter() - inicio) * 1e6 / (repeticiones * len(CONSULTAS))
+
+    for consulta, esperado in CONSULTAS:
+        local = detectar_local(consulta)
+        if local["confianza"] < umbral:
+            continue
+        aceptadas += 1
+        for campo, ok in comparar(local["detector"], esperado).items():
+            aciertos.setdefault(campo, []).append(ok)
+            if not ok:
+                errores.append((consulta, campo, local["detector"].get(campo), esperado[campo]))
+    return aceptadas, aciertos, errores, latencia_us
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mide cobertura, precision y latencia del detector por reglas")
+    parser.add_argument("--umbral", type=float, default=UMBRAL_CONFIANZA, help="Confianza minima para saltear la LLM")
+    parser.add_argument("--repeticiones", type=int, default=200, help="Repeticiones del set para medir latencia")
+    parser.add_argument("--latencia_llm_ms", type=float, default=700, help="Latencia tipica de la llamada del detector")
+    args = parser.parse_args()
+
+    aceptadas, aciertos, errores, latencia_us = correr(args.umbral, args.repeticiones)
+    total = len(CONSULTAS)
+    print(f"Consultas etiquetadas: {total}  umbral: {args.umbral}")
+    print(f"Resueltas sin LLM: {aceptadas}/{total} ({aceptadas / total:.0%})")
+    print(f"Latencia del detector local: {latencia_us:.1f} us por consulta")
+    print("Precision por campo en las aceptadas:")
+    for campo, oks in sorted(aciertos.items()):
+        print(f"  {campo:<18} {sum(oks)}/{len(oks)} ({sum(oks) / len(oks):.0%})")
+    ahorro = aceptadas / total * args.latencia_llm_ms
+    print(f"Ahorro estimado en el camino critico: {ahorro:.0f} ms por turno en promedio "
+          f"(con {args.latencia_llm_ms:.0f} ms por llamada al detector)")
+    if errores:
+        print("Errores:")
+        for consulta, campo, obtenido, esperado in errores:
+            print(f"  {consulta!r}: {campo} = {obtenido!r}, esperado {esperado!r}")
@@ -0,0 +1,66 @@
+import argparse
+import time
+from graph import construir_grafo
+
+"""
+Benchmark de la topologia del grafo: cadena secuencial vs fan-out/fan-in.
+Los nodos se reemplazan por stubs que duermen la latencia tipica de cada llamada
+(LLM, Pinecone, archivos), asi se mide solo el efecto de la topologia sin gastar APIs.
+
+Uso:
+    python bench_grafo.py --turnos 5
+"""
+
+# Latencias tipicas por nodo (ms), medidas a ojo sobre el PoC desplegado.
+LATENCIAS_MS = {
+    "detector_node": 700,
+    "temporal_node": 15,
+    "factual_node": 450,
+    "personality_node": 60,
+    "response_node": 1200,
+}
+
+def stub(nombre, latencia_ms):
+    """Crea un nodo falso que duerme latencia_ms y escribe solo su clave del estado."""
+    salidas = {
+        "detector_node": {"detector": {"tipo": "temporal", "skills": [], "empresa": None}},
+        "temporal_node": {"temporal": "stub temporal"},
+        "factual_node": {"factual": "stub factual"},
+        "personality_node": {"personality": "stub", "personality_example": "stub"},
+        "response_node": {"response": "stub"},
+    }
+    def nodo(state):
+        time.sleep(latencia_ms / 1000)
+        return salidas[nombre]
+    nodo.__name__ = nombre
+    return nodo
+
+def correr(paralelo, turnos, latencias):
+    nodos = {nombre: stub(nombre, ms) for nombre, ms in latencias.items()}
+    grafo = construir_grafo(paralelo=paralelo, nodos=nodos)
+    totales = []
+    timings = {}
+    for _ in range(turnos):
+        inicio = time.perf_counter()
+        result = grafo.invoke({"messages": [{"role": "user", "content": "¿Qué hiciste antes de Meton?"}]})
+        totales.append((time.perf_counter() - inicio) * 1000)
+        for nodo, ms in result["timings"].items():
+            timings.setdefault(nodo, []).append(ms)
+    return sum(totales) / len(totales), {k: sum(v) / len(v) for k, v in timings.items()}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compara la latencia por turno de la topologia secuencial vs paralela")
+    parser.add_argument("--turnos", type=int, default=5, help="Turnos a promediar por topologia")
+    parser.add_argument("--escala", type=float, default=1.0, help="Multiplica las latencias de los stubs")
+    args = parser.parse_args()
+
+    latencias = {k: v * args.escala for k, v in LATENCIAS_MS.items()}
+    total_seq, nodos_seq = correr(False, args.turnos, latencias)
+    total_par, nodos_par = correr(True, args.turnos, latencias)
+
+    print(f"{'nodo':<18}{'secuencial (ms)':>18}{'paralelo (ms)':>16}")
+    for nodo in LATENCIAS_MS:
+        print(f"{nodo:<18}{nodos_seq.get(nodo, 0):>18.1f}{nodos_par.get(nodo, 0):>16.1f}")
+    print(f"{'suma de nodos':<18}{sum(nodos_seq.values()):>18.1f}{sum(nodos_par.values()):>16.1f}")
+    print(f"{'wall-clock':<18}{total_seq:>18.1f}{total_par:>16.1f}")
+    print(f"Ahorro por turno: {total_seq - total_par:.1f} ms ({(1 - total_par / total_seq) * 100:.1f}%)")
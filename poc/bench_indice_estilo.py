@@ -0,0 +1,124 @@
+import argparse
+import json
+import mmap
+import os
+import random
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from indice_estilo import IndiceEstilo
+
+"""
+Benchmark del indice de ejemplos de estilo sobre corpus sinteticos con el formato de vectorizar_bloques.py
+(embeddings.npy normalizado, metadata.jsonl y textos.blob + textos.offsets.npy).
+Mide la latencia por consulta con filtro de tema/emocion (fuerza bruta e IVF), cuantas consultas tuvieron
+que relajar el filtro, y verifica que la matriz quede memory-mapped: varios workers que la abren comparten
+las mismas paginas (se compara RSS contra PSS de cada worker).
+
+Uso:
+    python bench_indice_estilo.py --bloques 10000 100000 --dim 384 --consultas 300
+"""
+
+TEMAS = ["trabajo", "amistad", "familia", "salud", "emociones", "ocio", "estudios", "dinero", "viajes", "tecnología",
+         "deportes", "comida", "política", "entretenimiento", "amor"]
+EMOCIONES = ["others", "joy", "sadness", "anger", "surprise", "disgust", "fear"]
+
+
+def escribir_indice(directorio: str, n: int, dim: int, semilla: int = 0):
+    """Corpus con temas muy desbalanceados; el ultimo tema no aparece, asi esas consultas relajan el filtro."""
+    rng = np.random.default_rng(semilla)
+    embeddings = np.lib.format.open_memmap(os.path.join(directorio, "embeddings.npy"), mode="w+",
+                                           dtype=np.float32, shape=(n, dim))
+    for inicio in range(0, n, 50000):
+        bloque = rng.standard_normal((min(50000, n - inicio), dim)).astype(np.float32)
+        embeddings[inicio:inicio + len(bloque)] = bloque / np.linalg.norm(bloque, axis=1, keepdims=True)
+    embeddings.flush()
+    del embeddings
+
+    pesos_tema = 1 / np.arange(1, len(TEMAS) + 1) ** 2
+    pesos_tema[-1] = 0
+    temas = rng.choice(len(TEMAS), size=n, p=pesos_tema / pesos_tema.sum())
+    emociones = rng.integers(0, len(EMOCIONES), n)
+    textos = [f"Nico: ejemplo {i} sobre {TEMAS[temas[i]]}".encode("utf-8") for i in range(n)]
+    with open(os.path.join(directorio, "metadata.jsonl"), "w", encoding="utf-8") as f:
+        for i in range(n):
+            f.write(json.dumps({"conversacion_id": i, "tema": TEMAS[temas[i]], "emo_user": EMOCIONES[emociones[i]],
+                                "carpeta": "informal" if i % 3 else "formal"}, ensure_ascii=False) + "\n")
+    with open(os.path.join(directorio, "textos.blob"), "wb") as f:
+        f.write(b"".join(textos))
+    offsets = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum([len(t) for t in textos], out=offsets[1:])
+    np.save(os.path.join(directorio, "textos.offsets.npy"), offsets)
+
+
+def consultas_sinteticas(n: int, dim: int, semilla: int = 1) -> list:
+    rng = np.random.default_rng(semilla)
+    vectores = rng.standard_normal((n, dim)).astype(np.float32)
+    return [(vectores[i], random.Random(i).choice(TEMAS), random.Random(-i).choice(EMOCIONES)) for i in range(n)]
+
+
+def mapeada(arr) -> bool:
+    """True si el array esta respaldado por un archivo mapeado en memoria (no una copia)."""
+    while arr is not None:
+        if isinstance(arr, mmap.mmap):
+            return True
+        arr = getattr(arr, "base", None)
+    return False
+
+
+def medir(indice, consultas, con_vector: bool):
+    tiempos, relajadas = [], 0
+    for vector, tema, emocion in consultas:
+        inicio = time.perf_counter()
+        ejemplos = indice.buscar(vector if con_vector else None, k=3, tema=tema, emocion=emocion)
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+        relajadas += sum(f" sobre {tema}" not in e for e in ejemplos) > 0
+    tiempos.sort()
+    return sum(tiempos) / len(tiempos), tiempos[int(len(tiempos) * 0.95)], relajadas
+
+
+def memoria_worker(directorio: str, consultas: int) -> tuple:
+    """Abre el indice y consulta en un worker nuevo. Devuelve (RSS, PSS) en MB de /proc/self/smaps_rollup."""
+    indice = IndiceEstilo.cargar(directorio, backend="local")
+    for vector, tema, emocion in consultas_sinteticas(consultas, indice.dimension):
+        indice.buscar(vector, k=3, tema=tema, emocion=emocion)
+    indice.buscar(np.ones(indice.dimension, dtype=np.float32), k=3)  # toca la matriz entera
+    valores = {}
+    with open("/proc/self/smaps_rollup") as f:
+        for linea in f:
+            partes = linea.split()
+            if partes[0] in ("Rss:", "Pss:"):
+                valores[partes[0]] = int(partes[1]) / 1024
+    time.sleep(1)  # los workers siguen vivos mientras miden los otros
+    return valores.get("Rss:", 0.0), valores.get("Pss:", 0.0)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Latencia y memoria del indice de ejemplos de estilo")
+    parser.add_argument("--bloques", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--consultas", type=int, default=300)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    print(f"{'bloques':>8} {'camino':<22} {'media ms':>9} {'p95 ms':>9} {'relajadas':>10}")
+    for n in args.bloques:
+        with tempfile.TemporaryDirectory() as directorio:
+            escribir_indice(directorio, n, args.dim)
+            consultas = consultas_sinteticas(args.consultas, args.dim)
+            for backend in ("local", "ivf"):
+                inicio = time.perf_counter()
+                indice = IndiceEstilo.cargar(directorio, backend=backend)
+                carga_ms = (time.perf_counter() - inicio) * 1000
+                for nombre, con_vector in ((f"{backend} + vector", True), (f"{backend} solo filtros", False)):
+                    media, p95, relajadas = medir(indice, consultas, con_vector)
+                    print(f"{n:>8} {nombre:<22} {media:>9.3f} {p95:>9.3f} {relajadas:>10}")
+                print(f"{'':>8} (carga {backend}: {carga_ms:.0f} ms, matriz mapeada: {mapeada(indice.indice.vectores)})")
+
+            mb_matriz = n * args.dim * 4 / 1024 / 1024
+            with ProcessPoolExecutor(max_workers=args.workers) as pool:
+                memorias = list(pool.map(memoria_worker, [directorio] * args.workers, [50] * args.workers))
+            rss = sum(r for r, _ in memorias)
+            pss = sum(p for _, p in memorias)
+            print(f"{'':>8} ({args.workers} workers, matriz de {mb_matriz:.0f} MB: RSS sumado {rss:.0f} MB, "
+                  f"PSS sumado {pss:.0f} MB; la diferencia son paginas compartidas)")
@@ -0,0 +1,122 @@
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data_ing", "Peronsalidad_DB"))
+import analisis_simplificado_conversaciones as asc
+import perfil_ocean
+from perfil_ocean import ARCHIVO_GLOBAL, ARCHIVO_MATRICES, JERARQUIA, obtener_tabla_ocean
+
+"""
+Benchmark de la tabla de perfiles OCEAN. Los artefactos se generan con el agregador real de
+analisis_simplificado_conversaciones.py sobre bloques sinteticos (asi se prueba el formato de punta a punta).
+Compara el costo por turno de leer los dos JSON y recorrer la jerarquia en cada consulta con el lookup en la
+tabla compilada, y verifica el reemplazo en caliente: mientras un thread consulta sin parar, se publican
+matrices nuevas y ninguna consulta falla ni ve un perfil que no sea el viejo o el nuevo (cada archivo se
+reemplaza atomicamente; entre los dos renames puede compilarse una tabla con el global nuevo y las matrices viejas).
+
+Uso:
+    python bench_perfil_ocean.py --bloques 200000 --consultas 20000
+"""
+
+TEMAS = ["trabajo", "amistad", "familia", "salud", "emociones", "ocio", "estudios", "dinero", "viajes", "tecnología",
+         "deportes", "comida", "política", "entretenimiento", "amor"]
+EMOCIONES = ["others", "joy", "sadness", "anger", "surprise", "disgust", "fear"]
+
+
+def publicar(directorio: str, bloques: int, semilla: int):
+    """Agrega bloques sinteticos y escribe los dos artefactos como lo hace el job de ingesta."""
+    rng = random.Random(semilla)
+    agregador = asc.AgregadorBigFive()
+    agregador.actualizar([{
+        "tema": rng.choice(TEMAS[:-1]), "emo_user": rng.choice(EMOCIONES), "carpeta": rng.choice(["formal", "informal"]),
+        **{k: round(rng.random() * (1 + semilla % 2), 3) for k in asc.KEYS}
+    } for _ in range(bloques)])
+    asc.escribir_json(agregador.promedio_global(), os.path.join(directorio, ARCHIVO_GLOBAL))
+    matrices = {nombre: asc.stringify_keys(agregador.matriz_con_conteos(nombre)) for nombre in asc.AGRUPACIONES}
+    asc.escribir_json(matrices, os.path.join(directorio, ARCHIVO_MATRICES))
+
+
+def consultas_sinteticas(n: int, semilla: int = 1) -> list:
+    rng = random.Random(semilla)
+    # Incluye temas que no estan en los artefactos y campos vacios, para ejercitar el fallback
+    return [(rng.choice(TEMAS + ["otros", ""]), rng.choice(EMOCIONES + [""]), rng.choice(["formal", "informal", None]))
+            for _ in range(n)]
+
+
+# ---------- camino sin tabla: leer los artefactos y recorrer la jerarquia en cada turno ----------
+def perfil_por_turno(directorio, tema, emocion, formalidad):
+    with open(os.path.join(directorio, ARCHIVO_MATRICES), "r", encoding="utf-8") as f:
+        matrices = json.load(f)
+    contexto = {"tema": tema, "emocion": emocion, "formalidad": formalidad}
+    for agrupacion, campos in JERARQUIA:
+        valores = tuple(contexto[c] for c in campos)
+        grupo = matrices.get(agrupacion, {}).get(str(valores))
+        if all(valores) and grupo and grupo.get("n", 0) >= perfil_ocean.MIN_BLOQUES:
+            return {r: grupo[f"bf_{r}"] for r in perfil_ocean.RASGOS}, agrupacion
+    with open(os.path.join(directorio, ARCHIVO_GLOBAL), "r", encoding="utf-8") as f:
+        return {r: v for r, v in zip(perfil_ocean.RASGOS, json.load(f).values())}, "global"
+
+
+def medir(funcion, consultas) -> float:
+    inicio = time.perf_counter()
+    for consulta in consultas:
+        funcion(*consulta)
+    return (time.perf_counter() - inicio) / len(consultas) * 1e6
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Perfil OCEAN por turno: JSON + jerarquia vs tabla compilada")
+    parser.add_argument("--bloques", type=int, default=200000)
+    parser.add_argument("--consultas", type=int, default=20000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directorio:
+        publicar(directorio, args.bloques, semilla=0)
+        consultas = consultas_sinteticas(args.consultas)
+
+        inicio = time.perf_counter()
+        tabla = obtener_tabla_ocean(directorio)
+        print(f"Tabla compilada: {len(tabla)} combinaciones en {(time.perf_counter() - inicio) * 1000:.1f} ms")
+
+        distintos = sum(tabla.perfil(*c) != perfil_por_turno(directorio, *c) for c in consultas[:2000])
+        print(f"Perfiles distintos entre ambos caminos (2000 consultas): {distintos}")
+        niveles = {}
+        for c in consultas:
+            nivel = tabla.perfil(*c)[1]
+            niveles[nivel] = niveles.get(nivel, 0) + 1
+        print("Nivel de la jerarquia usado: " + ", ".join(f"{n}={c}" for n, c in sorted(niveles.items())))
+
+        por_turno = medir(lambda *c: perfil_por_turno(directorio, *c), consultas[:500])
+        compilada = medir(lambda *c: obtener_tabla_ocean(directorio).perfil(*c), consultas)
+        print(f"JSON + jerarquia por turno: {por_turno:9.1f} us/turno")
+        print(f"Tabla compilada:            {compilada:9.2f} us/turno")
+
+        # Reemplazo en caliente con un lector concurrente
+        perfil_ocean.INTERVALO_CHEQUEO_S = 0.0
+        viejo = tuple(tabla.perfil("trabajo", "joy", "formal")[0].values())
+        errores, vistos, corriendo = [], set(), True
+
+        def lector():
+            while corriendo:
+                try:
+                    perfil, _ = obtener_tabla_ocean(directorio).perfil("trabajo", "joy", "formal")
+                    vistos.add(tuple(perfil.values()))
+                except Exception as e:
+                    errores.append(e)
+
+        hilo = threading.Thread(target=lector)
+        hilo.start()
+        time.sleep(0.2)
+        publicar(directorio, args.bloques // 4, semilla=1)
+        time.sleep(0.2)
+        corriendo = False
+        hilo.join()
+        nueva = obtener_tabla_ocean(directorio)
+        nuevo = tuple(nueva.perfil("trabajo", "joy", "formal")[0].values())
+        print(f"Reemplazo en caliente: tabla nueva={nueva is not tabla}, perfil cambio={nuevo != viejo}, "
+              f"errores={len(errores)}, perfiles distintos del viejo y el nuevo={len(vistos - {viejo, nuevo})}")
@@ -0,0 +1,93 @@
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+import corpus_personalidad
+from corpus_personalidad import compilar_corpus, obtener_corpus_personalidad
+
+"""
+Benchmark de los ejemplos de estilo del personality_node sobre corpus sinteticos que crecen 100x.
+Compara el camino anterior (abrir y parsear faiss_metadata.json en cada turno para sortear 3 textos)
+con el corpus cargado una vez (blob + offsets), en memoria y compilado con mmap.
+Tambien verifica que el corpus se recargue cuando cambia el archivo.
+
+Uso:
+    python bench_personalidad.py --textos 1000 10000 100000 --turnos 200
+"""
+
+PALABRAS = ["che", "dale", "igual", "posta", "laburo", "mañana", "código", "re", "bien", "jaja", "después",
+            "vemos", "cliente", "deploy", "modelo", "datos", "asado", "viaje", "tranqui", "bárbaro"]
+
+
+def metadata_sintetica(n: int, semilla: int = 0) -> list:
+    rng = random.Random(semilla)
+    return [{
+        "conversacion_id": i, "tema": "trabajo", "emo_user": "others",
+        "texto": "\n".join(f"Nico: {' '.join(rng.choices(PALABRAS, k=rng.randint(4, 25)))}"
+                           for _ in range(rng.randint(2, 8)))
+    } for i in range(n)]
+
+
+# ---------- camino anterior (copia del personality_node previo) ----------
+def turno_anterior(path):
+    with open(path, "r", encoding="utf-8") as f:
+        metadata = json.load(f)
+    textos = [m.get("texto", "") for m in metadata if m.get("texto")]
+    return random.sample(textos, min(3, len(textos))) if textos else []
+
+def turno_corpus(path):
+    return obtener_corpus_personalidad(path).muestrear(3)
+
+
+def medir(turno, path, turnos):
+    tiempos = []
+    for _ in range(turnos):
+        inicio = time.perf_counter()
+        turno(path)
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    tiempos.sort()
+    return sum(tiempos) / len(tiempos), tiempos[int(len(tiempos) * 0.95)]
+
+def carga_ms(path) -> float:
+    corpus_personalidad._corpus.clear()
+    inicio = time.perf_counter()
+    obtener_corpus_personalidad(path)
+    return (time.perf_counter() - inicio) * 1000
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ejemplos de personalidad: JSON por turno vs corpus cargado una vez")
+    parser.add_argument("--textos", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--turnos", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{'textos':>8} {'camino':<16} {'media ms':>9} {'p95 ms':>9} {'carga ms':>9} {'MB':>7}")
+    for n in args.textos:
+        with tempfile.TemporaryDirectory() as directorio:
+            path = os.path.join(directorio, "faiss_metadata.json")
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(metadata_sintetica(n), f, ensure_ascii=False)
+            mb_json = os.path.getsize(path) / 1024 / 1024
+
+            # El anterior con pocos turnos en corpus grandes: cada uno parsea el archivo entero
+            media, p95 = medir(turno_anterior, path, max(5, min(args.turnos, 2_000_000 // n)))
+            print(f"{n:>8} {'anterior':<16} {media:>9.3f} {p95:>9.3f} {'-':>9} {mb_json:>7.1f}")
+
+            carga = carga_ms(path)
+            media, p95 = medir(turno_corpus, path, args.turnos)
+            corpus = obtener_corpus_personalidad(path)
+            print(f"{'':>8} {'corpus memoria':<16} {media:>9.3f} {p95:>9.3f} {carga:>9.1f} {corpus.nbytes / 1024 / 1024:>7.1f}")
+
+            compilar_corpus(path)
+            carga = carga_ms(path)
+            media, p95 = medir(turno_corpus, path, args.turnos)
+            print(f"{'':>8} {'corpus mmap':<16} {media:>9.3f} {p95:>9.3f} {carga:>9.1f} {'-':>7}")
+
+            # Recarga: el archivo cambia (y el compilado queda viejo) -> se vuelve a leer el JSON
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(metadata_sintetica(n // 2, semilla=1), f, ensure_ascii=False)
+            corpus_personalidad.INTERVALO_CHEQUEO_S = 0
+            recargado = len(obtener_corpus_personalidad(path))
+            corpus_personalidad.INTERVALO_CHEQUEO_S = 1.0
+            print(f"{'':>8} (recarga al cambiar el archivo: {recargado} textos, esperados {n // 2})")
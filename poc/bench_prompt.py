@@ -0,0 +1,102 @@
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import random
+import time
+from langchain_core.messages import HumanMessage
+import graph
+from presupuesto_prompt import contar_tokens, _encoder, ENCODING
+from perfil_ocean import DEFAULT_OCEAN
+
+"""
+Benchmark del empaquetado del prompt del response_node.
+Arma estados como los que llegan al response_node con los datos reales de factual.json y
+temporal_experience.json (matches de a un skill por experiencia, con score, y la linea de tiempo) y
+ejemplos de estilo sinteticos, y compara los tokens del prompt completo con los del prompt empaquetado a
+medida que crece la recuperacion (top_k). Verifica que el mensaje de sistema sea identico en todos los requests.
+
+Uso:
+    python bench_prompt.py --consultas 200 --top_k 10 30 100
+"""
+
+PALABRAS = ["che", "dale", "igual", "posta", "laburo", "mañana", "código", "re", "bien", "jaja", "después",
+            "vemos", "cliente", "deploy", "modelo", "datos", "tranqui", "bárbaro", "la", "de", "que", "en"]
+
+
+def cargar_datos():
+    with open(graph.os.path.join(graph.os.path.dirname(__file__), "..", "data_ing", "Factica", "factual.json"),
+              "r", encoding="utf-8") as f:
+        factual = json.load(f)
+    with open(graph.os.path.join(graph.os.path.dirname(__file__), "..", "data_ing", "Factica", "temporal_experience.json"),
+              "r", encoding="utf-8") as f:
+        temporal = json.load(f)["experiencia_laboral"]
+    return factual, temporal
+
+
+class _Match:
+    def __init__(self, metadata, score):
+        self.metadata = metadata
+        self.score = score
+
+class _Resultados:
+    def __init__(self, matches):
+        self.matches = matches
+
+
+def estado_sintetico(rng, factual, temporal, top_k: int) -> dict:
+    pares = [(exp, skill) for exp in factual for skill in exp["skills"]]
+    elegidos = rng.sample(pares, min(top_k, len(pares))) if top_k <= len(pares) else rng.choices(pares, k=top_k)
+    scores = sorted((rng.uniform(0.2, 0.9) for _ in elegidos), reverse=True)
+    resultados = _Resultados([_Match({"empresa": exp["empresa"], "rol": exp["rol"], "periodo": exp["periodo"],
+                                      "skill": skill}, score) for (exp, skill), score in zip(elegidos, scores)])
+    tipo = rng.choice(["factual", "temporal", "combinado"])
+    estado = {
+        "messages": [HumanMessage(content=rng.choice(["¿Qué hiciste en Meton?", "¿Sabés Python?",
+                                                      "¿Dónde trabajaste antes de 2020?", "Contame de tu doctorado"]))],
+        "detector": {"tipo": tipo, "topic": "trabajo", "emotion": "others"},
+        "personality": "Nico, tono segun por_tema",
+        "personality_ocean": DEFAULT_OCEAN,
+        "personality_example": "\n---\n".join(
+            "\n".join(f"Nico: {' '.join(rng.choices(PALABRAS, k=rng.randint(6, 30)))}" for _ in range(rng.randint(3, 8)))
+            for _ in range(3)),
+    }
+    estado.update(graph.formatear_factual(resultados))
+    if tipo == "temporal":
+        # temporal_node sin conector devuelve la linea de tiempo entera; el texto se arma igual que en el nodo
+        temporal_info = "Experiencias laborales relevantes:\n" + "".join(
+            f"- {e['empresa']} ({e['rol']}, {e['periodo']}): {', '.join(e['skills'][:3])}\n" for e in temporal)
+        estado.update({"temporal": temporal_info, "temporal_items": temporal})
+    else:
+        estado.update({"temporal": "", "temporal_items": []})
+    return estado
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tokens del prompt del response_node: completo vs empaquetado")
+    parser.add_argument("--consultas", type=int, default=200)
+    parser.add_argument("--top_k", type=int, nargs="+", default=[10, 30, 100])
+    args = parser.parse_args()
+
+    factual, temporal = cargar_datos()
+    print(f"Conteo de tokens: {'tiktoken ' + ENCODING if _encoder(ENCODING) else 'estimado (sin tiktoken)'}")
+    print(f"{'top_k':>6} {'antes':>8} {'despues':>8} {'ahorro':>7} {'sistema':>8} {'descartados':>12} {'ms/turno':>9}")
+    sistemas = set()
+    for top_k in args.top_k:
+        rng = random.Random(0)
+        with contextlib.redirect_stdout(io.StringIO()):
+            estados = [estado_sintetico(rng, factual, temporal, top_k) for _ in range(args.consultas)]
+        stats, segundos = [], 0.0
+        for estado in estados:
+            with contextlib.redirect_stdout(io.StringIO()):
+                inicio = time.perf_counter()
+                mensajes, s = graph.mensajes_respuesta(estado)
+                segundos += time.perf_counter() - inicio
+            sistemas.add(hashlib.sha256(mensajes[0].content.encode("utf-8")).hexdigest())
+            stats.append(s)
+        antes = sum(s["antes"] for s in stats) / len(stats)
+        despues = sum(s["despues"] for s in stats) / len(stats)
+        print(f"{top_k:>6} {antes:>8.0f} {despues:>8.0f} {1 - despues / antes:>7.0%} {stats[0]['sistema']:>8} "
+              f"{sum(s['descartados'] for s in stats) / len(stats):>12.1f} {segundos / len(estados) * 1000:>9.3f}")
+    print(f"Mensajes de sistema distintos en todos los requests: {len(sistemas)} "
+          f"({contar_tokens(graph.SISTEMA)} tokens de prefijo estatico)")
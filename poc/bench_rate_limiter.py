@@ -0,0 +1,79 @@
+import argparse
+import os
+import tempfile
+import time
+from collections import defaultdict
+from rate_limiter import LimitadorMemoria, LimitadorSQLite
+
+"""
+Benchmark del rate limiter con muchas IPs distintas (un crawler o un burst de bots).
+Compara el limitador anterior (lista de timestamps por IP y limpieza de todas las IPs en cada
+request) con el sliding window counter en memoria y en SQLite.
+
+Uso:
+    python bench_rate_limiter.py --ips 100000
+"""
+
+
+class LimitadorAnterior:
+    """Copia de la version previa de api_server.check_rate_limit."""
+
+    def __init__(self, limite, ventana_s):
+        self.limite = limite
+        self.ventana_s = ventana_s
+        self.request_counts = defaultdict(list)
+
+    def permitir(self, ip, ahora=None):
+        current_time = time.time()
+        for clave in list(self.request_counts.keys()):
+            self.request_counts[clave] = [t for t in self.request_counts[clave] if current_time - t < self.ventana_s]
+        if len(self.request_counts[ip]) >= self.limite:
+            return False
+        self.request_counts[ip].append(current_time)
+        return True
+
+
+def medir(limitador, ips: list) -> float:
+    """Microsegundos promedio por chequeo."""
+    inicio = time.perf_counter()
+    for ip in ips:
+        limitador.permitir(ip)
+    return (time.perf_counter() - inicio) * 1e6 / len(ips)
+
+def ips_distintas(n: int) -> list:
+    return [f"10.{(i >> 16) & 255}.{(i >> 8) & 255}.{i & 255}" for i in range(n)]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Costo por chequeo del rate limiter con muchas IPs distintas")
+    parser.add_argument("--ips", type=int, default=100000, help="IPs distintas")
+    parser.add_argument("--chequeos_anterior", type=int, default=200,
+                        help="Chequeos a medir con el limitador anterior (cada uno recorre todas las IPs)")
+    args = parser.parse_args()
+
+    ips = ips_distintas(args.ips)
+    print(f"{args.ips} IPs distintas, limite 60 por 60 s")
+    print(f"{'limitador':<12} {'us/chequeo':>11} {'claves':>9}")
+
+    anterior = LimitadorAnterior(60, 60)
+    ahora = time.time()
+    for ip in ips:  # se precarga el estado como si ya se hubieran visto todas las IPs
+        anterior.request_counts[ip].append(ahora)
+    us = medir(anterior, ips[:args.chequeos_anterior])
+    print(f"{'anterior':<12} {us:>11.1f} {len(anterior.request_counts):>9}")
+
+    memoria = LimitadorMemoria(60, 60)
+    us = medir(memoria, ips)
+    us_repetidas = medir(memoria, ips)
+    print(f"{'memoria':<12} {us:>11.2f} {len(memoria):>9}   (segunda pasada: {us_repetidas:.2f} us)")
+
+    with tempfile.TemporaryDirectory() as directorio:
+        sqlite = LimitadorSQLite(os.path.join(directorio, "rate_limit.sqlite"), 60, 60)
+        us = medir(sqlite, ips)
+        print(f"{'sqlite':<12} {us:>11.2f} {len(sqlite):>9}")
+
+    # Desalojo: IPs que no vuelven dejan de ocupar memoria despues de dos ventanas
+    acotado = LimitadorMemoria(60, 1.0)
+    t0 = time.time()
+    for i, ip in enumerate(ips):
+        acotado.permitir(ip, ahora=t0 + i * 10.0 / len(ips))
+    print(f"Con ventana de 1 s y {args.ips} IPs repartidas en 10 s quedan {len(acotado)} claves en memoria")
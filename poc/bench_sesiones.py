@@ -0,0 +1,143 @@
+import argparse
+import contextlib
+import io
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from langchain_core.messages import convert_to_messages
+import graph
+from bench_prompt import PALABRAS, cargar_datos, estado_sintetico
+from sesiones import SesionesMemoria, SesionesSQLite
+
+"""
+Benchmark de la memoria de sesiones.
+1) Una sesion larga: tokens del prompt del response_node (graph.mensajes_respuesta) en cada turno, mandando el
+   historial completo de la conversacion vs el historial de sesiones.py (resumen + ventana).
+2) Muchas sesiones que llegan, conversan y se van: memoria real (tracemalloc) de un dict con todos los turnos vs
+   SesionesMemoria con presupuesto de memoria (y cuanto se aleja su cuenta de bytes de lo medido), y costo por
+   turno con los dos backends.
+3) TTL: las sesiones inactivas se borran al avanzar el reloj.
+
+Uso:
+    python bench_sesiones.py --turnos 200 --sesiones 5000 --turnos_por_sesion 30 --max_mb 4
+"""
+
+
+def texto(rng, minimo: int, maximo: int) -> str:
+    oraciones = []
+    for _ in range(rng.randint(1, 4)):
+        oraciones.append(" ".join(rng.choices(PALABRAS, k=rng.randint(minimo, maximo))).capitalize() + ".")
+    return " ".join(oraciones)
+
+
+def turnos_sinteticos(rng, n: int) -> list:
+    return [(texto(rng, 4, 15) + "?", texto(rng, 8, 40)) for _ in range(n)]
+
+
+def tokens_prompt(estado: dict, historial: list, pregunta: str) -> dict:
+    estado = dict(estado, messages=convert_to_messages(historial + [{"role": "user", "content": pregunta}]))
+    with contextlib.redirect_stdout(io.StringIO()):
+        return graph.mensajes_respuesta(estado)[1]
+
+
+def sesion_larga(turnos: int):
+    rng = random.Random(0)
+    factual, temporal = cargar_datos()
+    with contextlib.redirect_stdout(io.StringIO()):
+        estado = estado_sintetico(rng, factual, temporal, 10)
+    sesiones, completo = SesionesMemoria(), []
+    marcas = sorted({t for t in (1, 2, 5, 10, 25, 50, 100, 200, 500, 1000) if t <= turnos} | {turnos})
+    print(f"{'turno':>6} {'completo':>9} {'sesion':>7} {'historial':>10}")
+    for i, (pregunta, respuesta) in enumerate(turnos_sinteticos(rng, turnos), start=1):
+        if i in marcas:
+            todo = tokens_prompt(estado, completo, pregunta)
+            acotado = tokens_prompt(estado, sesiones.mensajes("s"), pregunta)
+            print(f"{i:>6} {todo['despues']:>9} {acotado['despues']:>7} {acotado['historial']:>10}")
+        completo += [{"role": "user", "content": pregunta}, {"role": "assistant", "content": respuesta}]
+        sesiones.agregar("s", pregunta, respuesta)
+
+
+def cargar_sesiones(store, ids: list, turnos: list, ahora: float = 0.0) -> float:
+    """Intercala los turnos de todas las sesiones como llegarian al servidor. Devuelve us por turno."""
+    inicio = time.perf_counter()
+    for t, (pregunta, respuesta) in enumerate(turnos):
+        for sesion_id in ids:
+            store.mensajes(sesion_id, ahora=ahora + t)
+            store.agregar(sesion_id, pregunta, respuesta, ahora=ahora + t)
+    return (time.perf_counter() - inicio) / (len(ids) * len(turnos)) * 1e6
+
+
+def memoria(sesiones: int, turnos_por_sesion: int, concurrentes: int, max_mb: float):
+    """Las sesiones llegan en tandas de `concurrentes` que conversan en paralelo y despues no vuelven."""
+    rng = random.Random(1)
+    turnos = turnos_sinteticos(rng, turnos_por_sesion)
+    tandas = [[f"sesion-{i}" for i in range(inicio, min(inicio + concurrentes, sesiones))]
+              for inicio in range(0, sesiones, concurrentes)]
+    marcas = {len(tandas) // 4, len(tandas) // 2, len(tandas)}
+
+    def correr(agregar) -> list:
+        """MB medidos con tracemalloc al terminar cada tanda marcada."""
+        medidos, base = [], tracemalloc.get_traced_memory()[0]
+        for n, ids in enumerate(tandas, start=1):
+            for t, (p, r) in enumerate(turnos):
+                for sesion_id in ids:
+                    # Textos distintos por sesion, como en un servidor real (si no, todas comparten los mismos str)
+                    agregar(sesion_id, p + " " + sesion_id, r + " " + sesion_id, n * len(turnos) + t)
+            if n in marcas:
+                medidos.append((n * concurrentes, (tracemalloc.get_traced_memory()[0] - base) / 1024 / 1024))
+        return medidos
+
+    tracemalloc.start()
+    sin_limite = {}
+    completo = correr(lambda sesion_id, p, r, ahora: sin_limite.setdefault(sesion_id, []).extend(
+        [{"role": "user", "content": p}, {"role": "assistant", "content": r}]))
+    del sin_limite
+    store = SesionesMemoria(max_bytes=int(max_mb * 1024 * 1024))
+    acotado = correr(store.agregar)
+    tracemalloc.stop()
+
+    stats = store.stats()
+    print(f"Sesiones de {turnos_por_sesion} turnos, {concurrentes} a la vez, SesionesMemoria con max {max_mb:g} MB:")
+    print(f"{'sesiones':>9} {'dict MB':>9} {'store MB':>9}")
+    for (n, mb_completo), (_, mb_store) in zip(completo, acotado):
+        print(f"{n:>9} {mb_completo:>9.1f} {mb_store:>9.1f}")
+    print(f"  cuenta del store: {stats['bytes'] / 1024 / 1024:.1f} MB, {stats['sesiones']} sesiones vivas, "
+          f"{stats['desalojadas']} desalojadas, {stats['turnos_resumidos']} turnos resumidos")
+
+
+def costo_por_turno(sesiones: int, turnos_por_sesion: int):
+    rng = random.Random(2)
+    ids = [f"sesion-{i}" for i in range(sesiones)]
+    turnos = turnos_sinteticos(rng, turnos_por_sesion)
+    print(f"Costo por turno ({sesiones} sesiones x {turnos_por_sesion} turnos):")
+    us = cargar_sesiones(SesionesMemoria(), ids, turnos)
+    print(f"  memoria: {us:8.1f} us/turno (mensajes + agregar)")
+    with tempfile.TemporaryDirectory() as directorio:
+        store = SesionesSQLite(os.path.join(directorio, "sesiones.sqlite"))
+        us = cargar_sesiones(store, ids, turnos)
+        print(f"  sqlite:  {us:8.1f} us/turno (mensajes + agregar), {store.stats()['bytes'] / 1024:.0f} KB en la base")
+
+
+def ttl():
+    store = SesionesMemoria(ttl_segundos=60)
+    cargar_sesiones(store, [f"sesion-{i}" for i in range(1000)], [("hola?", "Hola.")] * 3)
+    antes = len(store)
+    store.mensajes("otra", ahora=3 + 61)
+    print(f"TTL 60 s: {antes} sesiones -> {len(store)} despues de 61 s sin requests "
+          f"({store.stats()['expiradas']} expiradas)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tokens del prompt y memoria con sesiones largas")
+    parser.add_argument("--turnos", type=int, default=200)
+    parser.add_argument("--sesiones", type=int, default=5000)
+    parser.add_argument("--turnos_por_sesion", type=int, default=30)
+    parser.add_argument("--concurrentes", type=int, default=250)
+    parser.add_argument("--max_mb", type=float, default=4)
+    args = parser.parse_args()
+
+    sesion_larga(args.turnos)
+    memoria(args.sesiones, args.turnos_por_sesion, args.concurrentes, args.max_mb)
+    costo_por_turno(min(args.sesiones, 500), min(args.turnos_por_sesion, 20))
+    ttl()
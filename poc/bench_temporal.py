@@ -0,0 +1,150 @@
+import argparse
+import json
+import os
+import random
+import re
+import tempfile
+import time
+from helper_temporal import IndiceTemporal, obtener_indice_temporal
+
+"""
+Benchmark del temporal_node sobre una linea de tiempo sintetica de miles de experiencias.
+Compara el camino anterior (abrir el JSON en cada consulta, parsear cada periodo con regex y
+buscar la empresa recorriendo la lista) con el indice precompilado de helper_temporal.
+
+Los dos caminos no devuelven lo mismo en todas las consultas: el indice corrige a proposito algunas reglas (periodos
+con mes y "Presente", referencias a empresas por su periodo entero; ver el docstring de helper_temporal). La columna
+"distintas" cuenta las consultas con resultado distinto, y se repite la comparacion sobre una linea de tiempo solo
+con periodos "AAAA – AAAA" y consultas por año, donde las reglas no cambiaron y tiene que dar 0.
+
+Uso:
+    python bench_temporal.py --experiencias 5000 --consultas 500
+"""
+
+MESES = ["Enero", "Febrero", "Marzo", "Abril", "Mayo", "Junio", "Julio", "Agosto",
+         "Septiembre", "Octubre", "Noviembre", "Diciembre"]
+CONECTORES = ["antes", "después", "durante", "en", "desde", "hasta"]
+
+
+def linea_de_tiempo(n: int, semilla: int = 0, solo_años: bool = False) -> dict:
+    rng = random.Random(semilla)
+    experiencias = []
+    for i in range(n):
+        inicio = rng.randint(1990, 2024)
+        fin = inicio + rng.randint(0, 6)
+        if solo_años:
+            periodo = f"{inicio} – {min(fin, 2025)}"
+        elif rng.random() < 0.1:
+            periodo = f"{rng.choice(MESES)} {inicio} – Presente"
+        elif rng.random() < 0.5:
+            periodo = f"{rng.choice(MESES)} {inicio} – {rng.choice(MESES)} {min(fin, 2025)}"
+        else:
+            periodo = f"{inicio} – {min(fin, 2025)}"
+        experiencias.append({"empresa": f"Empresa {i}", "periodo": periodo, "rol": "Rol", "skills": ["python"]})
+    return {"experiencia_laboral": experiencias}
+
+def consultas_sinteticas(n: int, experiencias: int, semilla: int = 1) -> list:
+    rng = random.Random(semilla)
+    consultas = []
+    for _ in range(n):
+        conector = rng.choice(CONECTORES)
+        if rng.random() < 0.5:
+            consultas.append((conector, None, f"Empresa {rng.randrange(experiencias)}"))
+        else:
+            consultas.append((conector, str(rng.randint(1995, 2025)), None))
+    return consultas
+
+
+# ---------- camino anterior (copia de la version previa de helper_temporal) ----------
+def parse_periodo_anterior(periodo_str):
+    patterns = [r'(\d{4})\s*–\s*(\d{4})', r'(\d{4})\s*-\s*(\d{4})', r'(\d{4})\s*–\s*Presente',
+                r'(\d{4})\s*-\s*Presente', r'(\d{4})']
+    for pattern in patterns:
+        match = re.search(pattern, periodo_str)
+        if match:
+            if len(match.groups()) == 2:
+                return (int(match.group(1)), int(match.group(2)))
+            return (int(match.group(1)), int(match.group(1)))
+    return (None, None)
+
+def aplicar_regla_anterior(experiencias, conector, rango_temporal, empresa):
+    año_referencia = None
+    if conector and empresa:
+        for exp in experiencias:
+            if exp.get("empresa", "").lower() == empresa.lower():
+                inicio, fin = parse_periodo_anterior(exp.get("periodo", ""))
+                año_referencia = fin or inicio
+                break
+    elif rango_temporal:
+        año_referencia = int(re.search(r'(\d{4})', rango_temporal).group(1))
+    if not año_referencia:
+        return experiencias
+    filtradas = []
+    for exp in experiencias:
+        inicio, fin = parse_periodo_anterior(exp.get("periodo", ""))
+        if not inicio:
+            continue
+        if conector == "antes" and inicio < año_referencia:
+            filtradas.append(exp)
+        elif conector == "después" and inicio > año_referencia:
+            filtradas.append(exp)
+        elif conector in ["durante", "en", "durante el"] and inicio <= año_referencia <= (fin or inicio):
+            filtradas.append(exp)
+        elif conector == "desde" and inicio >= año_referencia:
+            filtradas.append(exp)
+        elif conector == "hasta" and (fin or inicio) <= año_referencia:
+            filtradas.append(exp)
+    return filtradas
+
+def turno_anterior(path, consulta):
+    with open(path, "r", encoding="utf-8") as f:
+        experiencias = json.load(f).get("experiencia_laboral", [])
+    return aplicar_regla_anterior(experiencias, *consulta)
+
+def turno_indice(path, consulta):
+    return obtener_indice_temporal(path).filtrar(*consulta)
+
+
+def distintas(experiencias: list, consultas: list) -> int:
+    indice = IndiceTemporal(experiencias)
+    return sum(aplicar_regla_anterior(experiencias, *c) != indice.filtrar(*c) for c in consultas)
+
+
+def medir(turno, path, consultas):
+    tiempos = []
+    resultados = 0
+    for consulta in consultas:
+        inicio = time.perf_counter()
+        resultados += len(turno(path, consulta))
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    tiempos.sort()
+    return sum(tiempos) / len(tiempos), tiempos[int(len(tiempos) * 0.95)], resultados / len(consultas)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Latencia de reglas temporales: JSON + regex por consulta vs indice precompilado")
+    parser.add_argument("--experiencias", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--consultas", type=int, default=500)
+    args = parser.parse_args()
+
+    print(f"{'experiencias':>12} {'camino':<10} {'media ms':>9} {'p95 ms':>9} {'resultados':>11} {'distintas':>10}")
+    for n in args.experiencias:
+        with tempfile.TemporaryDirectory() as directorio:
+            path = os.path.join(directorio, "temporal_experience.json")
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(linea_de_tiempo(n), f, ensure_ascii=False)
+            consultas = consultas_sinteticas(args.consultas, n)
+
+            inicio = time.perf_counter()
+            obtener_indice_temporal(path)
+            construccion_ms = (time.perf_counter() - inicio) * 1000
+
+            diferencias = distintas(linea_de_tiempo(n)["experiencia_laboral"], consultas)
+            for nombre, turno in [("anterior", turno_anterior), ("indice", turno_indice)]:
+                media, p95, resultados = medir(turno, path, consultas)
+                print(f"{n:>12} {nombre:<10} {media:>9.3f} {p95:>9.3f} {resultados:>11.1f} "
+                      f"{diferencias if nombre == 'indice' else '':>10}")
+            print(f"{'':>12} (construccion del indice: {construccion_ms:.1f} ms, una vez por cambio del archivo)")
+            por_año = [c for c in consultas if c[2] is None]
+            print(f"{'':>12} (periodos AAAA – AAAA y consultas por año: "
+                  f"{distintas(linea_de_tiempo(n, solo_años=True)['experiencia_laboral'], por_año)} distintas "
+                  f"de {len(por_año)})")
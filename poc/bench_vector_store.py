@@ -0,0 +1,117 @@
+import argparse
+import json
+import os
+import socket
+import time
+import numpy as np
+from stub_llm import StubLLMHandler, levantar_stub_llm
+from vector_store import IndiceLocal, IndiceIVF
+
+"""
+Benchmark del indice vectorial: latencia de query del indice en proceso (fuerza bruta e IVF)
+contra un stand-in HTTP local del servicio remoto, consultado con el cliente de Pinecone.
+El stand-in responde con el mismo IndiceLocal, asi la diferencia es solo el round-trip
+(serializacion, HTTP y cliente). Tambien mide el recall@k del IVF contra la fuerza bruta.
+
+Uso:
+    python bench_vector_store.py --tamanos 60 100000 --dim 1536
+"""
+
+EMPRESAS = ["Meton", "Stealth Crypto Project", "Cukies", "UBA", "Freelance", "CONICET"]
+SKILLS = ["python", "sql", "docker", "aws", "langchain", "machine learning", "react", "git", "hpc", "pipelines"]
+
+
+def corpus_sintetico(n: int, dim: int, semilla: int = 0):
+    """Vectores agrupados (como los skills de un mismo tema) con metadata tipo factual.json."""
+    rng = np.random.default_rng(semilla)
+    centros = rng.standard_normal((max(1, n // 50), dim)).astype(np.float32)
+    vectores = centros[rng.integers(0, len(centros), n)] + 0.5 * rng.standard_normal((n, dim)).astype(np.float32)
+    metadatas = []
+    for i in range(n):
+        skill = SKILLS[i % len(SKILLS)]
+        metadatas.append({
+            "empresa": EMPRESAS[i % len(EMPRESAS)],
+            "rol": "AI Engineer",
+            "periodo": "2023-2024",
+            "skill": skill,
+            "skills": [skill, SKILLS[(i + 3) % len(SKILLS)]]
+        })
+    return vectores, [f"{i}-{m['skill']}" for i, m in enumerate(metadatas)], metadatas
+
+def stand_in_http(indice: IndiceLocal):
+    """Levanta el stub HTTP respondiendo /query con el indice dado, en el formato de Pinecone."""
+    class Handler(StubLLMHandler):
+        def setup(self):
+            super().setup()
+            # Sin Nagle: si no, headers y cuerpo en segmentos separados suman ~40 ms de ACK demorado
+            self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        def do_POST(self):
+            largo = int(self.headers.get("Content-Length", 0))
+            pedido = json.loads(self.rfile.read(largo) or b"{}")
+            resultado = indice.query(
+                vector=pedido["vector"],
+                top_k=pedido.get("topK", 10),
+                include_metadata=pedido.get("includeMetadata", False),
+                filter=pedido.get("filter")
+            )
+            self._responder({
+                "matches": [{"id": m.id, "score": m.score, "values": [], "metadata": m.metadata}
+                            for m in resultado.matches],
+                "namespace": "",
+                "usage": {"readUnits": 1}
+            })
+    servidor, base_url = levantar_stub_llm(handler=Handler)
+    return servidor, base_url.rsplit("/v1", 1)[0]
+
+def medir(index, consultas, filtros, top_k=10):
+    tiempos = []
+    resultados = []
+    for q, filtro in zip(consultas, filtros):
+        inicio = time.perf_counter()
+        r = index.query(vector=q, top_k=top_k, include_metadata=True, filter=filtro)
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+        resultados.append([m.id for m in r.matches])
+    return np.percentile(tiempos, 50), np.percentile(tiempos, 95), resultados
+
+def recall(obtenidos, exactos):
+    aciertos = sum(len(set(o) & set(e)) for o, e in zip(obtenidos, exactos))
+    total = sum(len(e) for e in exactos)
+    return aciertos / total if total else 1.0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Latencia de query: indice en proceso vs servicio HTTP")
+    parser.add_argument("--tamanos", type=int, nargs="+", default=[60, 100000], help="Cantidad de vectores del corpus")
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--consultas", type=int, default=200)
+    parser.add_argument("--nprobe", type=int, default=8)
+    args = parser.parse_args()
+
+    from pinecone import Pinecone
+
+    rng = np.random.default_rng(1)
+    print(f"{'vectores':>9} {'backend':<14} {'filtro':<8} {'p50 ms':>9} {'p95 ms':>9} {'recall@10':>10}")
+    for n in args.tamanos:
+        vectores, ids, metadatas = corpus_sintetico(n, args.dim)
+        local = IndiceLocal(vectores, ids, metadatas)
+        backends = {"local": local}
+        if n >= 1000:
+            inicio = time.perf_counter()
+            backends["ivf"] = IndiceIVF(local.vectores, ids, metadatas, normalizados=True, nprobe=args.nprobe)
+            print(f"  (IVF entrenado en {time.perf_counter() - inicio:.1f} s, {backends['ivf'].n_listas} listas)")
+
+        servidor, host = stand_in_http(local)
+        backends["http (pinecone)"] = Pinecone(api_key=os.getenv("PINECONE_API_KEY", "stub")).Index(name="bench", host=host)
+
+        consultas = [vectores[i] + 0.3 * rng.standard_normal(args.dim).astype(np.float32)
+                     for i in rng.integers(0, n, args.consultas)]
+        consultas = [q.tolist() for q in consultas]
+        for nombre_filtro, filtro in [("ninguno", None),
+                                      ("empresa", {"empresa": {"$eq": "Meton"}, "skill": {"$in": ["python", "sql"]}})]:
+            filtros = [filtro] * len(consultas)
+            _, _, exactos = medir(local, consultas, filtros)
+            for nombre, index in backends.items():
+                medir(index, consultas[:10], filtros[:10])  # calentamiento (conexion, caches)
+                p50, p95, obtenidos = medir(index, consultas, filtros)
+                print(f"{n:>9} {nombre:<14} {nombre_filtro:<8} {p50:>9.3f} {p95:>9.3f} {recall(obtenidos, exactos):>10.3f}")
+        servidor.shutdown()
@@ -0,0 +1,225 @@
+import atexit
+import datetime
+import json
+import os
+import queue
+import re
+import threading
+import time
+from pathlib import Path
+
+"""
+Log de conversaciones en JSON Lines, append-only, escrito desde un thread en background.
+Antes cada request leia el archivo del dia completo, agregaba una entrada y lo reescribia con indent=2:
+O(n^2) a lo largo del dia y con carreras entre workers.
+
+- log() solo encola la entrada: el request no toca el disco.
+- El thread escribe por lotes, cada lote con un unico write() sobre un archivo abierto con O_APPEND,
+  asi las lineas de varios procesos no se mezclan.
+- fsync agrupado: como mucho uno cada `intervalo_fsync_s` (y siempre al cerrar).
+- Rotacion por fecha (un archivo por dia) y por tamaño: chat_log_YYYY-MM-DD.jsonl, .1.jsonl, .2.jsonl...
+- leer_ultimas(n) lee el final de los archivos hacia atras, sin parsear el dia entero. Si faltan entradas
+  tambien lee el log del dia en el formato anterior (chat_log_YYYY-MM-DD.json, una lista JSON).
+"""
+
+
+class ChatLogger:
+    """Escritor de logs JSONL en background.
+    Args:
+        directorio (str|Path): carpeta de los logs.
+        prefijo (str): prefijo de los archivos.
+        max_bytes (int): tamaño a partir del cual se abre un segmento nuevo del mismo dia.
+        intervalo_fsync_s (float): tiempo maximo entre fsyncs (0 para fsync en cada lote).
+        max_cola (int): entradas pendientes maximas. Si la cola se llena se descartan (y se cuentan).
+    """
+
+    def __init__(self, directorio="logs", prefijo: str = "chat_log", max_bytes: int = 50 * 1024 * 1024,
+                 intervalo_fsync_s: float = 1.0, max_cola: int = 10000):
+        self.directorio = Path(directorio)
+        self.directorio.mkdir(parents=True, exist_ok=True)
+        self.prefijo = prefijo
+        self.max_bytes = max_bytes
+        self.intervalo_fsync_s = intervalo_fsync_s
+        self._cola = queue.Queue(maxsize=max_cola)
+        self._patron = re.compile(rf"^{re.escape(prefijo)}_(\d{{4}}-\d{{2}}-\d{{2}})(?:\.(\d+))?\.jsonl$")
+
+        self._fd = None
+        self._path = None
+        self._fecha = None
+        self._sin_fsync = False
+        self._ultimo_fsync = time.monotonic()
+
+        self.escritas = 0
+        self.descartadas = 0
+        self.fsyncs = 0
+
+        self._thread = threading.Thread(target=self._loop, name="chat-logger", daemon=True)
+        self._thread.start()
+        atexit.register(self.cerrar)
+
+    # ---------- API ----------
+    def log(self, entrada: dict):
+        """Encola una entrada. No bloquea ni hace I/O."""
+        try:
+            self._cola.put_nowait(entrada)
+        except queue.Full:
+            self.descartadas += 1
+
+    def flush(self, timeout: float = 5.0):
+        """Espera a que se escriba (y sincronice) todo lo encolado hasta ahora."""
+        listo = threading.Event()
+        self._cola.put(listo, timeout=timeout)
+        listo.wait(timeout)
+
+    def cerrar(self):
+        if self._thread.is_alive():
+            self._cola.put(None)
+            self._thread.join(timeout=10)
+
+    def stats(self) -> dict:
+        return {
+            "escritas": self.escritas,
+            "descartadas": self.descartadas,
+            "pendientes": self._cola.qsize(),
+            "fsyncs": self.fsyncs,
+            "archivo": str(self._path) if self._path else None
+        }
+
+    # ---------- archivos ----------
+    def segmentos(self, fecha: str = None) -> list:
+        """Archivos de log (de una fecha o de todas), del mas viejo al mas nuevo."""
+        encontrados = []
+        for path in self.directorio.iterdir():
+            match = self._patron.match(path.name)
+            if match and (fecha is None or match.group(1) == fecha):
+                encontrados.append((match.group(1), int(match.group(2) or 0), path))
+        return [path for _, _, path in sorted(encontrados)]
+
+    def _path_segmento(self, fecha: str, numero: int) -> Path:
+        sufijo = f".{numero}" if numero else ""
+        return self.directorio / f"{self.prefijo}_{fecha}{sufijo}.jsonl"
+
+    def _abrir(self, fecha: str):
+        """Abre el ultimo segmento del dia, o uno nuevo si ese ya supera max_bytes."""
+        self._cerrar_archivo()
+        existentes = self.segmentos(fecha)
+        numero = int(self._patron.match(existentes[-1].name).group(2) or 0) if existentes else 0
+        path = self._path_segmento(fecha, numero)
+        if path.exists() and path.stat().st_size >= self.max_bytes:
+            path = self._path_segmento(fecha, numero + 1)
+        self._fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        self._path = path
+        self._fecha = fecha
+
+    def _cerrar_archivo(self):
+        if self._fd is not None:
+            self._sincronizar(forzar=True)
+            os.close(self._fd)
+            self._fd = None
+
+    def _sincronizar(self, forzar: bool = False):
+        if self._fd is None or not self._sin_fsync:
+            return
+        if forzar or time.monotonic() - self._ultimo_fsync >= self.intervalo_fsync_s:
+            os.fsync(self._fd)
+            self.fsyncs += 1
+            self._sin_fsync = False
+            self._ultimo_fsync = time.monotonic()
+
+    def _escribir(self, entradas: list):
+        fecha = datetime.date.today().isoformat()
+        if fecha != self._fecha or self._fd is None:
+            self._abrir(fecha)
+        elif os.fstat(self._fd).st_size >= self.max_bytes:
+            self._abrir(fecha)
+        datos = "".join(json.dumps(e, ensure_ascii=False, default=str) + "\n" for e in entradas).encode("utf-8")
+        os.write(self._fd, datos)
+        self.escritas += len(entradas)
+        self._sin_fsync = True
+
+    # ---------- thread ----------
+    def _loop(self):
+        while True:
+            try:
+                item = self._cola.get(timeout=self.intervalo_fsync_s or 1.0)
+            except queue.Empty:
+                self._sincronizar()
+                continue
+            lote, eventos, terminar = [], [], False
+            # Se vacia lo que haya en la cola para escribirlo en un solo write()
+            while True:
+                if item is None:
+                    terminar = True
+                elif isinstance(item, threading.Event):
+                    eventos.append(item)
+                else:
+                    lote.append(item)
+                try:
+                    item = self._cola.get_nowait()
+                except queue.Empty:
+                    break
+            try:
+                if lote:
+                    self._escribir(lote)
+                self._sincronizar(forzar=bool(eventos) or terminar)
+            except Exception as e:
+                # Cualquier error deja el thread vivo: si muriera, la cola se llenaria y se perderian entradas
+                print(f"[LOG] Error escribiendo el log: {type(e).__name__}: {e}")
+            for evento in eventos:
+                evento.set()
+            if terminar:
+                self._cerrar_archivo()
+                return
+
+    # ---------- lectura ----------
+    def leer_ultimas(self, n: int = 50) -> list:
+        """Ultimas n entradas del dia, leyendo los segmentos desde el final. Si no alcanzan, completa con el
+        log del dia en el formato anterior (lista JSON), que es mas viejo que los segmentos."""
+        fecha = datetime.date.today().isoformat()
+        entradas = []
+        for path in reversed(self.segmentos(fecha)):
+            faltan = n - len(entradas)
+            if faltan <= 0:
+                break
+            entradas = leer_cola_jsonl(path, faltan) + entradas
+        faltan = n - len(entradas)
+        anterior = self.directorio / f"{self.prefijo}_{fecha}.json"
+        if faltan > 0 and anterior.exists():
+            try:
+                with open(anterior, "r", encoding="utf-8") as f:
+                    entradas = json.load(f)[-faltan:] + entradas
+            except (OSError, ValueError) as e:
+                print(f"[LOG] No se pudo leer {anterior.name}: {e}")
+        return entradas
+
+
+def leer_cola_jsonl(path, n: int, bloque: int = 64 * 1024) -> list:
+    """Lee las ultimas n lineas de un archivo JSONL leyendo bloques desde el final."""
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        posicion = f.tell()
+        datos = b""
+        while posicion > 0 and datos.count(b"\n") <= n:
+            leer = min(bloque, posicion)
+            posicion -= leer
+            f.seek(posicion)
+            datos = f.read(leer) + datos
+    lineas = datos.splitlines()
+    if posicion > 0:
+        lineas = lineas[1:]  # la primera puede estar cortada
+    entradas = []
+    for linea in lineas[-n:] if n > 0 else []:
+        try:
+            entradas.append(json.loads(linea))
+        except json.JSONDecodeError:
+            continue  # linea a medio escribir
+    return entradas
+
+
+def desde_entorno(directorio="logs") -> ChatLogger:
+    """Logger configurado por variables de entorno (CHAT_LOG_MAX_MB, CHAT_LOG_FSYNC_INTERVAL)."""
+    return ChatLogger(
+        directorio=os.getenv("CHAT_LOG_DIR", directorio),
+        max_bytes=int(float(os.getenv("CHAT_LOG_MAX_MB", "50")) * 1024 * 1024),
+        intervalo_fsync_s=float(os.getenv("CHAT_LOG_FSYNC_INTERVAL", "1.0"))
+    )
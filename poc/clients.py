@@ -0,0 +1,145 @@
+import asyncio
+import os
+from functools import lru_cache
+import httpx
+import openai
+from langchain_openai import ChatOpenAI
+from pinecone import Pinecone
+from embedding_cache import desde_entorno as embedding_cache_desde_entorno
+from vector_store import cargar_indice, DEFAULT_DIR as VECTOR_STORE_DEFAULT_DIR
+import dotenv
+dotenv.load_dotenv()
+
+
+"""
+Registro de clientes compartidos por proceso: LLM, embeddings e indice vectorial.
+Antes cada turno construia un ChatOpenAI por nodo y un cliente de Pinecone nuevo, pagando la
+construccion y el setup de TCP/TLS varias veces por turno. Aca se construyen una sola vez por
+proceso y todos comparten el mismo pool HTTP con keep-alive (uno sync y uno async).
+
+Los clientes async quedan atados al event loop donde se usan por primera vez. En el server hay
+un unico loop (uvicorn), asi que se cachean igual que los sync.
+"""
+
+LLM_MODEL = os.getenv("LLM_MODEL", "gpt-4o-mini")
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
+PINECONE_INDEX = os.getenv("PINECONE_INDEX", "Nombre_de_la_DB")
+
+# Configuracion del pool HTTP compartido
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "60"))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "60"))
+
+
+def _limites() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY
+    )
+
+@lru_cache(maxsize=None)
+def get_http_client() -> httpx.Client:
+    """Pool HTTP sync compartido por todos los clientes de OpenAI del proceso."""
+    return httpx.Client(limits=_limites(), timeout=httpx.Timeout(HTTP_TIMEOUT, connect=10))
+
+@lru_cache(maxsize=None)
+def get_async_http_client() -> httpx.AsyncClient:
+    """Pool HTTP async compartido por todos los clientes de OpenAI del proceso."""
+    return httpx.AsyncClient(limits=_limites(), timeout=httpx.Timeout(HTTP_TIMEOUT, connect=10))
+
+@lru_cache(maxsize=None)
+def get_chat_model(temperature: float = 0.05, model: str = LLM_MODEL) -> ChatOpenAI:
+    """Modelo de chat compartido. Sirve para invoke y ainvoke (usa el pool sync o async segun el caso)."""
+    return ChatOpenAI(
+        model=model,
+        temperature=temperature,
+        http_client=get_http_client(),
+        http_async_client=get_async_http_client()
+    )
+
+@lru_cache(maxsize=None)
+def get_openai() -> openai.OpenAI:
+    """Cliente sync de OpenAI (embeddings)."""
+    return openai.OpenAI(http_client=get_http_client())
+
+@lru_cache(maxsize=None)
+def get_async_openai() -> openai.AsyncOpenAI:
+    """Cliente async de OpenAI (embeddings)."""
+    return openai.AsyncOpenAI(http_client=get_async_http_client())
+
+@lru_cache(maxsize=None)
+def get_pinecone() -> Pinecone:
+    return Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
+
+VECTOR_BACKENDS = ("pinecone", "local", "ivf", "auto")
+
+def vector_backend() -> str:
+    """Backend del indice vectorial: "pinecone" (remoto), "local" (fuerza bruta), "ivf" o "auto".
+    Un valor desconocido es un error: no se cae en silencio al indice local."""
+    backend = os.getenv("VECTOR_BACKEND", "pinecone").lower()
+    if backend not in VECTOR_BACKENDS:
+        raise ValueError(f"VECTOR_BACKEND={backend!r} no es valido (opciones: {', '.join(VECTOR_BACKENDS)})")
+    return backend
+
+@lru_cache(maxsize=None)
+def get_index(name: str = PINECONE_INDEX):
+    """Handle del indice vectorial. Con VECTOR_BACKEND=pinecone es el indice remoto: si esta definido
+    PINECONE_HOST se conecta directo al host (evita la llamada al control plane para resolverlo).
+    Con los backends locales abre el snapshot de VECTOR_STORE_DIR, que responde con la misma interfaz."""
+    backend = vector_backend()
+    if backend != "pinecone":
+        return cargar_indice(os.getenv("VECTOR_STORE_DIR", str(VECTOR_STORE_DEFAULT_DIR)), backend=backend)
+    host = os.getenv("PINECONE_HOST")
+    if host:
+        return get_pinecone().Index(name=name, host=host)
+    return get_pinecone().Index(name)
+
+
+class IndiceAsync:
+    """Handle async del indice. La query del cliente de Pinecone (y su pool de conexiones) corre en un
+    thread; la de un indice local se resuelve en microsegundos y se llama directo."""
+
+    def __init__(self, index, en_thread: bool = True):
+        self._index = index
+        self._en_thread = en_thread
+
+    async def query(self, **kwargs):
+        if not self._en_thread:
+            return self._index.query(**kwargs)
+        return await asyncio.to_thread(self._index.query, **kwargs)
+
+@lru_cache(maxsize=None)
+def get_index_async(name: str = PINECONE_INDEX) -> IndiceAsync:
+    return IndiceAsync(get_index(name), en_thread=vector_backend() == "pinecone")
+
+
+# Cache de embeddings compartido por el chat (factual_node, cache de respuestas)
+cache_embeddings = embedding_cache_desde_entorno()
+
+def embed_textos(textos: list, model: str = EMBEDDING_MODEL) -> list:
+    """Embeddings de varios textos en un solo llamado, pasando por el cache de embeddings."""
+    def embed_lote(lote):
+        return [d.embedding for d in get_openai().embeddings.create(input=lote, model=model).data]
+    return cache_embeddings.obtener(textos, model, embed_lote)
+
+async def aembed_textos(textos: list, model: str = EMBEDDING_MODEL) -> list:
+    """Version async de embed_textos."""
+    async def aembed_lote(lote):
+        response = await get_async_openai().embeddings.create(input=lote, model=model)
+        return [d.embedding for d in response.data]
+    return await cache_embeddings.aobtener(textos, model, aembed_lote)
+
+def embed_query(texto: str, model: str = EMBEDDING_MODEL) -> list:
+    return embed_textos([texto], model)[0].tolist()
+
+async def aembed_query(texto: str, model: str = EMBEDDING_MODEL) -> list:
+    return (await aembed_textos([texto], model))[0].tolist()
+
+
+def reset_clients():
+    """Descarta todos los clientes cacheados (ej: despues de cambiar variables de entorno en tests o benchmarks)."""
+    for fn in (get_http_client, get_async_http_client, get_chat_model, get_openai,
+               get_async_openai, get_pinecone, get_index, get_index_async):
+        fn.cache_clear()
@@ -0,0 +1,149 @@
+import json
+import os
+import random
+import threading
+import time
+from pathlib import Path
+import numpy as np
+
+"""
+Corpus de ejemplos de estilo del personality_node (faiss_metadata.json).
+Los textos se cargan una sola vez por proceso en un almacen compacto: todos los textos en un unico
+blob UTF-8 y un array de offsets (int64). Sacar k ejemplos al azar es O(k): se sortean k posiciones
+y se decodifican solo esos k textos, sin recorrer ni copiar el corpus.
+
+El archivo se recarga solo cuando cambia en disco (mtime o tamaño, chequeado como mucho una vez por
+INTERVALO_CHEQUEO_S). Opcionalmente el blob y los offsets se compilan a disco (compilar_corpus) y se
+abren con mmap: el siguiente proceso (otro worker de uvicorn, un reinicio) no vuelve a parsear el JSON
+y los workers comparten las paginas del blob.
+"""
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+PERSONALITY_PATH = Path(os.getenv("PERSONALITY_METADATA_PATH",
+                                  BASE_DIR / "data_ing" / "Factica" / "db_personality" / "faiss_metadata.json"))
+INTERVALO_CHEQUEO_S = float(os.getenv("PERSONALITY_RELOAD_INTERVAL", "1.0"))
+
+
+class CorpusPersonalidad:
+    """Textos en un blob UTF-8 + offsets: el texto i es blob[offsets[i]:offsets[i + 1]].
+    Args:
+        blob (bytes | np.memmap): textos concatenados en UTF-8.
+        offsets (np.ndarray): n + 1 offsets crecientes, el primero 0.
+    """
+
+    def __init__(self, blob, offsets):
+        self.blob = blob
+        self.offsets = offsets
+
+    @classmethod
+    def desde_textos(cls, textos) -> "CorpusPersonalidad":
+        codificados = [t.encode("utf-8") for t in textos if t]
+        offsets = np.zeros(len(codificados) + 1, dtype=np.int64)
+        np.cumsum([len(c) for c in codificados], out=offsets[1:])
+        return cls(b"".join(codificados), offsets)
+
+    @classmethod
+    def desde_json(cls, path) -> "CorpusPersonalidad":
+        """Lee faiss_metadata.json (lista de dicts con 'texto'). El JSON parseado se descarta al terminar."""
+        with open(path, "r", encoding="utf-8") as f:
+            metadata = json.load(f)
+        return cls.desde_textos(m.get("texto", "") for m in metadata)
+
+    @classmethod
+    def desde_compilado(cls, destino) -> "CorpusPersonalidad":
+        """Abre un corpus escrito por compilar_corpus con mmap (no lo lee entero)."""
+        destino = Path(destino)
+        offsets = np.load(_archivo(destino, ".offsets.npy"), mmap_mode="r")
+        tamaño_blob = int(offsets[-1])
+        blob = np.memmap(_archivo(destino, ".blob"), dtype=np.uint8, mode="r") if tamaño_blob else b""
+        return cls(blob, offsets)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        inicio, fin = int(self.offsets[i]), int(self.offsets[i + 1])
+        return bytes(self.blob[inicio:fin]).decode("utf-8")
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.blob) + self.offsets.nbytes
+
+    def muestrear(self, k: int, rng=random) -> list:
+        """k textos distintos al azar (o todos si hay menos). random.sample sobre un range no lo materializa."""
+        return [self[i] for i in rng.sample(range(len(self)), min(k, len(self)))]
+
+
+# ---------- compilado a disco ----------
+def _archivo(destino: Path, sufijo: str) -> Path:
+    return destino.with_name(destino.name + sufijo)
+
+def _huella(path: Path) -> list:
+    st = path.stat()
+    return [st.st_mtime_ns, st.st_size]
+
+def compilar_corpus(path=None, destino=None) -> Path:
+    """Escribe <destino>.blob, <destino>.offsets.npy y <destino>.corpus.json (huella del JSON de origen).
+    Por defecto destino es el JSON sin extension. La escritura es atomica por archivo y la huella se escribe
+    ultima, asi que un compilado a medias nunca se da por valido."""
+    path = Path(path or PERSONALITY_PATH)
+    destino = Path(destino or path.with_suffix(""))
+    huella = _huella(path)  # antes de leer: si el JSON cambia mientras tanto, el compilado queda viejo
+    corpus = CorpusPersonalidad.desde_json(path)
+    for sufijo, escribir in ((".blob", lambda f: f.write(corpus.blob)),
+                             (".offsets.npy", lambda f: np.save(f, corpus.offsets))):
+        temporal = _archivo(destino, sufijo + ".tmp")
+        with open(temporal, "wb") as f:
+            escribir(f)
+        os.replace(temporal, _archivo(destino, sufijo))
+    temporal = _archivo(destino, ".corpus.json.tmp")
+    with open(temporal, "w", encoding="utf-8") as f:
+        json.dump({"origen": str(path), "huella": huella, "textos": len(corpus)}, f)
+    os.replace(temporal, _archivo(destino, ".corpus.json"))
+    return destino
+
+def _compilado_vigente(path: Path, huella: list):
+    """Destino del compilado si existe y corresponde a la version actual del JSON."""
+    destino = path.with_suffix("")
+    try:
+        with open(_archivo(destino, ".corpus.json"), "r", encoding="utf-8") as f:
+            cabecera = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    return destino if cabecera.get("huella") == huella else None
+
+
+# ---------- carga con recarga automatica ----------
+_corpus = {}
+_lock = threading.Lock()
+
+def obtener_corpus_personalidad(path=None):
+    """Corpus del archivo, cargado una vez por proceso. Usa el compilado (mmap) si esta al dia y si no
+    parsea el JSON. Se recarga cuando cambia el mtime o el tamaño del JSON. None si el archivo no existe."""
+    path = Path(path or PERSONALITY_PATH)
+    ahora = time.monotonic()
+    with _lock:
+        actual = _corpus.get(path)
+        if actual is not None and ahora - actual["chequeado"] < INTERVALO_CHEQUEO_S:
+            return actual["corpus"]
+        try:
+            huella = _huella(path)
+        except FileNotFoundError:
+            _corpus.pop(path, None)
+            return None
+        if actual is None or actual["huella"] != huella:
+            compilado = _compilado_vigente(path, huella)
+            corpus = (CorpusPersonalidad.desde_compilado(compilado) if compilado
+                      else CorpusPersonalidad.desde_json(path))
+            actual = {"corpus": corpus, "huella": huella}
+            _corpus[path] = actual
+        actual["chequeado"] = ahora
+        return actual["corpus"]
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Compila faiss_metadata.json a blob + offsets para abrirlo con mmap")
+    parser.add_argument("--path", default=str(PERSONALITY_PATH))
+    args = parser.parse_args()
+    destino = compilar_corpus(args.path)
+    print(f"✅ Corpus compilado en {destino}.blob / {destino}.offsets.npy ({len(obtener_corpus_personalidad(args.path))} textos)")
@@ -0,0 +1,294 @@
+import json
+import re
+import os
+import unicodedata
+from functools import lru_cache
+from pathlib import Path
+
+
+"""
+Detector local basado en reglas. Antes de mandar el prompt del detector a la LLM en cada turno,
+se intenta extraer tipo, skills, empresa, rango y conector temporal con:
+- el mapeo de skills de normalize_skills,
+- un diccionario de empresas armado desde factual.json y temporal_experience.json,
+- regex de años y conectores temporales (como las de helper_temporal.py).
+Si la confianza del resultado es baja se cae a la LLM (ver detector_node en graph.py).
+"""
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+FACTUAL_PATH = BASE_DIR / "data_ing" / "Factica" / "factual.json"
+TEMPORAL_PATH = BASE_DIR / "data_ing" / "Factica" / "temporal_experience.json"
+
+# Confianza minima para no llamar a la LLM
+UMBRAL_CONFIANZA = float(os.getenv("DETECTOR_LOCAL_UMBRAL", "0.6"))
+
+# Mapeo de variaciones a términos estándar
+SKILL_MAPPING = {
+    # AI variations
+    "inteligencia artificial": "ai",
+    "ia": "ai", 
+    "ai": "ai",
+    "desarrollo de ia": "ai",
+    "desarrollo de ai": "ai",
+    "desarrollo ia": "ai",
+    "desarrollo ai": "ai",
+    
+    # Machine Learning variations
+    "machine learning": "machine learning",
+    "ml": "machine learning",
+    "aprendizaje automatico": "machine learning",
+    "aprendizaje automático": "machine learning",
+    
+    # Data Science variations
+    "data science": "data science",
+    "ciencia de datos": "data science",
+    "datascience": "data science",
+    
+    # Programming variations
+    "programacion": "python",  # default to python if no specific language
+    "programación": "python",
+    "coding": "python",
+    "desarrollo": "python",
+    
+    # Web development
+    "desarrollo web": "backend",
+    "web development": "backend",
+    "frontend": "backend",  # assuming backend for now
+    
+    # Other common variations
+    "ci/cd": "ci/cd",
+    "cicd": "ci/cd",
+    "continuous integration": "ci/cd",
+    "github": "github actions",
+    "aws lambda": "lambda",
+    "lambda functions": "lambda",
+    "apis": "apis",
+    "api": "apis",
+    "rest api": "apis",
+    "graphql": "apis",
+    
+    # Personal skills variations
+    "cocinar": "cocina",
+    "cooking": "cocina",
+    "music": "musica",
+    "sports": "deportes",
+    "languages": "idiomas",
+    "photography": "fotografia",
+    "travel": "viajes",
+    "reading": "lectura",
+    "writing": "escritura",
+    "meditation": "meditacion",
+    "cycling": "ciclismo",
+    "soccer": "futbol",
+    "football": "futbol",
+    "guitar": "guitarra",
+    "spanish": "espanol",
+    "english": "ingles",
+    "portuguese": "portugues",
+    "video editing": "edicion de video",
+    "blog": "blogging",
+    "podcast": "podcasting"
+}
+
+
+def normalize_skills(skills: list) -> list:
+    """ Esta funcion tiene como intencion normalizar los skills para que la prueba sea mas efectiva.
+    Esto es importante porque posteriormenten, en el detector node se extrae sobre que skill se pregunta.
+    Como los skills no cambian con el tiempo (a lo sumo se agregan) no es un hardcode inadecuado para un primer PoC """
+
+
+    if not skills:
+        return []
+    
+    normalized = []
+    for skill in skills:
+        skill_lower = skill.lower().strip()
+        # Buscar en el mapeo
+        if skill_lower in SKILL_MAPPING:
+            normalized.append(SKILL_MAPPING[skill_lower])
+        else:
+            # Si no está en el mapeo, mantener el original
+            normalized.append(skill_lower)
+    
+    # Remover duplicados manteniendo el orden
+    seen = set()
+    unique_normalized = []
+    for skill in normalized:
+        if skill not in seen:
+            seen.add(skill)
+            unique_normalized.append(skill)
+    
+    return unique_normalized
+
+
+# Skills que el detector puede devolver (los mismos que lista el prompt del detector)
+SKILLS_LABORALES = [
+    "python", "javascript", "react", "node", "sql", "aws", "docker", "langchain", "ai", "machine learning",
+    "data science", "ci/cd", "github actions", "lambda", "apis", "backend", "metodologia", "estadistica",
+    "simulacion", "drug discovery", "multiagente", "automatizacion", "pipelines", "hpc", "coordinacion",
+    "planificacion", "community manager", "rag", "faiss", "pinecone", "fluorescencia"
+]
+SKILLS_PERSONALES = [
+    "cocina", "musica", "deportes", "idiomas", "fotografia", "viajes", "lectura", "escritura", "meditacion",
+    "yoga", "ciclismo", "futbol", "guitarra", "piano", "espanol", "ingles", "portugues", "blogging",
+    "podcasting", "fotografia digital", "edicion de video"
+]
+
+# Referencias a estudios. El prompt del detector las mapea a la universidad.
+ALIAS_ESTUDIOS = ["doctorado", "maestria", "universidad", "facultad", "uba", "phd", "tesis"]
+EMPRESA_ESTUDIOS = "Universidad de Buenos Aires"
+
+# Conectores temporales, en el formato que espera aplicar_regla_temporal
+CONECTORES = [
+    ("antes", re.compile(r"\bantes\b")),
+    ("después", re.compile(r"\b(?:despues|luego)\b")),
+    ("desde", re.compile(r"\bdesde\b")),
+    ("hasta", re.compile(r"\bhasta\b")),
+    ("durante", re.compile(r"\b(?:durante|mientras)\b")),
+]
+PATRON_RANGO = re.compile(r"\b((?:19|20)\d{2})\s*[-–]\s*((?:19|20)\d{2})\b")
+PATRON_AÑO = re.compile(r"\b((?:19|20)\d{2})\b")
+PATRON_EN_AÑO = re.compile(r"\ben\s+(?:el\s+)?(?:ano\s+)?(?:19|20)\d{2}\b")
+# Expresiones relativas ("hace 5 años", "el año pasado") que solo la LLM resuelve bien
+PATRON_RELATIVO = re.compile(r"\b(?:hace\s+\w+|ultimos?\s+\w+\s+anos?|ano\s+pasado|recientemente|cuando)\b")
+PATRON_ENTRE = re.compile(r"\bentre\b")
+
+# Raices de palabras por topico y emocion (se comparan sin tildes, como prefijo de palabra)
+TOPICOS = {
+    "trabajo": ["trabaj", "labur", "empresa", "puesto", "experiencia", "cargo", "proyecto", "equipo", "cliente"],
+    "estudios": ["estudi", "doctorado", "maestria", "universidad", "facultad", "carrera", "tesis", "curso"],
+    "tecnología": ["program", "codigo", "software", "tecnolog", "framework", "herramienta"],
+    "ocio": ["hobb", "tiempo libre", "fin de semana", "vacaciones"],
+    "deportes": ["deporte", "futbol", "ciclismo", "yoga", "corr", "gimnasio"],
+    "comida": ["comida", "cocin", "receta", "asado"],
+    "viajes": ["viaj"],
+    "familia": ["familia", "hijo", "padre", "hermano"],
+    "amistad": ["amig", "amistad"],
+    "dinero": ["sueldo", "salario", "dinero", "plata", "pretension"],
+    "salud": ["salud", "enferm", "medic"],
+    "entretenimiento": ["pelicula", "serie", "musica", "libro", "juego"],
+}
+EMOCIONES = {
+    "joy": ["gracias", "genial", "excelente", "buenisim", "increible", "me encanta", "jaja"],
+    "anger": ["enojad", "molest", "odio", "bronca"],
+    "sadness": ["triste", "lamentablemente", "extran"],
+    "surprise": ["wow", "en serio", "no puedo creer"],
+}
+PATRONES_TOPICO = [(t, re.compile(r"\b(?:" + "|".join(p) + ")")) for t, p in TOPICOS.items()]
+PATRONES_EMOCION = [(e, re.compile(r"\b(?:" + "|".join(p) + ")")) for e, p in EMOCIONES.items()]
+# Topicos de los skills, para cuando la consulta no tiene palabras de topico
+TOPICO_SKILLS_LABORALES = "trabajo"
+TOPICO_SKILLS_PERSONALES = "ocio"
+
+
+def sin_tildes(texto: str) -> str:
+    texto = unicodedata.normalize("NFKD", texto.lower())
+    return "".join(c for c in texto if not unicodedata.combining(c))
+
+def _alternancia(terminos) -> re.Pattern:
+    """Regex con todos los terminos, los mas largos primero para que gane el match mas especifico."""
+    terminos = sorted(set(terminos), key=len, reverse=True)
+    return re.compile(r"(?<![\w/])(" + "|".join(re.escape(t) for t in terminos) + r")(?![\w/])")
+
+
+@lru_cache(maxsize=1)
+def _diccionario_skills():
+    """alias sin tildes -> skill canonico."""
+    alias = {sin_tildes(k): v for k, v in SKILL_MAPPING.items()}
+    for skill in SKILLS_LABORALES + SKILLS_PERSONALES:
+        alias.setdefault(sin_tildes(skill), skill)
+    return alias, _alternancia(alias)
+
+def _cargar_json(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+@lru_cache(maxsize=1)
+def _diccionario_empresas():
+    """alias sin tildes -> nombre de empresa. Se prefiere el nombre de factual.json porque es el que
+    esta en la metadata de Pinecone (el filtro de factual_node es por igualdad)."""
+    nombres_factual = [e.get("empresa", "") for e in (_cargar_json(FACTUAL_PATH) or [])]
+    temporal = _cargar_json(TEMPORAL_PATH) or {}
+    nombres_temporal = [e.get("empresa", "") for e in temporal.get("experiencia_laboral", [])]
+
+    alias = {}
+    for nombre in nombres_factual + nombres_temporal:
+        if not nombre or nombre.lower() == "personal":
+            continue
+        primera = sin_tildes(nombre).split()[0]
+        # Nombre canonico: el de factual.json que comparte la primera palabra, si existe
+        canonico = next((n for n in nombres_factual if sin_tildes(n).split()[:1] == [primera]), nombre)
+        alias.setdefault(sin_tildes(nombre), canonico)
+        if len(primera) > 3 and primera not in ("universidad",):
+            alias.setdefault(primera, canonico)
+    for termino in ALIAS_ESTUDIOS:
+        alias[termino] = EMPRESA_ESTUDIOS
+    return alias, _alternancia(alias)
+
+
+def detectar_local(consulta: str) -> dict:
+    """Extrae los campos del detector sin llamar a la LLM.
+    Devuelve {"detector": {...}, "confianza": float}. El dict del detector tiene la misma forma
+    que el que arma parsear_detector en graph.py, mas "origen": "local".
+    """
+    texto = sin_tildes(consulta)
+
+    alias_skills, patron_skills = _diccionario_skills()
+    skills = normalize_skills([alias_skills[m] for m in patron_skills.findall(texto)])
+
+    alias_empresas, patron_empresas = _diccionario_empresas()
+    empresas = list(dict.fromkeys(alias_empresas[m] for m in patron_empresas.findall(texto)))
+    empresa = empresas[0] if empresas else None
+
+    rango = None
+    match_rango = PATRON_RANGO.search(texto)
+    if match_rango:
+        rango = f"{match_rango.group(1)}-{match_rango.group(2)}"
+    else:
+        match_año = PATRON_AÑO.search(texto)
+        if match_año:
+            rango = match_año.group(1)
+
+    conectores = [nombre for nombre, patron in CONECTORES if patron.search(texto)]
+    conector = conectores[0] if conectores else None
+    if conector is None and rango:
+        # "en 2020", "durante 2019", "entre 2019-2021": un año o rango solo se interpreta como "durante"
+        conector = "en" if PATRON_EN_AÑO.search(texto) and not match_rango else "durante"
+
+    # "entre" sin un rango explicito ("entre Meton y Cukies") lo resuelve la LLM
+    relativo = PATRON_RELATIVO.search(texto) is not None or (PATRON_ENTRE.search(texto) is not None and not match_rango)
+    tipo = "temporal" if (conector or rango) else "factual"
+
+    topic = next((t for t, patron in PATRONES_TOPICO if patron.search(texto)), None)
+    if topic is None and (skills or empresa):
+        topic = TOPICO_SKILLS_PERSONALES if skills and all(s in SKILLS_PERSONALES for s in skills) else TOPICO_SKILLS_LABORALES
+    emotion = next((e for e, patron in PATRONES_EMOCION if patron.search(texto)), "others")
+
+    # Confianza: alta si hay señales explicitas y no ambiguas, baja si hay que interpretar
+    confianza = 0.3
+    if skills or empresa:
+        confianza = 0.8
+    if tipo == "temporal":
+        # Un conector sin año ni empresa de referencia no alcanza para filtrar
+        confianza = 0.85 if (rango or empresa) else 0.4
+    if relativo or len(conectores) > 1 or len(empresas) > 1:
+        confianza = min(confianza, 0.4)
+    if topic is None or len(texto.split()) > 25:
+        confianza = min(confianza, 0.5)
+
+    return {
+        "detector": {
+            "tipo": tipo,
+            "topic": topic or "",
+            "emotion": emotion,
+            "skills": skills,
+            "empresa": empresa,
+            "rango_temporal": rango,
+            "conector_temporal": conector,
+            "origen": "local"
+        },
+        "confianza": confianza
+    }
@@ -0,0 +1,252 @@
+import asyncio
+import hashlib
+import os
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin lock entre procesos
+    fcntl = None
+
+
+"""
+Cache de embeddings direccionado por contenido: la clave es (modelo, texto normalizado).
+Lo comparten el chat (factual_node, cache de respuestas) y los scripts de ingesta, asi ningun
+texto identico se vuelve a mandar a la API de embeddings.
+
+Dos niveles:
+- Memoria: LRU de vectores float32.
+- Disco (opcional): por modelo, una matriz float32 append-only que se lee memory-mapped
+  (<modelo>.f32) y un indice hash -> fila (<modelo>.keys). Sobrevive reinicios y se puede
+  compartir entre procesos (las escrituras toman un lock del archivo).
+"""
+
+BASE_DIR = Path(__file__).resolve().parent
+DEFAULT_DIR = BASE_DIR / ".cache" / "embeddings"
+
+
+def normalizar_texto(texto: str) -> str:
+    """Normaliza el texto a embeber: NFC, sin espacios repetidos ni al borde de cada linea."""
+    texto = unicodedata.normalize("NFC", texto)
+    lineas = (re.sub(r"[ \t]+", " ", linea).strip() for linea in texto.strip().splitlines())
+    return "\n".join(lineas)
+
+def clave_embedding(modelo: str, texto_normalizado: str) -> str:
+    return hashlib.sha1(f"{modelo}\x00{texto_normalizado}".encode("utf-8")).hexdigest()
+
+
+class AlmacenDisco:
+    """Nivel en disco para un modelo: matriz float32 append-only + indice hash -> fila."""
+
+    def __init__(self, directorio, modelo: str):
+        directorio = Path(directorio)
+        directorio.mkdir(parents=True, exist_ok=True)
+        slug = re.sub(r"[^\w.-]", "_", modelo)
+        self.path_vectores = directorio / f"{slug}.f32"
+        self.path_claves = directorio / f"{slug}.keys"
+        self.dim = None
+        self._indice = {}
+        self._leido_claves = 0  # bytes del archivo de claves ya incorporados al indice
+        self._mmap = None
+        self._lock = threading.Lock()
+        self._recargar()
+
+    def _recargar(self):
+        """Incorpora las claves nuevas que hayan escrito este u otros procesos."""
+        try:
+            tamano = self.path_claves.stat().st_size
+        except FileNotFoundError:
+            return
+        if tamano == self._leido_claves:
+            return
+        with open(self.path_claves, "rb") as f:
+            f.seek(self._leido_claves)
+            datos = f.read()
+        # Solo se procesan lineas completas
+        completo = datos.rfind(b"\n") + 1
+        for linea in datos[:completo].decode("utf-8").splitlines():
+            partes = linea.split()
+            if len(partes) != 3:
+                continue
+            clave, fila, dim = partes[0], int(partes[1]), int(partes[2])
+            self._indice[clave] = fila
+            self.dim = dim
+        self._leido_claves += completo
+
+    def _fila(self, fila: int):
+        if self._mmap is None or fila >= self._mmap.shape[0]:
+            filas = self.path_vectores.stat().st_size // (4 * self.dim)
+            self._mmap = np.memmap(self.path_vectores, dtype=np.float32, mode="r", shape=(filas, self.dim))
+        return np.array(self._mmap[fila])
+
+    def get(self, clave: str):
+        with self._lock:
+            fila = self._indice.get(clave)
+            if fila is None:
+                self._recargar()
+                fila = self._indice.get(clave)
+            if fila is None:
+                return None
+            return self._fila(fila)
+
+    def put_lote(self, claves: list, vectores: np.ndarray):
+        vectores = np.ascontiguousarray(vectores, dtype=np.float32)
+        with self._lock, open(self.path_claves, "ab") as f_claves:
+            if fcntl:
+                fcntl.flock(f_claves, fcntl.LOCK_EX)
+            try:
+                self._recargar()
+                if self.dim is not None and vectores.shape[1] != self.dim:
+                    raise ValueError(f"Dimension {vectores.shape[1]} distinta a la del cache ({self.dim})")
+                self.dim = vectores.shape[1]
+                with open(self.path_vectores, "ab") as f_vec:
+                    fila_inicial = f_vec.tell() // (4 * self.dim)
+                    f_vec.write(vectores.tobytes())
+                lineas = "".join(f"{c} {fila_inicial + i} {self.dim}\n" for i, c in enumerate(claves))
+                f_claves.write(lineas.encode("utf-8"))
+                f_claves.flush()
+                self._recargar()
+            finally:
+                if fcntl:
+                    fcntl.flock(f_claves, fcntl.LOCK_UN)
+
+    def __len__(self):
+        return len(self._indice)
+
+
+class CacheEmbeddings:
+    """Cache de embeddings con nivel en memoria (LRU) y nivel en disco opcional.
+    Args:
+        max_memoria (int): cantidad maxima de vectores en memoria.
+        directorio (str|Path): carpeta del nivel en disco. None para usar solo memoria.
+    """
+
+    def __init__(self, max_memoria: int = 10000, directorio=None):
+        self.max_memoria = max_memoria
+        self.directorio = Path(directorio) if directorio else None
+        self._memoria = OrderedDict()
+        self._discos = {}
+        self._lock = threading.Lock()
+        self.hits_memoria = 0
+        self.hits_disco = 0
+        self.misses = 0
+
+    def _disco(self, modelo: str):
+        if self.directorio is None:
+            return None
+        with self._lock:  # aobtener lo llama desde threads
+            if modelo not in self._discos:
+                self._discos[modelo] = AlmacenDisco(self.directorio, modelo)
+            return self._discos[modelo]
+
+    def _a_memoria(self, clave: str, vector: np.ndarray):
+        with self._lock:
+            self._memoria[clave] = vector
+            self._memoria.move_to_end(clave)
+            while len(self._memoria) > self.max_memoria:
+                self._memoria.popitem(last=False)
+
+    def _buscar_memoria(self, textos: list, modelo: str):
+        """Devuelve (normalizados, claves, vectores) con None en los que no estan en memoria."""
+        normalizados = [normalizar_texto(t) for t in textos]
+        claves = [clave_embedding(modelo, t) for t in normalizados]
+        vectores = [None] * len(textos)
+        for i, clave in enumerate(claves):
+            with self._lock:
+                vector = self._memoria.get(clave)
+                if vector is not None:
+                    self._memoria.move_to_end(clave)
+            if vector is not None:
+                self.hits_memoria += 1
+            vectores[i] = vector
+        return normalizados, claves, vectores
+
+    def _buscar_disco(self, modelo: str, claves: list, vectores: list):
+        """Completa en `vectores` los que estan en el nivel en disco."""
+        disco = self._disco(modelo)
+        if disco is None:
+            return
+        for i, clave in enumerate(claves):
+            if vectores[i] is None:
+                vectores[i] = disco.get(clave)
+                if vectores[i] is not None:
+                    self.hits_disco += 1
+                    self._a_memoria(clave, vectores[i])
+
+    def _buscar(self, textos: list, modelo: str):
+        """Devuelve (normalizados, claves, vectores) con None en los que no estan en ningun nivel."""
+        normalizados, claves, vectores = self._buscar_memoria(textos, modelo)
+        self._buscar_disco(modelo, claves, vectores)
+        return normalizados, claves, vectores
+
+    def _completar(self, modelo, normalizados, claves, vectores, nuevos):
+        """Guarda los embeddings recien calculados y completa la lista de resultados."""
+        faltantes = [i for i, v in enumerate(vectores) if v is None]
+        # Textos repetidos dentro del mismo lote se calculan una sola vez
+        unicos = list(dict.fromkeys(claves[i] for i in faltantes))
+        por_clave = {c: np.asarray(v, dtype=np.float32) for c, v in zip(unicos, nuevos)}
+        disco = self._disco(modelo)
+        if disco is not None and por_clave:
+            disco.put_lote(list(por_clave), np.stack(list(por_clave.values())))
+        for clave, vector in por_clave.items():
+            self._a_memoria(clave, vector)
+        for i in faltantes:
+            vectores[i] = por_clave[claves[i]]
+        return vectores
+
+    def _pendientes(self, normalizados, claves, vectores):
+        vistos = {}
+        for i, v in enumerate(vectores):
+            if v is None and claves[i] not in vistos:
+                vistos[claves[i]] = normalizados[i]
+        return list(vistos.values())
+
+    def obtener(self, textos: list, modelo: str, embed_lote) -> list:
+        """Devuelve los embeddings de `textos`. Los que faltan se calculan en un solo llamado a
+        embed_lote(lista_de_textos) -> lista_de_vectores."""
+        normalizados, claves, vectores = self._buscar(textos, modelo)
+        pendientes = self._pendientes(normalizados, claves, vectores)
+        if not pendientes:
+            return vectores
+        self.misses += len(pendientes)
+        return self._completar(modelo, normalizados, claves, vectores, embed_lote(pendientes))
+
+    async def aobtener(self, textos: list, modelo: str, aembed_lote) -> list:
+        """Version async de obtener. El nivel en memoria se consulta en el event loop; el de disco (stat y
+        lectura del indice en un miss, flock al escribir) corre en un thread, asi un lock tomado por un
+        script de ingesta no frena a los demas requests."""
+        normalizados, claves, vectores = self._buscar_memoria(textos, modelo)
+        en_disco = self.directorio is not None
+        if en_disco and any(v is None for v in vectores):
+            await asyncio.to_thread(self._buscar_disco, modelo, claves, vectores)
+        pendientes = self._pendientes(normalizados, claves, vectores)
+        if not pendientes:
+            return vectores
+        self.misses += len(pendientes)
+        nuevos = await aembed_lote(pendientes)
+        if en_disco:
+            return await asyncio.to_thread(self._completar, modelo, normalizados, claves, vectores, nuevos)
+        return self._completar(modelo, normalizados, claves, vectores, nuevos)
+
+    def stats(self) -> dict:
+        return {
+            "memoria": len(self._memoria),
+            "disco": {modelo: len(d) for modelo, d in self._discos.items()},
+            "hits_memoria": self.hits_memoria,
+            "hits_disco": self.hits_disco,
+            "misses": self.misses
+        }
+
+
+def desde_entorno() -> CacheEmbeddings:
+    """Cache configurado por variables de entorno. EMBEDDING_CACHE_DIR vacio deshabilita el nivel en disco."""
+    directorio = os.getenv("EMBEDDING_CACHE_DIR", str(DEFAULT_DIR))
+    return CacheEmbeddings(
+        max_memoria=int(os.getenv("EMBEDDING_CACHE_MAX_MEMORY", "10000")),
+        directorio=directorio or None
+    )
@@ -1,17 +1,23 @@
 from langgraph.graph import StateGraph, START, END
 from langgraph.graph.message import add_messages
 from typing import TypedDict, Annotated
-import random
-from langchain_openai import ChatOpenAI, OpenAIEmbeddings
-from langchain_core.messages import HumanMessage
+import functools
+import time
+import asyncio
+from langchain_core.messages import HumanMessage, SystemMessage
+from langchain_core.runnables import RunnableLambda
 import json
 import dotenv
 import os
 import re
 import numpy as np
-import openai
-from pinecone import Pinecone
-from helper_temporal import parse_periodo, get_empresa_periodo, aplicar_regla_temporal
+from helper_temporal import obtener_indice_temporal
+from clients import get_chat_model, get_index, get_index_async, embed_query, aembed_query
+from corpus_personalidad import obtener_corpus_personalidad
+from indice_estilo import obtener_indice_estilo, embed_consulta
+from perfil_ocean import obtener_tabla_ocean, DEFAULT_OCEAN
+from presupuesto_prompt import SISTEMA, empaquetar, contar_tokens, tokens_sistema
+from detector_local import normalize_skills, detectar_local, UMBRAL_CONFIANZA
 dotenv.load_dotenv()
 
 
@@ -20,102 +26,10 @@ dotenv.load_dotenv()
 En este file se define el grafo del chatbot y toda su ejecucion
 Se separa del main para que sea mas facil de entender y modificar.
 """
-def normalize_skills(skills: list) -> list:
-    """ Esta funcion tiene como intencion normalizar los skills para que la prueba sea mas efectiva.
-    Esto es importante porque posteriormenten, en el detector node se extrae sobre que skill se pregunta.
-    Como los skills no cambian con el tiempo (a lo sumo se agregan) no es un hardcode inadecuado para un primer PoC """
-
-
-    if not skills:
-        return []
-    
-    # Mapeo de variaciones a términos estándar
-    skill_mapping = {
-        # AI variations
-        "inteligencia artificial": "ai",
-        "ia": "ai", 
-        "ai": "ai",
-        "desarrollo de ia": "ai",
-        "desarrollo de ai": "ai",
-        "desarrollo ia": "ai",
-        "desarrollo ai": "ai",
-        
-        # Machine Learning variations
-        "machine learning": "machine learning",
-        "ml": "machine learning",
-        "aprendizaje automatico": "machine learning",
-        "aprendizaje automático": "machine learning",
-        
-        # Data Science variations
-        "data science": "data science",
-        "ciencia de datos": "data science",
-        "datascience": "data science",
-        
-        # Programming variations
-        "programacion": "python",  # default to python if no specific language
-        "programación": "python",
-        "coding": "python",
-        "desarrollo": "python",
-        
-        # Web development
-        "desarrollo web": "backend",
-        "web development": "backend",
-        "frontend": "backend",  # assuming backend for now
-        
-        # Other common variations
-        "ci/cd": "ci/cd",
-        "cicd": "ci/cd",
-        "continuous integration": "ci/cd",
-        "github": "github actions",
-        "aws lambda": "lambda",
-        "lambda functions": "lambda",
-        "apis": "apis",
-        "api": "apis",
-        "rest api": "apis",
-        "graphql": "apis",
-        
-        # Personal skills variations
-        "cocinar": "cocina",
-        "cooking": "cocina",
-        "music": "musica",
-        "sports": "deportes",
-        "languages": "idiomas",
-        "photography": "fotografia",
-        "travel": "viajes",
-        "reading": "lectura",
-        "writing": "escritura",
-        "meditation": "meditacion",
-        "cycling": "ciclismo",
-        "soccer": "futbol",
-        "football": "futbol",
-        "guitar": "guitarra",
-        "spanish": "espanol",
-        "english": "ingles",
-        "portuguese": "portugues",
-        "video editing": "edicion de video",
-        "blog": "blogging",
-        "podcast": "podcasting"
-    }
-    
-    normalized = []
-    for skill in skills:
-        skill_lower = skill.lower().strip()
-        # Buscar en el mapeo
-        if skill_lower in skill_mapping:
-            normalized.append(skill_mapping[skill_lower])
-        else:
-            # Si no está en el mapeo, mantener el original
-            normalized.append(skill_lower)
-    
-    # Remover duplicados manteniendo el orden
-    seen = set()
-    unique_normalized = []
-    for skill in normalized:
-        if skill not in seen:
-            seen.add(skill)
-            unique_normalized.append(skill)
-    
-    return unique_normalized
+def merge_timings(actual: dict, nuevo: dict) -> dict:
+    """Reducer de los tiempos (y de los errores) por nodo. Cada nodo escribe solo su propia clave, asi que
+    el merge de las ramas paralelas es determinista sin importar el orden en que terminen."""
+    return {**(actual or {}), **(nuevo or {})}
 
 # Define the state with messages
 class State(TypedDict):
@@ -124,14 +38,42 @@ class State(TypedDict):
     temporal: str
     factual: str
     personality: str
+    personality_ocean: dict
+    personality_example: str
     response: str
-
-def detector_node(state: State) -> dict:
-    """Detecta si la pregunta del input es de tipo factual, o sobre un evento temporal, y extrae skills mencionados."""
-    
-    
-
-    prompt = f""" Identifica si el prompt introducido responde a un evento temporal, factual, o combinado.
+    factual_items: list
+    temporal_items: list
+    prompt_tokens: dict
+    timings: Annotated[dict, merge_timings]
+    # Nodo -> error de una recuperacion que fallo: la respuesta salio sin ese contexto y no se cachea
+    errores: Annotated[dict, merge_timings]
+
+
+def medir_tiempo(nodo, nombre: str = None):
+    """Envuelve un nodo (sync o async) y agrega su duracion (ms) en el campo timings del estado.
+    Sirve para ver el desglose por nodo y cuanto se gana corriendo la recuperacion en paralelo."""
+    nombre = nombre or nodo.__name__
+
+    if asyncio.iscoroutinefunction(nodo):
+        @functools.wraps(nodo)
+        async def awrapper(state: State) -> dict:
+            inicio = time.perf_counter()
+            salida = dict(await nodo(state) or {})
+            salida["timings"] = {nombre: round((time.perf_counter() - inicio) * 1000, 2)}
+            return salida
+        return awrapper
+
+    @functools.wraps(nodo)
+    def wrapper(state: State) -> dict:
+        inicio = time.perf_counter()
+        salida = dict(nodo(state) or {})
+        salida["timings"] = {nombre: round((time.perf_counter() - inicio) * 1000, 2)}
+        return salida
+    return wrapper
+
+def prompt_detector(consulta: str) -> str:
+    """Arma el prompt del detector. Se comparte entre la version sync y async del nodo."""
+    return f""" Identifica si el prompt introducido responde a un evento temporal, factual, o combinado.
     temporal es una pregunta del
     Identifica el topico segun: ("trabajo", "amistad", "familia", "salud", "emociones", "ocio", "estudios", "dinero", "viajes", "tecnología", "deportes", "comida", "política", "entretenimiento", "amor") y la emocion segun ("joy", "anger", "sadness", "surprise", "others")
     
@@ -155,7 +97,7 @@ def detector_node(state: State) -> dict:
     - Si se menciona un año específico (ej: "en 2020", "durante 2019"), el conector temporal debe ser "durante" o "en".
     - Si se menciona "doctorado", "maestría" o "universidad", la empresa debe ser "Universidad de Buenos Aires".
     
-    Input del usuario: {state["messages"][-1].content}.
+    Input del usuario: {consulta}.
     Responde con un json que tenga la forma:
     {{
         "tipo": "temporal" | "factual" | "combinado",
@@ -167,15 +109,14 @@ def detector_node(state: State) -> dict:
         "conector_temporal": "conector" | null
     }}
     """
-    # Instanciamos el modelo y hacemos la llamada.
-    model = ChatOpenAI(model="gpt-4o-mini", temperature=0.05)
-    response = model.invoke([HumanMessage(content=prompt)])
-    
+
+def parsear_detector(content: str) -> dict:
+    """Parsea la respuesta del detector y normaliza los skills. Devuelve el update del estado."""
     # Parse el json de la respuesta, ya que si bien se pide un json, el formato no siempre es correcto.
     try:
 
         # Remuevo los markers de codigo si los hay.
-        content = response.content.strip()
+        content = content.strip()
         if content.startswith('```'):
             # Remuevo los markers de codigo.
             content = content.strip('`')
@@ -214,6 +155,40 @@ def detector_node(state: State) -> dict:
         }
     }
 
+def detector_por_reglas(consulta: str):
+    """Intenta resolver el detector con reglas locales. Devuelve None si la confianza no alcanza."""
+    local = detectar_local(consulta)
+    if local["confianza"] < UMBRAL_CONFIANZA:
+        return None
+    print(f"[DETECTOR] Local (confianza {local['confianza']}): {local['detector']}")
+    return {"detector": local["detector"]}
+
+def detector_node(state: State) -> dict:
+    """Detecta si la pregunta del input es de tipo factual, o sobre un evento temporal, y extrae skills mencionados."""
+    consulta = state["messages"][-1].content
+
+    # Primero las reglas locales: si alcanzan, nos ahorramos la llamada a la LLM.
+    local = detector_por_reglas(consulta)
+    if local is not None:
+        return local
+    prompt = prompt_detector(consulta)
+
+    # Tomamos el modelo compartido del proceso y hacemos la llamada.
+    model = get_chat_model()
+    response = model.invoke([HumanMessage(content=prompt)])
+    return parsear_detector(response.content)
+
+async def adetector_node(state: State) -> dict:
+    """Version async del detector: la llamada a la LLM no bloquea el event loop."""
+    consulta = state["messages"][-1].content
+    local = detector_por_reglas(consulta)
+    if local is not None:
+        return local
+    prompt = prompt_detector(consulta)
+    model = get_chat_model()
+    response = await model.ainvoke([HumanMessage(content=prompt)])
+    return parsear_detector(response.content)
+
 def temporal_node(state: State) -> dict:
     """Extrae información temporal del JSON y determina qué experiencias son relevantes."""
 
@@ -223,18 +198,15 @@ def temporal_node(state: State) -> dict:
     
     # Si no es temporal, retornar vacío.
     if tipo_consulta != "temporal":
-        return {"temporal_info": "", "temporal_filters": {}}
+        return {"temporal": "", "temporal_items": []}
     
 
-    # Cargar experiencias temporales. En este caso cargo todo porque el json es pequeño.
-    try:
-        temporal_path = "/Users/laviejave/Dropbox/Santex/repo_entrega/data_ing/Factica/temporal_experience.json"
-        with open(temporal_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-            experiencias_temporales = data.get("experiencia_laboral", [])
-    except FileNotFoundError:
+    # Linea de tiempo precompilada. Se carga una vez y se recarga sola si cambia el archivo.
+    indice_temporal = obtener_indice_temporal()
+    if indice_temporal is None:
         print("[TEMPORAL] No se encontró el archivo temporal_experience.json")
-        return {"temporal_info": "", "temporal_filters": {}}
+        return {"temporal": "", "temporal_items": []}
+    experiencias_temporales = indice_temporal.experiencias
     
     # Extraer filtros del detector
     skills = detector.get("skills", [])
@@ -245,12 +217,7 @@ def temporal_node(state: State) -> dict:
     
     # Aplicar reglas temporales si hay conector. Ver el helper_temporal.py para mas detalles.
     if conector_temporal:
-        experiencias_temporales = aplicar_regla_temporal(
-            experiencias_temporales, 
-            conector_temporal, 
-            rango_temporal, 
-            empresa
-        )
+        experiencias_temporales = indice_temporal.filtrar(conector_temporal, rango_temporal, empresa)
     
     # Usar directamente las experiencias filtradas por reglas temporales
     experiencias_filtradas = experiencias_temporales
@@ -272,101 +239,157 @@ def temporal_node(state: State) -> dict:
 
     
     return {
-        "temporal": temporal_info
+        "temporal": temporal_info,
+        "temporal_items": experiencias_filtradas
         }
     
 
+def filtros_factual(detector: dict) -> dict:
+    """Construye el filtro de metadata para Pinecone a partir de lo que extrajo el detector."""
+    skills = detector.get("skills", [])
+    empresa = detector.get("empresa", None)
+    filter_dict = {}
+    if empresa:
+        filter_dict["empresa"] = {"$eq": empresa}
+    if skills:
+        # Si hay skills específicos, filtrar por ellos
+        filter_dict["skill"] = {"$in": skills}
+    return filter_dict if filter_dict else None
+
+def formatear_factual(results) -> dict:
+    """Arma el texto factual para el response_node a partir de los matches de Pinecone."""
+    if results.matches:
+        factual_info = "Experiencias laborales relevantes:\n"
+        for match in results.matches:
+            metadata = match.metadata
+            empresa = metadata.get("empresa", "")
+            rol = metadata.get("rol", "")
+            periodo = metadata.get("periodo", "")
+            skill = metadata.get("skill", "")
+            score = match.score
+            
+            factual_info += f"- {empresa} ({rol}, {periodo}): {skill} (relevancia: {score:.2f})\n"
+        print(f"[FACTUAL] Información encontrada en Pinecone:\n{factual_info}")
+        # Los matches estructurados los usa el empaquetado del prompt (presupuesto_prompt)
+        items = [{**{k: m.metadata.get(k, "") for k in ("empresa", "rol", "periodo", "skill")}, "score": m.score}
+                 for m in results.matches]
+        return {"factual": factual_info, "factual_items": items}
+    else:
+        print("[FACTUAL] No se encontraron resultados en Pinecone")
+        return {"factual": "No se encontraron experiencias laborales relevantes para tu consulta.", "factual_items": []}
+
+async def atemporal_node(state: State) -> dict:
+    """Version async del temporal_node. Solo hace I/O de archivos, asi que corre en un thread."""
+    return await asyncio.to_thread(temporal_node, state)
+
 def factual_node(state: State) -> dict:
     """Extrae información factual usando Pinecone. Filtra por skills y empresa para no pasar toda la DB"""
     query = state["messages"][-1].content
     detector = state.get("detector", {})
-    skills = detector.get("skills", [])
-    empresa = detector.get("empresa", None)
     
     try:
-        pc = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
-        index = pc.Index("Nombre_de_la_DB")
-        
-        # Crear embedding de la pregunta
-        embedding = openai.embeddings.create(
-            input=query,
-            model="text-embedding-3-small"
-        ).data[0].embedding
+        index = get_index()
         
-        # Construir filtros para Pinecone
-        filter_dict = {}
-        if empresa:
-            filter_dict["empresa"] = {"$eq": empresa}
-        if skills:
-            # Si hay skills específicos, filtrar por ellos
-            filter_dict["skill"] = {"$in": skills}
+        # Crear embedding de la pregunta (cacheado por contenido)
+        embedding = embed_query(query)
         
         # Buscar en Pinecone con filtros
         results = index.query(
             vector=embedding,
             top_k=10,
             include_metadata=True,
-            filter=filter_dict if filter_dict else None
+            filter=filtros_factual(detector)
         )
-        
-        if results.matches:
-            factual_info = "Experiencias laborales relevantes:\n"
-            for match in results.matches:
-                metadata = match.metadata
-                empresa = metadata.get("empresa", "")
-                rol = metadata.get("rol", "")
-                periodo = metadata.get("periodo", "")
-                skill = metadata.get("skill", "")
-                score = match.score
-                
-                factual_info += f"- {empresa} ({rol}, {periodo}): {skill} (relevancia: {score:.2f})\n"
-            print(f"[FACTUAL] Información encontrada en Pinecone:\n{factual_info}")
-            return {"factual": factual_info}
-        else:
-            print("[FACTUAL] No se encontraron resultados en Pinecone")
-            return {"factual": "No se encontraron experiencias laborales relevantes para tu consulta."}
+        return formatear_factual(results)
             
     except Exception as e:
         print(f"[FACTUAL] Error con Pinecone: {e}")
-        return {"factual": "No se pudo recuperar información factual en este momento."}
+        return {"factual": "No se pudo recuperar información factual en este momento.",
+                "errores": {"factual_node": str(e)}}
+
+async def afactual_node(state: State) -> dict:
+    """Version async del factual_node. El embedding usa el cliente async de OpenAI (via el cache de
+    embeddings) y la query a Pinecone usa el handle async del registro de clientes."""
+    query = state["messages"][-1].content
+    detector = state.get("detector", {})
+
+    try:
+        index = get_index_async()
+
+        embedding = await aembed_query(query)
+
+        results = await index.query(
+            vector=embedding,
+            top_k=10,
+            include_metadata=True,
+            filter=filtros_factual(detector)
+        )
+        return formatear_factual(results)
+
+    except Exception as e:
+        print(f"[FACTUAL] Error con Pinecone: {e}")
+        return {"factual": "No se pudo recuperar información factual en este momento.",
+                "errores": {"factual_node": str(e)}}
+
 
 
+# Registro en el que habla Nico en el chat (formal/informal). Filtra los ejemplos y elige el perfil OCEAN.
+FORMALIDAD = os.getenv("STYLE_FORMALIDAD") or None
+
+def ejemplos_estilo(consulta: str, detector: dict, k: int = 3) -> list:
+    """k ejemplos de estilo para la consulta. Con el indice de estilo (indice_estilo) se filtran por el topic y
+    la emotion del detector y se ordenan por similitud; si no hay indice, salen al azar del corpus de
+    faiss_metadata.json, cargado una vez por proceso (corpus_personalidad)."""
+    indice = obtener_indice_estilo()
+    if indice is None:
+        corpus = obtener_corpus_personalidad()
+        return corpus.muestrear(k) if corpus is not None else []
+    vector = embed_consulta(consulta)
+    if vector is not None and len(vector) != indice.dimension:
+        print(f"[PERSONALITY] El modelo de consulta da {len(vector)} dimensiones y el indice {indice.dimension}")
+        vector = None
+    return indice.buscar(vector, k=k, tema=detector.get("topic"), emocion=detector.get("emotion"),
+                         formalidad=FORMALIDAD)
 
 def personality_node(state: State) -> dict:
-    """Devuelve OCEAN promedio y ejemplos de tono aleatorios.
-    En esta versiond el PoC se pasan ejemplos random hasta tener la Db en pinecone"""
+    """Devuelve el perfil OCEAN y ejemplos de tono para el contexto del detector.
+    El perfil sale de la tabla precompilada de perfil_ocean (tema/emocion/formalidad con fallback a grupos
+    mas gruesos) y los ejemplos del indice de estilo (ver ejemplos_estilo)."""
     user_question = state["messages"][-1].content
  
 
-    ocean_promedio = {
-        "openness": 0.566,
-        "conscientiousness": 0.505,
-        "extraversion": 0.494,
-        "agreeableness": 0.366,
-        "neuroticism": 0.598
-    }
+    detector = state.get("detector") or {}
+    try:
+        ocean, agrupacion = obtener_tabla_ocean().perfil(detector.get("topic"), detector.get("emotion"), FORMALIDAD)
+    except Exception as e:
+        print(f"[PERSONALITY] Error obteniendo el perfil OCEAN: {e}")
+        ocean, agrupacion = dict(DEFAULT_OCEAN), "default"
 
     try:
-        with open("data_ing/Factica/db_personality/faiss_metadata.json", "r", encoding="utf-8") as f:
-            metadata = json.load(f)
-        textos = [m.get("texto", "") for m in metadata if m.get("texto")]
-        ejemplos = random.sample(textos, min(3, len(textos))) if textos else []
-        personality_example = "\n---\n".join(ejemplos) if ejemplos else "¡Hola! Si necesitas ayuda, decímelo directo. Me gusta ser claro y concreto, pero siempre con buena onda."
+        ejemplos = ejemplos_estilo(user_question, detector)
     except Exception as e:
         print(f"[PERSONALITY] Error cargando ejemplos: {e}")
-        personality_example = "¡Hola! Si necesitas ayuda, decímelo directo. Me gusta ser claro y concreto, pero siempre con buena onda."
+        ejemplos = []
+    personality_example = "\n---\n".join(ejemplos) if ejemplos else "¡Hola! Si necesitas ayuda, decímelo directo. Me gusta ser claro y concreto, pero siempre con buena onda."
 
-    personalidad = "Nico, tono promedio"
+    personalidad = "Nico, tono promedio" if agrupacion in ("global", "default") else f"Nico, tono segun {agrupacion}"
     response = f"(Tono: {personalidad})\nEjemplos de estilo:\n{personality_example}"
 
     return {
         "personality": personalidad,
         "personality_response": response,
-        "personality_ocean": ocean_promedio,
+        "personality_ocean": ocean,
         "personality_example": personality_example
     }
 
-def response_node(state: State) -> dict:
+async def apersonality_node(state: State) -> dict:
+    """Version async del personality_node. Corre en un thread: el embedding de la consulta y la (re)carga del
+    indice de estilo son CPU."""
+    return await asyncio.to_thread(personality_node, state)
+
+def prompt_respuesta(state: State) -> str:
+    """Prompt completo de Nico, con todo el contexto recuperado en un solo mensaje. Con PROMPT_PACKING=0 es el
+    que se manda; si no, sirve de referencia para contar los tokens que ahorra el empaquetado."""
 
     #Recopilo toda la info que tengo para el prompt.
     factual_info = state.get("factual", "")
@@ -414,31 +437,131 @@ Reglas:
 - No contestes en neutral. Contesta como argentino, pero sin lunfardo
 
 Respuesta:"""
+    return prompt
+
+# Empaquetado del contexto con presupuesto de tokens (PROMPT_PACKING=0 vuelve al prompt completo)
+PROMPT_PACKING = os.getenv("PROMPT_PACKING", "1") != "0"
+
+def mensajes_respuesta(state: State) -> tuple:
+    """Mensajes del response_node y conteo de tokens del prompt.
+    Con PROMPT_PACKING (por defecto) va el mensaje de sistema estatico y el contexto empaquetado con presupuesto
+    de tokens (ver presupuesto_prompt); sin el, el prompt completo de prompt_respuesta. En los dos casos se
+    reporta cuantos tokens tendria el prompt completo ("antes") y cuantos se mandan ("despues").
+    Los mensajes previos a la pregunta (historial de la sesion: resumen y ultimos turnos, ya acotados por sesiones.py)
+    van entre el mensaje de sistema y el mensaje con el contexto, asi el prefijo estatico no cambia."""
+    historial = state["messages"][:-1]
+    tokens_historial = sum(contar_tokens(m.content) for m in historial)
+    completo = prompt_respuesta(state)
+    antes = contar_tokens(completo) + tokens_historial
+    if not PROMPT_PACKING:
+        return [*historial, HumanMessage(content=completo)], {"antes": antes, "despues": antes,
+                                                              "historial": tokens_historial}
+
+    detector = state.get("detector") or {}
+    ejemplos = (state.get("personality_example") or "").split("\n---\n")
+    mensaje, stats = empaquetar(
+        state["messages"][-1].content if state["messages"] else "",
+        factual=state.get("factual_items"), temporal=state.get("temporal_items"),
+        factual_texto=state.get("factual", ""), temporal_texto=state.get("temporal", ""),
+        ejemplos=ejemplos, personalidad=state.get("personality", ""), ocean=state.get("personality_ocean"),
+        tipo=detector.get("tipo", "")
+    )
+    sistema = tokens_sistema()
+    stats = {"antes": antes, "despues": sistema + tokens_historial + stats["mensaje"], "sistema": sistema,
+             "historial": tokens_historial, **stats}
+    print(f"[PROMPT] tokens: {stats['antes']} -> {stats['despues']} (sistema {sistema}, historial {tokens_historial}, "
+          f"{stats['descartados']} fragmentos fuera del presupuesto)")
+    return [SystemMessage(content=SISTEMA), *historial, HumanMessage(content=mensaje)], stats
+
+def response_node(state: State) -> dict:
+    mensajes, prompt_tokens = mensajes_respuesta(state)
+
+    model = get_chat_model()
+    response = model.invoke(mensajes).content.strip()
 
-    model = ChatOpenAI(model="gpt-4o-mini", temperature=0.05)
-    response = model.invoke([HumanMessage(content=prompt)]).content.strip()
+    print(f"🤖 {response}")
+    return {
+        "response": response,
+        "prompt_tokens": prompt_tokens
+    }
+
+async def aresponse_node(state: State) -> dict:
+    """Version async del response_node."""
+    mensajes, prompt_tokens = mensajes_respuesta(state)
+
+    model = get_chat_model()
+    response = (await model.ainvoke(mensajes)).content.strip()
 
     print(f"🤖 {response}")
     return {
-        "response": response
+        "response": response,
+        "prompt_tokens": prompt_tokens
     }
 
 
 
-# Constuimos los nodos y edges.
-builder = StateGraph(State)
-builder.add_node("detector_node", detector_node)
-builder.add_node("temporal_node", temporal_node)
-builder.add_node("factual_node", factual_node)
-builder.add_node("personality_node", personality_node)
-builder.add_node("response_node", response_node)
+# Nodos del grafo. El orden no importa para la topologia paralela.
+NODOS = {
+    "detector_node": detector_node,
+    "temporal_node": temporal_node,
+    "factual_node": factual_node,
+    "personality_node": personality_node,
+    "response_node": response_node,
+}
+
+# Variantes async de cada nodo. graph.ainvoke usa estas, graph.invoke las sync.
+NODOS_ASYNC = {
+    "detector_node": adetector_node,
+    "temporal_node": atemporal_node,
+    "factual_node": afactual_node,
+    "personality_node": apersonality_node,
+    "response_node": aresponse_node,
+}
+
+def construir_grafo(paralelo: bool = True, nodos: dict = None, nodos_async: dict = None):
+    """Construye y compila el grafo.
+    Con paralelo=True la recuperacion se hace en fan-out/fan-in: temporal, factual y personality
+    arrancan juntos cuando termina el detector (personality usa su topic/emotion para elegir los
+    ejemplos de estilo), y response espera a las tres ramas. Cada rama escribe claves distintas del estado, asi que el
+    merge es determinista. Con paralelo=False se arma la cadena secuencial original (util para comparar).
+    Args:
+        paralelo (bool): topologia fan-out/fan-in o cadena secuencial.
+        nodos (dict): nombre -> funcion, para reemplazar nodos (ej: stubs en benchmarks).
+        nodos_async (dict): idem para las variantes async. Si se reemplaza un nodo sync y no su
+            variante async, ainvoke corre el nodo sync en un thread.
+    """
+    nodos_async = {
+        **{nombre: nodo for nombre, nodo in NODOS_ASYNC.items() if not (nodos and nombre in nodos)},
+        **(nodos_async or {})
+    }
+    nodos = {**NODOS, **(nodos or {})}
+
+    # Constuimos los nodos y edges. Cada nodo tiene su variante sync (invoke) y async (ainvoke).
+    builder = StateGraph(State)
+    for nombre, nodo in nodos.items():
+        anodo = nodos_async.get(nombre)
+        builder.add_node(nombre, RunnableLambda(
+            medir_tiempo(nodo, nombre),
+            afunc=medir_tiempo(anodo, nombre) if anodo else None,
+            name=nombre
+        ))
+
+    # edges
+    if paralelo:
+        builder.add_edge(START, "detector_node")
+        builder.add_edge("detector_node", "temporal_node")
+        builder.add_edge("detector_node", "factual_node")
+        builder.add_edge("detector_node", "personality_node")
+        builder.add_edge(["temporal_node", "factual_node", "personality_node"], "response_node")
+    else:
+        builder.add_edge(START, "detector_node")
+        builder.add_edge("detector_node", "temporal_node")
+        builder.add_edge("temporal_node", "factual_node")
+        builder.add_edge("factual_node", "personality_node")
+        builder.add_edge("personality_node", "response_node")
+    builder.add_edge("response_node", END)
+
+    return builder.compile()
 
-# edges
-builder.add_edge(START, "detector_node")
-builder.add_edge("detector_node", "temporal_node")
-builder.add_edge("temporal_node", "factual_node")
-builder.add_edge("factual_node", "personality_node")
-builder.add_edge("personality_node", "response_node")
-builder.add_edge("response_node", END)
 
-graph = builder.compile()
\ No newline at end of file
+graph = construir_grafo()
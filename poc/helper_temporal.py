@@ -1,44 +1,257 @@
+import bisect
+import json
+import os
 import re
+import threading
+import time
+import unicodedata
+from datetime import date
+from pathlib import Path
+
+"""
+Reglas temporales sobre la linea de tiempo laboral (temporal_experience.json).
+La linea de tiempo se parsea una sola vez a intervalos (inicio, fin) con resolucion de mes, incluyendo
+"Presente", y se indexa ordenada por inicio y por fin: antes/después/desde/hasta/durante se resuelven
+con busqueda binaria. El archivo se recarga solo cuando cambia en disco (ver obtener_indice_temporal).
+
+Cambios de reglas respecto de la version anterior (que trabajaba con un solo año de referencia), a proposito:
+- Los periodos se parsean con mes: "Abril 2023 – Mayo 2024" antes quedaba como (2023, 2023) y "2018 – Presente"
+  como (2018, 2018); ahora son abril 2023 a mayo 2024 y un intervalo abierto desde enero 2018.
+- Con una empresa, la referencia es su periodo entero y no solo su año de fin:
+    antes   -> empiezan antes de que empiece la empresa (antes: antes de su año de fin, incluia a la misma empresa)
+    desde   -> empiezan cuando empieza la empresa o despues (antes: desde su año de fin)
+    durante -> se superponen con el periodo de la empresa (antes: incluian su año de fin)
+    después -> empiezan despues de que termina (o de que empezo, si sigue vigente); hasta -> terminan cuando
+               termina o antes. Estas dos dan lo mismo que antes salvo por la resolucion de mes.
+- La empresa se busca sin tildes y por palabra completa si no hay nombre exacto ("Meton" encuentra "Meton AI");
+  antes solo matcheaba el nombre exacto sin mayusculas.
+- Si la empresa no esta en la linea de tiempo se usa el año o rango de la consulta; antes no se filtraba nada.
+- Un rango "2017-2019" es la referencia entera (antes solo contaba 2017).
+Con periodos "AAAA – AAAA" y un año como referencia los resultados son los mismos que antes (bench_temporal.py).
+"""
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+TEMPORAL_PATH = Path(os.getenv("TEMPORAL_JSON_PATH", BASE_DIR / "data_ing" / "Factica" / "temporal_experience.json"))
+
+MESES = {
+    "enero": 1, "febrero": 2, "marzo": 3, "abril": 4, "mayo": 5, "junio": 6, "julio": 7, "agosto": 8,
+    "septiembre": 9, "setiembre": 9, "octubre": 10, "noviembre": 11, "diciembre": 12,
+    "ene": 1, "feb": 2, "mar": 3, "abr": 4, "may": 5, "jun": 6, "jul": 7, "ago": 8,
+    "sep": 9, "set": 9, "oct": 10, "nov": 11, "dic": 12,
+}
+# "Abril 2023", "abr. 2023", "04/2023" o "2023"
+PATRON_FECHA = re.compile(r"(?:(?P<mes>[a-z]+)\.?\s+(?:de\s+)?|(?P<mes_num>\d{1,2})/)?(?P<año>\d{4})")
+PATRON_PRESENTE = re.compile(r"\b(?:presente|actualidad|hoy|actual)\b")
+PATRON_AÑO = re.compile(r"(\d{4})")
+
+# Fin de los intervalos abiertos ("Presente"). Mayor que cualquier mes real.
+PRESENTE = 10 ** 9
+
+# Conectores que piden experiencias que se superponen con la referencia
+CONECTORES_DURANTE = ("durante", "en", "durante el")
+
+
+def _sin_tildes(texto: str) -> str:
+    texto = unicodedata.normalize("NFKD", texto.lower())
+    return "".join(c for c in texto if not unicodedata.combining(c))
+
+def _mes(año: int, mes: int) -> int:
+    """Mes absoluto (año * 12 + mes - 1): ordena y compara fechas como enteros."""
+    return año * 12 + mes - 1
+
+def parse_intervalo(periodo_str: str) -> tuple:
+    """
+    Parsea un string de período y devuelve (mes_inicio, mes_fin) como meses absolutos.
+    Un año sin mes abarca de enero a diciembre. "Presente" devuelve PRESENTE como fin.
+    Devuelve (None, None) si no hay ninguna fecha.
+    """
+    texto = _sin_tildes(periodo_str or "")
+    fechas = []
+    for match in PATRON_FECHA.finditer(texto):
+        año = int(match.group("año"))
+        mes = MESES.get(match.group("mes") or "") or (int(match.group("mes_num")) if match.group("mes_num") else None)
+        fechas.append((año, mes))
+    if not fechas:
+        return (None, None)
+    año_ini, mes_ini = fechas[0]
+    inicio = _mes(año_ini, mes_ini or 1)
+    if PATRON_PRESENTE.search(texto):
+        return (inicio, PRESENTE)
+    año_fin, mes_fin = fechas[-1]
+    return (inicio, _mes(año_fin, mes_fin or 12))
 
 def parse_periodo(periodo_str: str) -> tuple:
     """
-    Parsea un string de período y devuelve (año_inicio, año_fin)
-    Este parsing se debe eliminar si el json de experiencias laborales se arma de forma homogenea
+    Parsea un string de período y devuelve (año_inicio, año_fin).
+    "Presente" se toma como el año actual (antes "2018 – Presente" devolvia (2018, 2018)), y los periodos con
+    nombre de mes devuelven los dos extremos (antes solo el primer año).
     """
-    # Patrones comunes de fechas.
-    patterns = [
-        r'(\d{4})\s*–\s*(\d{4})',  # Fecha1 – Fecha2
-        r'(\d{4})\s*-\s*(\d{4})',  # Fecha1-Fecha2
-        r'(\d{4})\s*–\s*Presente',  # Fecha1 – Presente
-        r'(\d{4})\s*-\s*Presente',  # Fecha1-Presente
-        r'(\d{4})',  # Solo año
-    ]
-    for pattern in patterns:
-        match = re.search(pattern, periodo_str)
-        if match:
-            if len(match.groups()) == 2:
-                return (int(match.group(1)), int(match.group(2)))
-            else:
-                return (int(match.group(1)), int(match.group(1)))
-    return (None, None)
+    inicio, fin = parse_intervalo(periodo_str)
+    if inicio is None:
+        return (None, None)
+    return (inicio // 12, date.today().year if fin == PRESENTE else fin // 12)
+
+
+class IndiceTemporal:
+    """Linea de tiempo precompilada: intervalos por experiencia, ordenados por inicio y por fin,
+    y tabla de empresas para resolver "antes de Meton" sin recorrer la lista.
+    Args:
+        experiencias (list): dicts con al menos 'empresa' y 'periodo'.
+    """
+
+    def __init__(self, experiencias: list):
+        self.experiencias = list(experiencias)
+        self.intervalos = [parse_intervalo(exp.get("periodo", "")) for exp in self.experiencias]
+        validas = [i for i, (inicio, _) in enumerate(self.intervalos) if inicio is not None]
+
+        self._por_inicio = sorted(validas, key=lambda i: self.intervalos[i][0])
+        self._inicios = [self.intervalos[i][0] for i in self._por_inicio]
+        self._por_fin = sorted(validas, key=lambda i: self.intervalos[i][1])
+        self._fines = [self.intervalos[i][1] for i in self._por_fin]
+        # Para "durante" alcanza con mirar los que empiezan hasta max_duracion antes de la referencia.
+        # Los abiertos ("Presente") se guardan aparte porque su duracion no esta acotada.
+        cerradas = [i for i in validas if self.intervalos[i][1] != PRESENTE]
+        self._abiertas = [i for i in validas if self.intervalos[i][1] == PRESENTE]
+        self._max_duracion = max((self.intervalos[i][1] - self.intervalos[i][0] for i in cerradas), default=0)
+
+        self._empresas = {}
+        for i, exp in enumerate(self.experiencias):
+            nombre = _sin_tildes(exp.get("empresa", "")).strip()
+            if nombre and self.intervalos[i][0] is not None:
+                self._empresas.setdefault(nombre, i)
+
+    def __len__(self):
+        return len(self.experiencias)
+
+    # ---------- empresas ----------
+    def buscar_empresa(self, empresa_nombre: str):
+        """Indice de la experiencia de esa empresa. Prueba nombre exacto (sin mayusculas ni tildes) y despues
+        contenido por palabra completa ("Meton" encuentra "Meton AI"; gana el nombre mas corto). None si no esta.
+        La version anterior solo aceptaba el nombre exacto."""
+        if not empresa_nombre:
+            return None
+        nombre = _sin_tildes(empresa_nombre).strip()
+        if nombre in self._empresas:
+            return self._empresas[nombre]
+        candidatos = [(len(k), i) for k, i in self._empresas.items()
+                      if re.search(rf"\b{re.escape(nombre)}\b", k) or re.search(rf"\b{re.escape(k)}\b", nombre)]
+        return min(candidatos)[1] if candidatos else None
+
+    def intervalo_empresa(self, empresa_nombre: str) -> tuple:
+        i = self.buscar_empresa(empresa_nombre)
+        return self.intervalos[i] if i is not None else (None, None)
+
+    # ---------- referencia ----------
+    def referencia(self, rango_temporal: str, empresa: str) -> tuple:
+        """Intervalo de referencia de la consulta: el periodo entero de la empresa si se menciona una y esta en la
+        linea de tiempo, si no el año o rango explicito ("2020", "2017-2019"). (None, None) si no hay.
+        Antes la referencia era un solo año: el de fin de la empresa o el primer año del rango, y una empresa
+        que no se encontraba dejaba la consulta sin filtrar."""
+        if empresa:
+            inicio, fin = self.intervalo_empresa(empresa)
+            if inicio is not None:
+                return (inicio, fin)
+        if rango_temporal:
+            años = [int(a) for a in PATRON_AÑO.findall(rango_temporal)]
+            if años:
+                return (_mes(años[0], 1), _mes(años[-1], 12))
+        return (None, None)
+
+    # ---------- consultas ----------
+    def _ordenadas(self, indices) -> list:
+        """Devuelve las experiencias en el orden original del archivo."""
+        return [self.experiencias[i] for i in sorted(indices)]
+
+    def antes(self, mes: int) -> list:
+        """Experiencias que empiezan antes de `mes`."""
+        return self._ordenadas(self._por_inicio[:bisect.bisect_left(self._inicios, mes)])
+
+    def despues(self, mes: int) -> list:
+        """Experiencias que empiezan despues de `mes`."""
+        return self._ordenadas(self._por_inicio[bisect.bisect_right(self._inicios, mes):])
+
+    def desde(self, mes: int) -> list:
+        """Experiencias que empiezan en `mes` o despues."""
+        return self._ordenadas(self._por_inicio[bisect.bisect_left(self._inicios, mes):])
+
+    def hasta(self, mes: int) -> list:
+        """Experiencias que terminan en `mes` o antes."""
+        return self._ordenadas(self._por_fin[:bisect.bisect_right(self._fines, mes)])
+
+    def durante(self, inicio: int, fin: int) -> list:
+        """Experiencias que se superponen con [inicio, fin]."""
+        desde = bisect.bisect_left(self._inicios, inicio - self._max_duracion)
+        hasta = bisect.bisect_right(self._inicios, fin)
+        cerradas = [i for i in self._por_inicio[desde:hasta] if self.intervalos[i][1] >= inicio]
+        abiertas = [i for i in self._abiertas if self.intervalos[i][0] <= fin]
+        return self._ordenadas(set(cerradas) | set(abiertas))
+
+    def filtrar(self, conector: str, rango_temporal: str, empresa: str) -> list:
+        """Aplica la regla del conector contra la referencia de la consulta.
+        Sin referencia temporal devuelve todas las experiencias. Con una empresa, "antes", "desde" y "durante" se
+        comparan con el inicio o el periodo entero de la empresa (antes, con su año de fin): ver el docstring del modulo."""
+        ref_inicio, ref_fin = self.referencia(rango_temporal, empresa)
+        if ref_inicio is None:
+            return list(self.experiencias)
+        if conector == "antes":
+            return self.antes(ref_inicio)
+        if conector == "después":
+            # Si la referencia sigue vigente ("Presente"), "después" es despues de que empezo
+            return self.despues(ref_fin if ref_fin != PRESENTE else ref_inicio)
+        if conector in CONECTORES_DURANTE:
+            return self.durante(ref_inicio, ref_fin)
+        if conector == "desde":
+            return self.desde(ref_inicio)
+        if conector == "hasta":
+            return self.hasta(ref_fin)
+        return []
+
+
+# ---------- carga con recarga automatica ----------
+_indices = {}
+_lock = threading.Lock()
+INTERVALO_CHEQUEO_S = float(os.getenv("TEMPORAL_RELOAD_INTERVAL", "1.0"))
+
+def obtener_indice_temporal(path=None):
+    """Indice de la linea de tiempo del archivo, construido una vez por proceso.
+    Se reconstruye cuando cambia el mtime o el tamaño del archivo (se chequea como mucho
+    una vez por INTERVALO_CHEQUEO_S). Devuelve None si el archivo no existe."""
+    path = Path(path or TEMPORAL_PATH)
+    ahora = time.monotonic()
+    with _lock:
+        actual = _indices.get(path)
+        if actual is not None and ahora - actual["chequeado"] < INTERVALO_CHEQUEO_S:
+            return actual["indice"]
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            _indices.pop(path, None)
+            return None
+        huella = (st.st_mtime_ns, st.st_size)
+        if actual is None or actual["huella"] != huella:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            actual = {"indice": IndiceTemporal(data.get("experiencia_laboral", [])), "huella": huella}
+            _indices[path] = actual
+        actual["chequeado"] = ahora
+        return actual["indice"]
+
 
 def get_empresa_periodo(empresa_nombre: str, experiencias: list) -> tuple:
     """
     Busca el período de una empresa específica
     """
-    for exp in experiencias:
-        if exp.get("empresa", "").lower() == empresa_nombre.lower():
-            periodo = exp.get("periodo", "")
-            return parse_periodo(periodo)
-    return (None, None)
+    i = IndiceTemporal(experiencias).buscar_empresa(empresa_nombre)
+    return parse_periodo(experiencias[i].get("periodo", "")) if i is not None else (None, None)
 
 def aplicar_regla_temporal(experiencias: list, conector: str, rango_temporal: str, empresa: str) -> list:
     """
     Aplica reglas temporales sobre una lista de experiencias laborales para filtrar según conectores y referencias temporales.
+    Para consultas repetidas sobre la misma lista conviene construir un IndiceTemporal una vez y usar filtrar().
 
     Espera que cada experiencia tenga al menos los campos:
         - 'empresa': nombre de la empresa (str)
-        - 'periodo': string con el rango de años (ej: '2019 – 2024', '2020', '2018 – Presente')
+        - 'periodo': string con el rango (ej: '2019 – 2024', 'Abril 2023 – Presente', '2020')
 
     Parámetros:
         experiencias (list): Lista de dicts con experiencias laborales.
@@ -46,62 +259,20 @@ def aplicar_regla_temporal(experiencias: list, conector: str, rango_temporal: st
         rango_temporal (str): Año o rango temporal extraído de la consulta (ej: '2020', '2017-2019'). Puede ser None.
         empresa (str): Nombre de la empresa de referencia si se menciona en la consulta. Puede ser None.
 
-    Lógica:
-        - Si hay conector y empresa, busca el período de esa empresa y lo usa como referencia temporal.
-        - Si hay un año/rango explícito, lo usa como referencia temporal.
+    Lógica (los cambios respecto de la version por año estan en el docstring del modulo):
+        - Si hay empresa y esta en la linea de tiempo, el período de esa empresa es el intervalo de referencia.
+        - Si no, el año o rango explícito es la referencia (un año abarca de enero a diciembre).
         - Si no hay referencia temporal, devuelve la lista original (sin filtrar).
-        - Filtra las experiencias según el conector:
-            * 'antes': experiencias que comienzan antes del año de referencia
-            * 'después': experiencias que comienzan después del año de referencia
-            * 'desde': experiencias que comienzan en o después del año de referencia
-            * 'hasta': experiencias que terminan en o antes del año de referencia
-            * 'durante': experiencias que incluyen el año de referencia en su rango
+        - Filtra las experiencias según el conector (comparando meses):
+            * 'antes': experiencias que comienzan antes del inicio de la referencia
+            * 'después': experiencias que comienzan después del fin de la referencia (o de su inicio si sigue vigente)
+            * 'desde': experiencias que comienzan en o después del inicio de la referencia
+            * 'hasta': experiencias que terminan en o antes del fin de la referencia
+            * 'durante': experiencias que se superponen con la referencia
 
     Devuelve:
         list: Subconjunto de experiencias que cumplen la condición temporal.
     """
-    # Extraer año del rango temporal si existe
-    año_específico = None
-    if rango_temporal:
-        año_match = re.search(r'(\d{4})', rango_temporal)
-        if año_match:
-            año_específico = int(año_match.group(1))
-    # Determinar el año de referencia
-    año_referencia = None
-    if conector and empresa:
-        # Caso: "después de meton"
-        año_inicio, año_fin = get_empresa_periodo(empresa, experiencias)
-        if año_fin:
-            año_referencia = año_fin
-        elif año_inicio:
-            año_referencia = año_inicio
-    elif año_específico:
-        # Caso: "antes de 2017"
-        año_referencia = año_específico
-    if not año_referencia:
-        return experiencias  # Sin filtro temporal
-    
-    # Aplicar filtro según conector
-    experiencias_filtradas = []
-    for exp in experiencias:
-        periodo = exp.get("periodo", "")
-        año_inicio, año_fin = parse_periodo(periodo)
-        if not año_inicio:
-            continue
-        if conector == "antes":
-            if año_inicio < año_referencia:
-                experiencias_filtradas.append(exp)
-        elif conector == "después":
-            if año_inicio > año_referencia:
-                experiencias_filtradas.append(exp)
-        elif conector in ["durante", "en", "durante el"]:
-            # Para "en 2020" o "durante 2020", buscar experiencias que incluyan ese año
-            if año_inicio <= año_referencia <= (año_fin or año_inicio):
-                experiencias_filtradas.append(exp)
-        elif conector == "desde":
-            if año_inicio >= año_referencia:
-                experiencias_filtradas.append(exp)
-        elif conector == "hasta":
-            if (año_fin or año_inicio) <= año_referencia:
-                experiencias_filtradas.append(exp)
-    return experiencias_filtradas 
\ No newline at end of file
+    if not conector:
+        return experiencias
+    return IndiceTemporal(experiencias).filtrar(conector, rango_temporal, empresa)
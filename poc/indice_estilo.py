@@ -0,0 +1,148 @@
+import json
+import os
+import random
+import threading
+import time
+from functools import lru_cache
+from pathlib import Path
+import numpy as np
+from corpus_personalidad import CorpusPersonalidad
+from vector_store import IndiceLocal, IndiceIVF, IVF_MIN_VECTORES
+
+"""
+Indice local de ejemplos de estilo para el personality_node.
+Se arma sobre la salida de data_ing/Peronsalidad_DB/vectorizar_bloques.py: embeddings.npy (normalizados),
+metadata.jsonl (tema, emo_user, carpeta, bf_*...) y los textos en textos.blob + textos.offsets.npy.
+Todo se abre con mmap: varios workers de uvicorn comparten la misma copia de la matriz y de los textos.
+
+Los ejemplos se filtran por el topic y la emotion del detector (y la formalidad, si se pide) con el indice
+invertido de metadata de vector_store, y dentro de los candidatos se ordenan por coseno contra la consulta
+(fuerza bruta por defecto; STYLE_BACKEND=ivf o auto para corpus muy grandes, a costa de entrenar
+k-means al cargar). Si un filtro deja menos de k ejemplos se relaja en orden: sin
+formalidad, sin emocion, sin tema. Sin embedding de la consulta se sortean k entre los candidatos.
+
+El embedding de la consulta tiene que salir del mismo modelo que vectorizo los bloques (STYLE_EMBEDDING_MODEL,
+sentence-transformers). Si no esta instalado (o STYLE_EMBEDDING_MODEL esta vacio), se usan solo los filtros.
+"""
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+STYLE_INDEX_DIR = Path(os.getenv("STYLE_INDEX_DIR", BASE_DIR / "data_ing" / "Factica" / "db_personality" / "style_index"))
+STYLE_EMBEDDING_MODEL = os.getenv("STYLE_EMBEDDING_MODEL", "paraphrase-multilingual-MiniLM-L12-v2")
+INTERVALO_CHEQUEO_S = float(os.getenv("STYLE_RELOAD_INTERVAL", "1.0"))
+
+# Campos de metadata que se indexan para los filtros (el resto de metadata.jsonl no se guarda en memoria)
+CAMPOS_FILTRO = ("tema", "emo_user", "carpeta")
+
+
+class IndiceEstilo:
+    """Ejemplos de estilo con filtros de metadata y ranking por similitud.
+    Args:
+        vectores (np.ndarray): embeddings normalizados (n, dim), en memoria o memory-mapped.
+        metadatas (list): dict por fila con los CAMPOS_FILTRO.
+        corpus (CorpusPersonalidad): texto de cada fila.
+        backend (str): "local", "ivf" o "auto" (IVF a partir de IVF_MIN_VECTORES).
+    """
+
+    def __init__(self, vectores, metadatas: list, corpus: CorpusPersonalidad, backend: str = "auto"):
+        if len(corpus) != len(metadatas):
+            raise ValueError(f"{len(metadatas)} filas de metadata y {len(corpus)} textos")
+        ids = [str(i) for i in range(len(metadatas))]
+        if backend == "ivf" or (backend == "auto" and len(ids) >= IVF_MIN_VECTORES):
+            self.indice = IndiceIVF(vectores, ids, metadatas, normalizados=True,
+                                    nprobe=int(os.getenv("VECTOR_IVF_NPROBE", "8")))
+        else:
+            self.indice = IndiceLocal(vectores, ids, metadatas, normalizados=True)
+        self.corpus = corpus
+
+    @classmethod
+    def cargar(cls, directorio=STYLE_INDEX_DIR, backend: str = "auto") -> "IndiceEstilo":
+        directorio = Path(directorio)
+        vectores = np.load(directorio / "embeddings.npy", mmap_mode="r")
+        metadatas = []
+        with open(directorio / "metadata.jsonl", "r", encoding="utf-8") as f:
+            for linea in f:
+                if linea.strip():
+                    registro = json.loads(linea)
+                    metadatas.append({c: registro[c] for c in CAMPOS_FILTRO if c in registro})
+        return cls(vectores, metadatas, CorpusPersonalidad.desde_compilado(directorio / "textos"), backend=backend)
+
+    def __len__(self):
+        return len(self.corpus)
+
+    @property
+    def dimension(self) -> int:
+        return self.indice.vectores.shape[1]
+
+    @staticmethod
+    def filtros(tema=None, emocion=None, formalidad=None) -> list:
+        """Filtros de mas a menos estricto. Los campos vacios no filtran."""
+        campos = [("carpeta", formalidad), ("emo_user", emocion), ("tema", tema)]
+        campos = [(campo, valor) for campo, valor in campos if valor]
+        return [{campo: {"$eq": valor} for campo, valor in campos[i:]} for i in range(len(campos) + 1)]
+
+    def buscar(self, vector=None, k: int = 3, tema=None, emocion=None, formalidad=None, rng=random) -> list:
+        """Hasta k textos distintos. Con vector, los mas parecidos entre los que pasan el filtro mas
+        estricto que tenga resultados (completando con los siguientes); sin vector, sorteados."""
+        elegidas = []
+        for filtro in self.filtros(tema, emocion, formalidad):
+            faltan = k - len(elegidas)
+            if faltan <= 0:
+                break
+            if vector is not None:
+                matches = self.indice.query(vector, top_k=k, include_metadata=False, filter=filtro or None).matches
+                filas = [int(m.id) for m in matches]
+            else:
+                candidatas = np.flatnonzero(self.indice.mascara_filtro(filtro)) if filtro else range(len(self))
+                filas = [int(candidatas[i]) for i in rng.sample(range(len(candidatas)), min(k, len(candidatas)))]
+            elegidas.extend(f for f in filas if f not in elegidas)
+        return [self.corpus[f] for f in elegidas[:k]]
+
+
+@lru_cache(maxsize=1)
+def _modelo_consulta(nombre: str):
+    try:
+        from sentence_transformers import SentenceTransformer
+    except ImportError:
+        print("[PERSONALITY] sentence-transformers no esta instalado: ejemplos de estilo solo por filtros")
+        return None
+    return SentenceTransformer(nombre)
+
+def embed_consulta(texto: str, nombre: str = STYLE_EMBEDDING_MODEL):
+    """Embedding normalizado de la consulta con el modelo de vectorizar_bloques (None si no esta disponible)."""
+    modelo = _modelo_consulta(nombre) if nombre else None
+    if modelo is None:
+        return None
+    return modelo.encode([texto], convert_to_numpy=True, normalize_embeddings=True)[0]
+
+
+# ---------- carga con recarga automatica ----------
+_indices = {}
+_lock = threading.Lock()
+
+def obtener_indice_estilo(directorio=None):
+    """Indice de la carpeta, construido una vez por proceso. Se reconstruye cuando cambia el mtime o el
+    tamaño de embeddings.npy o metadata.jsonl (chequeado como mucho una vez por INTERVALO_CHEQUEO_S).
+    Devuelve None si la carpeta no tiene un indice. Si los archivos nuevos no se pueden cargar (por ejemplo, entre
+    los os.replace de vectorizar_bloques.py) sigue el indice anterior y no se reintenta hasta el proximo cambio."""
+    directorio = Path(directorio or STYLE_INDEX_DIR)
+    ahora = time.monotonic()
+    with _lock:
+        actual = _indices.get(directorio)
+        if actual is not None and ahora - actual["chequeado"] < INTERVALO_CHEQUEO_S:
+            return actual["indice"]
+        try:
+            huella = tuple((st.st_mtime_ns, st.st_size) for st in
+                           (os.stat(directorio / nombre) for nombre in ("embeddings.npy", "metadata.jsonl")))
+        except FileNotFoundError:
+            _indices.pop(directorio, None)
+            return None
+        if actual is None or actual["huella"] != huella:
+            try:
+                indice = IndiceEstilo.cargar(directorio, backend=os.getenv("STYLE_BACKEND", "local"))
+            except (ValueError, KeyError, OSError) as e:
+                print(f"[PERSONALITY] No se pudo cargar el indice de estilo: {e}")
+                indice = actual["indice"] if actual else None
+            actual = {"indice": indice, "huella": huella}
+            _indices[directorio] = actual
+        actual["chequeado"] = ahora
+        return actual["indice"]
@@ -0,0 +1,148 @@
+import ast
+import json
+import os
+import threading
+import time
+from itertools import product
+from pathlib import Path
+
+"""
+Tabla de perfiles OCEAN por contexto para el personality_node.
+Se compila desde los archivos que escribe data_ing/Peronsalidad_DB/analisis_simplificado_conversaciones.py:
+promedio_bigfive_global.json y matrices_promedio_por_grupo.json (promedios por tema, emocion, formalidad y
+sus combinaciones, con la cantidad de bloques de cada grupo).
+
+Al compilar se resuelve de antemano cada combinacion (tema, emocion, formalidad), incluidas las que tienen
+algun campo desconocido (None), bajando por la jerarquia hasta el primer grupo con al menos
+OCEAN_MIN_BLOQUES bloques:
+    tema+emocion+formalidad -> tema+emocion -> tema -> emocion -> formalidad -> global -> DEFAULT_OCEAN
+En cada turno el perfil es un lookup en un dict, sin I/O. La tabla se reemplaza entera (un solo assignment)
+cuando el job de ingesta publica archivos nuevos.
+"""
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+OCEAN_DIR = Path(os.getenv("OCEAN_PROFILE_DIR", BASE_DIR / "data_ing" / "Peronsalidad_DB"))
+ARCHIVO_GLOBAL = "promedio_bigfive_global.json"
+ARCHIVO_MATRICES = "matrices_promedio_por_grupo.json"
+MIN_BLOQUES = int(os.getenv("OCEAN_MIN_BLOQUES", "5"))
+INTERVALO_CHEQUEO_S = float(os.getenv("OCEAN_RELOAD_INTERVAL", "1.0"))
+
+RASGOS = ["openness", "conscientiousness", "extraversion", "agreeableness", "neuroticism"]
+
+# Perfil que se usaba fijo antes de tener los artefactos. Queda como ultimo recurso.
+DEFAULT_OCEAN = {
+    "openness": 0.566,
+    "conscientiousness": 0.505,
+    "extraversion": 0.494,
+    "agreeableness": 0.366,
+    "neuroticism": 0.598
+}
+
+# (agrupacion de matrices_promedio_por_grupo.json, campos del contexto que usa), de mas fina a mas gruesa
+JERARQUIA = [
+    ("por_tema_emocion_formalidad", ("tema", "emocion", "formalidad")),
+    ("por_tema_emocion", ("tema", "emocion")),
+    ("por_tema", ("tema",)),
+    ("por_emocion", ("emocion",)),
+    ("por_formalidad", ("formalidad",)),
+]
+
+
+def _rasgos(promedios: dict) -> dict:
+    """bf_openness... -> openness..., con las claves en el orden de RASGOS."""
+    return {rasgo: promedios[f"bf_{rasgo}"] for rasgo in RASGOS}
+
+
+class TablaOcean:
+    """Perfil OCEAN precalculado para cada (tema, emocion, formalidad).
+    Args:
+        promedio_global (dict): contenido de promedio_bigfive_global.json (o None).
+        matrices (dict): contenido de matrices_promedio_por_grupo.json (o None).
+        min_bloques (int): soporte minimo de un grupo para usarlo; los grupos sin "n" se aceptan siempre.
+    """
+
+    def __init__(self, promedio_global=None, matrices=None, min_bloques=MIN_BLOQUES):
+        global_ = (_rasgos(promedio_global), "global") if promedio_global else (dict(DEFAULT_OCEAN), "default")
+        grupos = {}
+        for agrupacion, _ in JERARQUIA:
+            grupos[agrupacion] = {}
+            for clave, promedios in ((matrices or {}).get(agrupacion) or {}).items():
+                if promedios.get("n", min_bloques) >= min_bloques:
+                    grupos[agrupacion][tuple(ast.literal_eval(clave))] = _rasgos(promedios)
+
+        self.temas = {t for g in ("por_tema_emocion_formalidad", "por_tema_emocion", "por_tema") for t, *_ in grupos[g]}
+        self.emociones = ({c[1] for g in ("por_tema_emocion_formalidad", "por_tema_emocion") for c in grupos[g]}
+                          | {e for e, in grupos["por_emocion"]})
+        self.formalidades = ({c[2] for c in grupos["por_tema_emocion_formalidad"]}
+                             | {f for f, in grupos["por_formalidad"]})
+
+        # Se resuelven todas las combinaciones (None = desconocido) una sola vez
+        self._tabla = {}
+        for tema, emocion, formalidad in product(self.temas | {None}, self.emociones | {None},
+                                                 self.formalidades | {None}):
+            contexto = {"tema": tema, "emocion": emocion, "formalidad": formalidad}
+            perfil = global_
+            for agrupacion, campos in JERARQUIA:
+                clave = tuple(contexto[c] for c in campos)
+                if None not in clave and clave in grupos[agrupacion]:
+                    perfil = (grupos[agrupacion][clave], agrupacion)
+                    break
+            self._tabla[(tema, emocion, formalidad)] = perfil
+
+    def __len__(self):
+        return len(self._tabla)
+
+    def perfil(self, tema=None, emocion=None, formalidad=None) -> tuple:
+        """(perfil OCEAN, agrupacion de la que salio). Los valores que no estan en la tabla cuentan como None.
+        El dict devuelto es compartido: no modificarlo."""
+        tema = tema if tema in self.temas else None
+        emocion = emocion if emocion in self.emociones else None
+        formalidad = formalidad if formalidad in self.formalidades else None
+        return self._tabla[(tema, emocion, formalidad)]
+
+
+def _leer_json(path: Path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+# ---------- carga con recarga automatica ----------
+_tablas = {}
+_lock = threading.Lock()
+
+def _huella(directorio: Path) -> tuple:
+    huella = []
+    for nombre in (ARCHIVO_GLOBAL, ARCHIVO_MATRICES):
+        try:
+            st = os.stat(directorio / nombre)
+            huella.append((st.st_mtime_ns, st.st_size))
+        except FileNotFoundError:
+            huella.append(None)
+    return tuple(huella)
+
+def obtener_tabla_ocean(directorio=None) -> TablaOcean:
+    """Tabla compilada desde los artefactos de la carpeta, construida una vez por proceso. Se recompila cuando
+    cambia alguno de los dos archivos (chequeado como mucho una vez por INTERVALO_CHEQUEO_S). Sin archivos,
+    todas las consultas devuelven DEFAULT_OCEAN. Si los archivos nuevos no se pueden leer, sigue la tabla anterior."""
+    directorio = Path(directorio or OCEAN_DIR)
+    ahora = time.monotonic()
+    with _lock:
+        actual = _tablas.get(directorio)
+        if actual is not None and ahora - actual["chequeado"] < INTERVALO_CHEQUEO_S:
+            return actual["tabla"]
+        huella = _huella(directorio)
+        if actual is None or actual["huella"] != huella:
+            try:
+                tabla = TablaOcean(_leer_json(directorio / ARCHIVO_GLOBAL), _leer_json(directorio / ARCHIVO_MATRICES))
+                actual = {"tabla": tabla, "huella": huella}
+                _tablas[directorio] = actual
+            except Exception as e:
+                # Cualquier archivo mal formado (no solo JSON invalido: tambien tipos inesperados) deja la anterior
+                print(f"[PERSONALITY] No se pudo compilar la tabla OCEAN: {e}")
+                actual = {"tabla": actual["tabla"] if actual else TablaOcean(), "huella": huella}
+                _tablas[directorio] = actual
+        actual["chequeado"] = ahora
+        return actual["tabla"]
@@ -0,0 +1,187 @@
+import os
+import re
+import unicodedata
+from functools import lru_cache
+
+"""
+Empaquetado del contexto del response_node con presupuesto de tokens.
+Antes el prompt llevaba todo lo que devolvia la recuperacion: hasta 10 matches de Pinecone (uno por skill,
+con la misma experiencia repetida), la lista temporal completa (muchas veces las mismas experiencias), los
+ejemplos de estilo enteros y la explicacion de OCEAN, todo en un unico mensaje que cambiaba en cada turno.
+
+- Seccion estatica (SISTEMA): rol, explicacion de OCEAN y reglas. Va como mensaje de sistema y es identica
+  byte a byte en todos los requests, asi el prefijo puede aprovechar el prompt caching del proveedor.
+- Seccion dinamica: la pregunta, los valores OCEAN y el contexto recuperado. Los matches factuales se agrupan
+  por experiencia (empresa, rol, periodo) con sus skills ordenados por score, y una experiencia que aparece en
+  la parte factual y en la temporal queda en una sola linea. Las lineas se ordenan por relevancia (primero la
+  seccion que pide el detector) y se agregan mientras entren en PROMPT_BUDGET_TOKENS. Los ejemplos de estilo se recortan
+  a PROMPT_TOKENS_EJEMPLO tokens cada uno.
+
+Los tokens se cuentan localmente con tiktoken si esta instalado y tiene el encoding disponible; si no, con una
+estimacion (palabras partidas cada 4 caracteres y signos sueltos), que alcanza para el presupuesto.
+"""
+
+PRESUPUESTO_TOKENS = int(os.getenv("PROMPT_BUDGET_TOKENS", "600"))
+TOKENS_EJEMPLO = int(os.getenv("PROMPT_TOKENS_EJEMPLO", "120"))
+ENCODING = os.getenv("PROMPT_TOKEN_ENCODING", "o200k_base")
+# Lineas de la seccion principal que entran antes del primer ejemplo de estilo
+LINEAS_ANTES_DE_EJEMPLOS = 4
+
+PATRON_TOKEN_ESTIMADO = re.compile(r"\w{1,4}|[^\w\s]")
+
+SISTEMA = """Eres Nico. Responde como lo haría él, usando SOLO la información proporcionada en el mensaje del usuario.
+
+Los valores OCEAN representan rasgos de personalidad:
+- O (Apertura a la experiencia): alto = creativo, curioso; bajo = tradicional, práctico
+- C (Responsabilidad): alto = organizado, cumplidor; bajo = flexible, desordenado
+- E (Extraversión): alto = sociable, expresivo; bajo = reservado, tranquilo
+- A (Amabilidad): alto = empático, cooperativo; bajo = directo, competitivo
+- N (Neuroticismo): alto = emocional, sensible; bajo = estable, calmado
+Ajusta el tono de la respuesta según estos valores.
+
+Reglas:
+- Si no hay información relevante, di cortésmente que no puedes responder
+- NO inventes información
+- Usa solo los datos proporcionados
+- Mantén el estilo de los ejemplos
+- Ajusta el tono según los valores OCEAN
+- No contestes en neutral. Contesta como argentino, pero sin lunfardo"""
+
+
+@lru_cache(maxsize=1)
+def _encoder(nombre: str):
+    try:
+        import tiktoken
+        return tiktoken.get_encoding(nombre)
+    except Exception as e:  # sin el paquete o sin poder bajar el encoding
+        print(f"[PROMPT] Sin tiktoken ({type(e).__name__}): los tokens se estiman")
+        return None
+
+def contar_tokens(texto: str) -> int:
+    encoder = _encoder(ENCODING)
+    if encoder is not None:
+        return len(encoder.encode(texto))
+    return len(PATRON_TOKEN_ESTIMADO.findall(texto))
+
+def recortar(texto: str, max_tokens: int) -> str:
+    """El texto cortado a max_tokens (con "…" si se corto)."""
+    if contar_tokens(texto) <= max_tokens:
+        return texto
+    encoder = _encoder(ENCODING)
+    if encoder is not None:
+        return encoder.decode(encoder.encode(texto)[:max_tokens]).rstrip() + "…"
+    tokens = list(PATRON_TOKEN_ESTIMADO.finditer(texto))
+    return texto[:tokens[max_tokens - 1].end()].rstrip() + "…"
+
+
+# ---------- lineas de contexto ----------
+def _empresa(nombre: str) -> str:
+    nombre = unicodedata.normalize("NFKD", (nombre or "").lower())
+    return " ".join("".join(c for c in nombre if not unicodedata.combining(c)).split())
+
+def _misma_empresa(a: str, b: str) -> bool:
+    """factual.json y temporal_experience.json no nombran igual a todas las empresas ("Meton" / "Meton AI")."""
+    return bool(a and b) and (a == b or a.startswith(b + " ") or b.startswith(a + " "))
+
+def _linea(empresa, rol, periodo, skills) -> str:
+    return f"- {empresa} ({rol}, {periodo}): {', '.join(skills)}"
+
+def experiencias_factual(matches: list) -> list:
+    """Una entrada por experiencia (empresa, rol, periodo) con sus skills de mayor a menor score."""
+    experiencias = {}
+    for m in sorted(matches, key=lambda m: -(m.get("score") or 0.0)):
+        clave = (m.get("empresa", ""), m.get("rol", ""), m.get("periodo", ""))
+        exp = experiencias.setdefault(clave, {"empresa": clave[0], "rol": clave[1], "periodo": clave[2],
+                                              "skills": [], "score": m.get("score") or 0.0})
+        if m.get("skill") and m["skill"] not in exp["skills"]:
+            exp["skills"].append(m["skill"])
+    return list(experiencias.values())
+
+def lineas_contexto(matches: list, temporal: list, temporal_primero: bool) -> tuple:
+    """(lineas factual, lineas temporal) sin experiencias repetidas entre las dos secciones.
+    Una experiencia que esta en las dos queda solo en la seccion principal (la temporal si temporal_primero),
+    con el periodo de la linea de tiempo y primero los skills que matchearon. Factual va por score y temporal
+    en el orden de la linea de tiempo."""
+    factual = experiencias_factual(matches)
+    lf, lt, usadas = [], [], set()
+    for exp in temporal:
+        skills = list(exp.get("skills", [])[:3])
+        par = next((i for i, f in enumerate(factual)
+                    if i not in usadas and _misma_empresa(_empresa(f["empresa"]), _empresa(exp.get("empresa", "")))), None)
+        if par is not None and temporal_primero:
+            usadas.add(par)
+            skills = factual[par]["skills"] + [s for s in skills if s not in factual[par]["skills"]]
+        elif par is not None:
+            continue  # queda en la seccion factual
+        lt.append(_linea(exp.get("empresa", ""), exp.get("rol", ""), exp.get("periodo", ""), skills))
+    for i, f in enumerate(factual):
+        if i not in usadas:
+            lf.append(_linea(f["empresa"], f["rol"], f["periodo"], f["skills"]))
+    return lf, lt
+
+def lineas_texto(texto: str) -> list:
+    """Lineas "- ..." de un texto ya armado (para estados sin items estructurados), sin repetidas."""
+    return [linea for linea in dict.fromkeys(l.strip() for l in (texto or "").splitlines()) if linea.startswith("- ")]
+
+def formatear_ocean(ocean) -> str:
+    if not isinstance(ocean, dict):
+        return str(ocean)
+    return " ".join(f"{rasgo[0].upper()}={valor:.2f}" for rasgo, valor in ocean.items())
+
+
+def empaquetar(pregunta: str, factual=None, temporal=None, factual_texto: str = "", temporal_texto: str = "",
+               ejemplos=(), personalidad: str = "", ocean=None, tipo: str = "", presupuesto: int = None) -> tuple:
+    """Arma el mensaje del usuario con el contexto que entra en el presupuesto.
+    Args:
+        factual (list): matches como dicts {empresa, rol, periodo, skill, score}. Si es None se usan las
+            lineas de factual_texto.
+        temporal (list): experiencias {empresa, rol, periodo, skills}. Si es None, las de temporal_texto.
+        ejemplos (list): textos de ejemplo de estilo, del mas al menos relevante.
+        tipo (str): tipo del detector; con "temporal" la seccion temporal va primero en el ranking.
+        presupuesto (int): tokens maximos de la seccion dinamica (por defecto PROMPT_BUDGET_TOKENS).
+    Returns:
+        (mensaje, stats): stats tiene los tokens del mensaje y las lineas y ejemplos descartados.
+    """
+    presupuesto = PRESUPUESTO_TOKENS if presupuesto is None else presupuesto
+    if factual is not None and temporal is not None:
+        lf, lt = lineas_contexto(factual, temporal, temporal_primero=tipo == "temporal")
+    else:
+        lf = ([_linea(f["empresa"], f["rol"], f["periodo"], f["skills"]) for f in experiencias_factual(factual)]
+              if factual is not None else lineas_texto(factual_texto))
+        lt = [l for l in lineas_texto(temporal_texto) if l not in lf] if temporal is None else \
+            [_linea(e.get("empresa", ""), e.get("rol", ""), e.get("periodo", ""), e.get("skills", [])[:3]) for e in temporal]
+    ejemplos = [recortar(e.strip(), TOKENS_EJEMPLO) for e in dict.fromkeys(ejemplos) if e and e.strip()]
+
+    fijo = (f"Pregunta: {pregunta}\n\n"
+            f"Tono: {personalidad}\nValores OCEAN: {formatear_ocean(ocean)}\n\n")
+    usados = contar_tokens(fijo)
+
+    principal, secundaria = (("temporal", lt), ("factual", lf)) if tipo == "temporal" else (("factual", lf), ("temporal", lt))
+    candidatos = ([(principal[0], l) for l in principal[1][:LINEAS_ANTES_DE_EJEMPLOS]]
+                  + [("ejemplo", e) for e in ejemplos[:1]]
+                  + [(principal[0], l) for l in principal[1][LINEAS_ANTES_DE_EJEMPLOS:]]
+                  + [(secundaria[0], l) for l in secundaria[1]]
+                  + [("ejemplo", e) for e in ejemplos[1:]])
+    elegidos = {"factual": [], "temporal": [], "ejemplo": []}
+    descartados = 0
+    for seccion, texto in candidatos:
+        costo = contar_tokens(texto) + 1
+        if usados + costo > presupuesto:
+            descartados += 1
+            continue
+        elegidos[seccion].append(texto)
+        usados += costo
+
+    partes = [fijo + "Información disponible:"]
+    partes.append("Factual:\n" + ("\n".join(elegidos["factual"]) or "(sin resultados)"))
+    if elegidos["temporal"] or temporal_texto or temporal:
+        partes.append("Temporal:\n" + ("\n".join(elegidos["temporal"]) or "(sin resultados)"))
+    if elegidos["ejemplo"]:
+        partes.append("Ejemplos de estilo de Nico:\n" + "\n---\n".join(elegidos["ejemplo"]))
+    mensaje = "\n\n".join(partes) + "\n\nRespuesta:"
+    return mensaje, {"mensaje": contar_tokens(mensaje), "descartados": descartados,
+                     "lineas": len(elegidos["factual"]) + len(elegidos["temporal"]), "ejemplos": len(elegidos["ejemplo"])}
+
+@lru_cache(maxsize=1)
+def tokens_sistema() -> int:
+    return contar_tokens(SISTEMA)
@@ -0,0 +1,199 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+try:
+    import redis
+except ImportError:  # opcional, solo para RATE_LIMIT_BACKEND=redis
+    redis = None
+
+
+"""
+Rate limiting por clave (IP) con ventana deslizante aproximada (sliding window counter).
+Antes cada request recorria todas las IPs vistas y reconstruia sus listas de timestamps, y el dict
+crecia sin limite. Aca cada clave guarda solo tres numeros: la ventana fija actual, su contador y el
+de la ventana anterior. El conteo estimado es
+
+    previo * (1 - fraccion transcurrida de la ventana actual) + actual
+
+que suaviza el borde entre ventanas sin guardar un timestamp por request. Cada chequeo es O(1).
+
+Backends:
+- LimitadorMemoria: un proceso. OrderedDict en orden de uso, se desalojan las claves inactivas.
+- LimitadorSQLite: varios workers de uvicorn en la misma maquina comparten un archivo SQLite (WAL).
+- LimitadorRedis: varios workers o maquinas, si esta instalado `redis`.
+"""
+
+BASE_DIR = Path(__file__).resolve().parent
+
+
+def _estimado(previo: int, actual: int, ahora: float, ventana_s: float) -> float:
+    transcurrido = (ahora % ventana_s) / ventana_s
+    return previo * (1 - transcurrido) + actual
+
+
+class LimitadorMemoria:
+    """Sliding window counter en memoria.
+    Args:
+        limite (int): requests permitidos por ventana.
+        ventana_s (float): largo de la ventana en segundos.
+        max_claves (int): claves maximas en memoria. Si se supera, se desalojan las menos recientes.
+    """
+
+    def __init__(self, limite: int, ventana_s: float, max_claves: int = 200000):
+        self.limite = limite
+        self.ventana_s = ventana_s
+        self.max_claves = max_claves
+        self._claves = OrderedDict()  # clave -> [ventana, actual, previo, visto] en orden de uso
+        self._lock = threading.Lock()
+
+    def _desalojar(self, ahora: float):
+        # Una clave sin uso por dos ventanas tiene contador 0: se puede borrar sin cambiar el resultado
+        while self._claves:
+            clave, estado = next(iter(self._claves.items()))
+            if ahora - estado[3] < 2 * self.ventana_s and len(self._claves) <= self.max_claves:
+                break
+            del self._claves[clave]
+
+    def permitir(self, clave: str, ahora: float = None) -> bool:
+        """Registra un request de la clave. Devuelve False si supera el limite."""
+        ahora = time.time() if ahora is None else ahora
+        ventana = int(ahora // self.ventana_s)
+        with self._lock:
+            estado = self._claves.get(clave)
+            if estado is None:
+                estado = [ventana, 0, 0, ahora]
+                self._claves[clave] = estado
+            else:
+                self._claves.move_to_end(clave)
+                if estado[0] != ventana:
+                    estado[2] = estado[1] if estado[0] == ventana - 1 else 0
+                    estado[0], estado[1] = ventana, 0
+            estado[3] = ahora
+            self._desalojar(ahora)
+            if _estimado(estado[2], estado[1], ahora, self.ventana_s) >= self.limite:
+                return False
+            estado[1] += 1
+            return True
+
+    def __len__(self):
+        return len(self._claves)
+
+
+class LimitadorSQLite:
+    """Sliding window counter compartido entre procesos a traves de un archivo SQLite.
+    Args:
+        path (str|Path): archivo de la base.
+        limite (int), ventana_s (float): como en LimitadorMemoria.
+        intervalo_limpieza (int): cada cuantos chequeos se borran las claves inactivas.
+    """
+
+    def __init__(self, path, limite: int, ventana_s: float, intervalo_limpieza: int = 1000):
+        self.path = str(path)
+        self.limite = limite
+        self.ventana_s = ventana_s
+        self.intervalo_limpieza = intervalo_limpieza
+        self._local = threading.local()
+        self._chequeos = 0
+        con = self._conexion()
+        con.execute(
+            "CREATE TABLE IF NOT EXISTS rate_limit ("
+            "clave TEXT PRIMARY KEY, ventana INTEGER, actual INTEGER, previo INTEGER, visto REAL)"
+        )
+        con.execute("CREATE INDEX IF NOT EXISTS rate_limit_visto ON rate_limit (visto)")
+
+    def _conexion(self) -> sqlite3.Connection:
+        # Una conexion por thread (sqlite3 no comparte conexiones entre threads)
+        con = getattr(self._local, "con", None)
+        if con is None:
+            con = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute("PRAGMA synchronous=NORMAL")
+            self._local.con = con
+        return con
+
+    def permitir(self, clave: str, ahora: float = None) -> bool:
+        ahora = time.time() if ahora is None else ahora
+        ventana = int(ahora // self.ventana_s)
+        con = self._conexion()
+        # BEGIN IMMEDIATE toma el lock de escritura: leer y actualizar la clave es atomico entre procesos
+        con.execute("BEGIN IMMEDIATE")
+        try:
+            fila = con.execute("SELECT ventana, actual, previo FROM rate_limit WHERE clave = ?", (clave,)).fetchone()
+            if fila is None:
+                previo, actual = 0, 0
+            elif fila[0] == ventana:
+                previo, actual = fila[2], fila[1]
+            else:
+                previo, actual = (fila[1] if fila[0] == ventana - 1 else 0), 0
+            permitido = _estimado(previo, actual, ahora, self.ventana_s) < self.limite
+            con.execute(
+                "INSERT INTO rate_limit (clave, ventana, actual, previo, visto) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(clave) DO UPDATE SET ventana = excluded.ventana, actual = excluded.actual, "
+                "previo = excluded.previo, visto = excluded.visto",
+                (clave, ventana, actual + 1 if permitido else actual, previo, ahora)
+            )
+            self._chequeos += 1
+            if self._chequeos % self.intervalo_limpieza == 0:
+                con.execute("DELETE FROM rate_limit WHERE visto < ?", (ahora - 2 * self.ventana_s,))
+            con.execute("COMMIT")
+        except Exception:
+            con.execute("ROLLBACK")
+            raise
+        return permitido
+
+    def __len__(self):
+        return self._conexion().execute("SELECT COUNT(*) FROM rate_limit").fetchone()[0]
+
+
+# Chequeo e incremento en un solo paso del lado de Redis: entre workers no hay carrera entre leer los
+# contadores y sumar el request. ARGV: peso de la ventana anterior, limite, expiracion en segundos.
+SCRIPT_REDIS = """
+local actual = tonumber(redis.call('GET', KEYS[1]) or '0')
+local previo = tonumber(redis.call('GET', KEYS[2]) or '0')
+if previo * tonumber(ARGV[1]) + actual >= tonumber(ARGV[2]) then
+    return 0
+end
+redis.call('INCR', KEYS[1])
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+return 1
+"""
+
+
+class LimitadorRedis:
+    """Sliding window counter en Redis: un contador por (clave, ventana) con expiracion.
+    El chequeo y el incremento corren atomicos en un script Lua (SCRIPT_REDIS)."""
+
+    def __init__(self, url: str, limite: int, ventana_s: float, prefijo: str = "rate_limit"):
+        if redis is None:
+            raise ImportError("RATE_LIMIT_BACKEND=redis requiere el paquete redis (pip install redis)")
+        self.cliente = redis.Redis.from_url(url)
+        self.limite = limite
+        self.ventana_s = ventana_s
+        self.prefijo = prefijo
+        self._script = self.cliente.register_script(SCRIPT_REDIS)
+
+    def permitir(self, clave: str, ahora: float = None) -> bool:
+        ahora = time.time() if ahora is None else ahora
+        ventana = int(ahora // self.ventana_s)
+        k_actual = f"{self.prefijo}:{clave}:{ventana}"
+        k_previo = f"{self.prefijo}:{clave}:{ventana - 1}"
+        # Mismo estimado que _estimado: previo * (1 - fraccion transcurrida) + actual
+        peso_previo = 1 - (ahora % self.ventana_s) / self.ventana_s
+        return bool(self._script(keys=[k_actual, k_previo],
+                                 args=[repr(peso_previo), self.limite, int(2 * self.ventana_s) + 1]))
+
+
+def desde_entorno(limite: int, ventana_s: float):
+    """Limitador segun RATE_LIMIT_BACKEND: memory (por defecto), sqlite o redis."""
+    backend = os.getenv("RATE_LIMIT_BACKEND", "memory").lower()
+    if backend == "sqlite":
+        path = os.getenv("RATE_LIMIT_SQLITE_PATH", str(BASE_DIR / ".cache" / "rate_limit.sqlite"))
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        return LimitadorSQLite(path, limite, ventana_s)
+    if backend == "redis":
+        return LimitadorRedis(os.getenv("RATE_LIMIT_REDIS_URL", "redis://localhost:6379/0"), limite, ventana_s)
+    return LimitadorMemoria(limite, ventana_s, max_claves=int(os.getenv("RATE_LIMIT_MAX_KEYS", "200000")))
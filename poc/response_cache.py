@@ -0,0 +1,301 @@
+import os
+import re
+import time
+import threading
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+import numpy as np
+
+
+"""
+Cache de respuestas para preguntas repetidas o casi repetidas.
+Cada pregunta nueva cuesta detector + embedding + Pinecone + respuesta, y los visitantes preguntan
+casi siempre lo mismo ("¿sabés Python?", "¿qué hiciste en Meton?").
+
+- Clave exacta: la pregunta normalizada (minusculas, sin tildes ni signos, espacios colapsados).
+- Clave semantica: si no hay hit exacto, se compara el embedding de la pregunta contra los cacheados
+  y se acepta el mas parecido si supera el umbral de similitud coseno.
+- Expiracion por TTL y desalojo LRU por cantidad de entradas y por presupuesto de memoria.
+- Se invalida entero cuando cambian factual.json o temporal_experience.json.
+"""
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+ARCHIVOS_FUENTE = (
+    BASE_DIR / "data_ing" / "Factica" / "factual.json",
+    BASE_DIR / "data_ing" / "Factica" / "temporal_experience.json",
+)
+
+# Overhead aproximado por entrada (dicts, OrderedDict, floats) para la cuenta de memoria
+OVERHEAD_ENTRADA = 512
+
+
+def normalizar_pregunta(texto: str) -> str:
+    """Normaliza la pregunta para usarla como clave: minusculas, sin tildes, sin signos de puntuacion."""
+    texto = unicodedata.normalize("NFKD", texto.lower())
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    texto = re.sub(r"[^\w\s]", " ", texto)
+    return re.sub(r"\s+", " ", texto).strip()
+
+
+class CacheRespuestas:
+    """Cache LRU + TTL con busqueda exacta y por similitud de embeddings.
+    Args:
+        embed (callable): texto -> embedding. Opcional, sin el solo hay hits exactos.
+        aembed (callable): version async de embed, usada por abuscar.
+        umbral_similitud (float): similitud coseno minima para un hit semantico.
+        ttl_segundos (float): vida de cada entrada.
+        max_entradas (int): cantidad maxima de entradas.
+        max_bytes (int): presupuesto de memoria aproximado.
+        archivos_fuente (tuple): si alguno cambia en disco, se vacia el cache.
+    """
+
+    def __init__(self, embed=None, aembed=None, umbral_similitud=0.95, ttl_segundos=3600,
+                 max_entradas=1000, max_bytes=32 * 1024 * 1024, archivos_fuente=ARCHIVOS_FUENTE,
+                 intervalo_chequeo_s=1.0):
+        self.embed = embed
+        self.aembed = aembed
+        self.umbral_similitud = umbral_similitud
+        self.ttl_segundos = ttl_segundos
+        self.max_entradas = max_entradas
+        self.max_bytes = max_bytes
+        self.archivos_fuente = tuple(Path(p) for p in archivos_fuente)
+        self.intervalo_chequeo_s = intervalo_chequeo_s
+
+        self._lock = threading.Lock()
+        self._entradas = OrderedDict()  # clave normalizada -> entrada (orden LRU)
+        self._bytes = 0
+        self._huella = self._huella_fuentes()
+        self._ultimo_chequeo = time.monotonic()
+
+        # Embeddings normalizados en una matriz con slots reutilizables (y el momento de creacion de cada slot)
+        self._matriz = None
+        self._creado_slot = None
+        self._claves_slot = []
+        self._slots_libres = []
+        # Embeddings calculados en un miss, a la espera del guardar() de esa pregunta
+        self._pendientes = {}
+
+        self.hits_exactos = 0
+        self.hits_semanticos = 0
+        self.misses = 0
+        self.invalidaciones = 0
+        self.latencia_ahorrada_ms = 0.0
+
+    # ---------- invalidacion ----------
+    def _huella_fuentes(self) -> tuple:
+        huella = []
+        for path in self.archivos_fuente:
+            try:
+                st = path.stat()
+                huella.append((st.st_mtime_ns, st.st_size))
+            except FileNotFoundError:
+                huella.append(None)
+        return tuple(huella)
+
+    def _verificar_fuentes(self):
+        ahora = time.monotonic()
+        if ahora - self._ultimo_chequeo < self.intervalo_chequeo_s:
+            return
+        self._ultimo_chequeo = ahora
+        huella = self._huella_fuentes()
+        if huella != self._huella:
+            self._huella = huella
+            self.invalidaciones += 1
+            self.limpiar()
+
+    def limpiar(self):
+        with self._lock:
+            self._entradas.clear()
+            self._bytes = 0
+            self._matriz = None
+            self._creado_slot = None
+            self._claves_slot = []
+            self._slots_libres = []
+            self._pendientes = {}
+
+    # ---------- embeddings ----------
+    def _vector(self, embedding):
+        if embedding is None:
+            return None
+        v = np.asarray(embedding, dtype=np.float32)
+        norma = np.linalg.norm(v)
+        return v / norma if norma > 0 else None
+
+    def _asignar_slot(self, clave: str, v: np.ndarray, creado: float) -> int:
+        if self._matriz is None:
+            self._matriz = np.zeros((16, v.shape[0]), dtype=np.float32)
+            self._creado_slot = np.zeros(16)
+        if self._slots_libres:
+            slot = self._slots_libres.pop()
+            self._claves_slot[slot] = clave
+        else:
+            slot = len(self._claves_slot)
+            if slot >= self._matriz.shape[0]:
+                nueva = np.zeros((self._matriz.shape[0] * 2, self._matriz.shape[1]), dtype=np.float32)
+                nueva[:slot] = self._matriz
+                self._matriz = nueva
+                self._creado_slot = np.concatenate([self._creado_slot, np.zeros(len(self._creado_slot))])
+            self._claves_slot.append(clave)
+        self._matriz[slot] = v
+        self._creado_slot[slot] = creado
+        return slot
+
+    def _mas_parecida(self, v: np.ndarray):
+        """Clave vigente mas parecida a v, si supera el umbral. Los slots libres y los vencidos no compiten:
+        un vencido no puede tapar a un segundo candidato vigente."""
+        if self._matriz is None or v is None or not self._claves_slot:
+            return None
+        n = len(self._claves_slot)
+        sims = self._matriz[:n] @ v
+        sims[time.monotonic() - self._creado_slot[:n] > self.ttl_segundos] = -1.0
+        for slot in self._slots_libres:
+            sims[slot] = -1.0
+        mejor = int(np.argmax(sims))
+        if sims[mejor] >= self.umbral_similitud and self._claves_slot[mejor] is not None:
+            return self._claves_slot[mejor]
+        return None
+
+    # ---------- LRU / memoria ----------
+    def _quitar(self, clave: str):
+        entrada = self._entradas.pop(clave)
+        self._bytes -= entrada["bytes"]
+        if entrada["slot"] is not None:
+            self._claves_slot[entrada["slot"]] = None
+            self._slots_libres.append(entrada["slot"])
+
+    def _desalojar(self):
+        while self._entradas and (len(self._entradas) > self.max_entradas or self._bytes > self.max_bytes):
+            self._quitar(next(iter(self._entradas)))
+
+    def _valida(self, clave: str) -> bool:
+        """True si la clave tiene una entrada sin vencer (sin tocar el orden LRU)."""
+        entrada = self._entradas.get(clave)
+        return entrada is not None and time.monotonic() - entrada["creado"] <= self.ttl_segundos
+
+    def _vigente(self, clave: str):
+        entrada = self._entradas.get(clave)
+        if entrada is None:
+            return None
+        if time.monotonic() - entrada["creado"] > self.ttl_segundos:
+            self._quitar(clave)
+            return None
+        self._entradas.move_to_end(clave)
+        return entrada
+
+    # ---------- API ----------
+    def _buscar(self, clave: str, v, inicio: float):
+        with self._lock:
+            entrada = self._vigente(clave)
+            if entrada is not None:
+                self.hits_exactos += 1
+            else:
+                similar = self._mas_parecida(v)
+                entrada = self._vigente(similar) if similar else None
+                if entrada is not None:
+                    self.hits_semanticos += 1
+            if entrada is None:
+                self.misses += 1
+                return None
+            self.latencia_ahorrada_ms += max(0.0, entrada["latencia_ms"] - (time.perf_counter() - inicio) * 1000)
+            return entrada["valor"]
+
+    def buscar(self, pregunta: str):
+        """Devuelve el valor cacheado para la pregunta (o una casi identica) o None.
+        En un miss devuelve None y deja el embedding calculado listo para guardar()."""
+        inicio = time.perf_counter()
+        self._verificar_fuentes()
+        clave = normalizar_pregunta(pregunta)
+        with self._lock:
+            # Una entrada vencida cuenta como ausente: hace falta el embedding para el hit semantico y para
+            # volver a guardarla con su slot
+            exacta = self._valida(clave)
+        v = None if exacta or not self.embed else self._embedding_seguro(self.embed, pregunta, clave)
+        return self._buscar(clave, v, inicio)
+
+    async def abuscar(self, pregunta: str):
+        """Version async de buscar (el embedding de la pregunta no bloquea el event loop)."""
+        inicio = time.perf_counter()
+        self._verificar_fuentes()
+        clave = normalizar_pregunta(pregunta)
+        with self._lock:
+            # Una entrada vencida cuenta como ausente: hace falta el embedding para el hit semantico y para
+            # volver a guardarla con su slot
+            exacta = self._valida(clave)
+        v = None
+        if not exacta and self.aembed:
+            try:
+                # Se embebe la pregunta original: es el mismo texto que embebe factual_node,
+                # asi el cache de embeddings lo calcula una sola vez por turno.
+                v = self._vector(await self.aembed(pregunta))
+            except Exception as e:
+                print(f"[CACHE] Error calculando embedding: {e}")
+        self._pendiente(clave, v)
+        return self._buscar(clave, v, inicio)
+
+    def _pendiente(self, clave, v):
+        if v is None:
+            return
+        with self._lock:
+            if len(self._pendientes) > self.max_entradas:
+                self._pendientes.clear()
+            self._pendientes[clave] = v
+
+    def _embedding_seguro(self, embed, pregunta, clave):
+        try:
+            v = self._vector(embed(pregunta))
+        except Exception as e:
+            print(f"[CACHE] Error calculando embedding: {e}")
+            v = None
+        self._pendiente(clave, v)
+        return v
+
+    def guardar(self, pregunta: str, valor, latencia_ms: float = 0.0):
+        """Guarda el valor de una pregunta. Reusa el embedding calculado en el miss de esa pregunta."""
+        clave = normalizar_pregunta(pregunta)
+        with self._lock:
+            v = self._pendientes.pop(clave, None)
+        tamano = OVERHEAD_ENTRADA + len(clave.encode("utf-8")) + len(str(valor).encode("utf-8"))
+        if v is not None:
+            tamano += v.nbytes
+        with self._lock:
+            if clave in self._entradas:
+                self._quitar(clave)
+            creado = time.monotonic()
+            slot = self._asignar_slot(clave, v, creado) if v is not None else None
+            self._entradas[clave] = {
+                "valor": valor,
+                "creado": creado,
+                "latencia_ms": latencia_ms,
+                "bytes": tamano,
+                "slot": slot
+            }
+            self._bytes += tamano
+            self._desalojar()
+
+    def stats(self) -> dict:
+        consultas = self.hits_exactos + self.hits_semanticos + self.misses
+        return {
+            "entradas": len(self._entradas),
+            "bytes": self._bytes,
+            "hits_exactos": self.hits_exactos,
+            "hits_semanticos": self.hits_semanticos,
+            "misses": self.misses,
+            "hit_rate": round((self.hits_exactos + self.hits_semanticos) / consultas, 3) if consultas else 0.0,
+            "latencia_ahorrada_ms": round(self.latencia_ahorrada_ms, 2),
+            "invalidaciones": self.invalidaciones
+        }
+
+
+def desde_entorno(embed=None, aembed=None):
+    """Construye el cache con la configuracion de las variables de entorno. Devuelve None si esta deshabilitado."""
+    if os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() != "true":
+        return None
+    return CacheRespuestas(
+        embed=embed,
+        aembed=aembed,
+        umbral_similitud=float(os.getenv("RESPONSE_CACHE_SIMILARITY", "0.95")),
+        ttl_segundos=float(os.getenv("RESPONSE_CACHE_TTL", "3600")),
+        max_entradas=int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1000")),
+        max_bytes=int(float(os.getenv("RESPONSE_CACHE_MAX_MB", "32")) * 1024 * 1024)
+    )
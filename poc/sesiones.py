@@ -0,0 +1,266 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from presupuesto_prompt import contar_tokens, recortar
+
+"""
+Memoria de conversacion por sesion (X-Session-ID).
+Antes cada request arrancaba el grafo solo con la pregunta actual. Aca cada sesion guarda:
+
+- Ventana: los ultimos SESSION_MAX_TURNOS turnos (pregunta + respuesta), cada mensaje recortado a
+  SESSION_TOKENS_MENSAJE tokens.
+- Resumen: cuando un turno sale de la ventana se pliega en el resumen como una linea con la pregunta y la primera
+  oracion de la respuesta (recortadas). El resumen guarda las lineas mas nuevas que entran en SESSION_RESUMEN_TOKENS;
+  las mas viejas se descartan. Es extractivo, sin llamadas extra a la LLM.
+
+Asi el historial que se le agrega al prompt tiene un tope fijo de tokens sin importar cuanto dure la sesion.
+
+Backends:
+- SesionesMemoria: un proceso. OrderedDict en orden de uso, con TTL por inactividad y desalojo LRU por cantidad de
+  sesiones y por presupuesto de memoria (mismo criterio de cuenta que response_cache).
+- SesionesSQLite: las sesiones sobreviven a un reinicio y las comparten los workers de uvicorn de la misma maquina.
+"""
+
+BASE_DIR = Path(__file__).resolve().parent
+
+# Overhead aproximado por sesion y por mensaje (dicts, listas, strs) para la cuenta de memoria
+OVERHEAD_SESION = 512
+OVERHEAD_MENSAJE = 120
+# Tokens de la pregunta y de la respuesta en cada linea del resumen
+TOKENS_RESUMEN_PREGUNTA = 25
+TOKENS_RESUMEN_RESPUESTA = 40
+
+PATRON_ORACION = re.compile(r"(?<=[.!?…])\s")
+
+
+def linea_resumen(pregunta: str, respuesta: str) -> str:
+    """Una linea del resumen: la pregunta y la primera oracion de la respuesta, recortadas."""
+    respuesta = PATRON_ORACION.split(" ".join(respuesta.split()), maxsplit=1)[0]
+    return (f"- Usuario: {recortar(' '.join(pregunta.split()), TOKENS_RESUMEN_PREGUNTA)} / "
+            f"Nico: {recortar(respuesta, TOKENS_RESUMEN_RESPUESTA)}")
+
+def plegar(resumen: list, turnos: list, pregunta: str, respuesta: str, max_turnos: int, tokens_mensaje: int,
+           tokens_resumen: int) -> tuple:
+    """Agrega un turno a la ventana; los que sobran pasan al resumen. Devuelve (resumen, turnos) nuevos."""
+    turnos = turnos + [(recortar(pregunta.strip(), tokens_mensaje), recortar(respuesta.strip(), tokens_mensaje))]
+    if len(turnos) <= max_turnos:
+        return resumen, turnos
+    resumen = resumen + [linea_resumen(p, r) for p, r in turnos[:len(turnos) - max_turnos]]
+    turnos = turnos[len(turnos) - max_turnos:]
+    # Se conservan las lineas mas nuevas que entran en el presupuesto
+    usados, desde = 0, len(resumen)
+    while desde > 0 and usados + contar_tokens(resumen[desde - 1]) + 1 <= tokens_resumen:
+        desde -= 1
+        usados += contar_tokens(resumen[desde]) + 1
+    return resumen[desde:], turnos
+
+def mensajes(resumen: list, turnos: list) -> list:
+    """Historial para el campo messages del grafo (antes de la pregunta actual)."""
+    previos = [{"role": "system", "content": "Resumen de la conversacion hasta ahora:\n" + "\n".join(resumen)}] \
+        if resumen else []
+    for pregunta, respuesta in turnos:
+        previos.append({"role": "user", "content": pregunta})
+        previos.append({"role": "assistant", "content": respuesta})
+    return previos
+
+def _tamano(resumen: list, turnos: list) -> int:
+    textos = resumen + [t for turno in turnos for t in turno]
+    return OVERHEAD_SESION + OVERHEAD_MENSAJE * len(textos) + sum(len(t.encode("utf-8")) for t in textos)
+
+
+class SesionesMemoria:
+    """Sesiones en memoria con TTL por inactividad y desalojo LRU.
+    Args:
+        max_turnos (int): turnos completos que quedan en la ventana.
+        tokens_mensaje (int): tokens maximos de cada mensaje guardado.
+        tokens_resumen (int): tokens maximos del resumen.
+        ttl_segundos (float): una sesion sin requests por este tiempo se borra.
+        max_sesiones (int): sesiones maximas en memoria.
+        max_bytes (int): presupuesto de memoria aproximado.
+    """
+
+    def __init__(self, max_turnos=4, tokens_mensaje=120, tokens_resumen=200, ttl_segundos=1800,
+                 max_sesiones=10000, max_bytes=64 * 1024 * 1024):
+        self.max_turnos = max_turnos
+        self.tokens_mensaje = tokens_mensaje
+        self.tokens_resumen = tokens_resumen
+        self.ttl_segundos = ttl_segundos
+        self.max_sesiones = max_sesiones
+        self.max_bytes = max_bytes
+
+        self._lock = threading.Lock()
+        self._sesiones = OrderedDict()  # id -> {"resumen", "turnos", "visto", "bytes"} en orden de uso
+        self._bytes = 0
+        self.expiradas = 0
+        self.desalojadas = 0
+        self.turnos_resumidos = 0
+
+    def _quitar(self, sesion_id: str):
+        self._bytes -= self._sesiones.pop(sesion_id)["bytes"]
+
+    def _desalojar(self, ahora: float):
+        # La primera sesion es la menos usada: si no vencio, ninguna vencio
+        while self._sesiones:
+            sesion_id, sesion = next(iter(self._sesiones.items()))
+            if ahora - sesion["visto"] > self.ttl_segundos:
+                self.expiradas += 1
+            elif len(self._sesiones) > self.max_sesiones or self._bytes > self.max_bytes:
+                self.desalojadas += 1
+            else:
+                break
+            self._quitar(sesion_id)
+
+    def mensajes(self, sesion_id: str, ahora: float = None) -> list:
+        """Historial de la sesion (resumen + ventana) como mensajes, o [] si no existe o vencio."""
+        ahora = time.time() if ahora is None else ahora
+        with self._lock:
+            self._desalojar(ahora)
+            sesion = self._sesiones.get(sesion_id)
+            if sesion is None:
+                return []
+            self._sesiones.move_to_end(sesion_id)
+            sesion["visto"] = ahora
+            return mensajes(sesion["resumen"], sesion["turnos"])
+
+    def agregar(self, sesion_id: str, pregunta: str, respuesta: str, ahora: float = None):
+        """Registra un turno de la sesion."""
+        ahora = time.time() if ahora is None else ahora
+        with self._lock:
+            sesion = self._sesiones.pop(sesion_id, None)
+            if sesion is not None:
+                self._bytes -= sesion["bytes"]
+            resumen, turnos = (sesion["resumen"], sesion["turnos"]) if sesion else ([], [])
+            en_resumen = len(turnos) + 1 - self.max_turnos
+            resumen, turnos = plegar(resumen, turnos, pregunta, respuesta, self.max_turnos,
+                                     self.tokens_mensaje, self.tokens_resumen)
+            self.turnos_resumidos += max(0, en_resumen)
+            tamano = _tamano(resumen, turnos)
+            self._sesiones[sesion_id] = {"resumen": resumen, "turnos": turnos, "visto": ahora, "bytes": tamano}
+            self._bytes += tamano
+            self._desalojar(ahora)
+
+    def borrar(self, sesion_id: str):
+        with self._lock:
+            if sesion_id in self._sesiones:
+                self._quitar(sesion_id)
+
+    def __len__(self):
+        return len(self._sesiones)
+
+    def stats(self) -> dict:
+        return {
+            "backend": "memory",
+            "sesiones": len(self._sesiones),
+            "bytes": self._bytes,
+            "expiradas": self.expiradas,
+            "desalojadas": self.desalojadas,
+            "turnos_resumidos": self.turnos_resumidos
+        }
+
+
+class SesionesSQLite:
+    """Sesiones en un archivo SQLite (WAL), compartidas entre procesos.
+    Args:
+        path (str|Path): archivo de la base.
+        max_turnos, tokens_mensaje, tokens_resumen, ttl_segundos, max_sesiones: como en SesionesMemoria.
+        intervalo_limpieza (int): cada cuantos turnos se borran las sesiones vencidas y las que sobran.
+    """
+
+    def __init__(self, path, max_turnos=4, tokens_mensaje=120, tokens_resumen=200, ttl_segundos=1800,
+                 max_sesiones=10000, intervalo_limpieza=200):
+        self.path = str(path)
+        self.max_turnos = max_turnos
+        self.tokens_mensaje = tokens_mensaje
+        self.tokens_resumen = tokens_resumen
+        self.ttl_segundos = ttl_segundos
+        self.max_sesiones = max_sesiones
+        self.intervalo_limpieza = intervalo_limpieza
+        self._local = threading.local()
+        self._agregados = 0
+        con = self._conexion()
+        con.execute("CREATE TABLE IF NOT EXISTS sesiones (id TEXT PRIMARY KEY, resumen TEXT, turnos TEXT, visto REAL)")
+        con.execute("CREATE INDEX IF NOT EXISTS sesiones_visto ON sesiones (visto)")
+
+    def _conexion(self) -> sqlite3.Connection:
+        # Una conexion por thread (sqlite3 no comparte conexiones entre threads)
+        con = getattr(self._local, "con", None)
+        if con is None:
+            con = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute("PRAGMA synchronous=NORMAL")
+            self._local.con = con
+        return con
+
+    def _leer(self, con, sesion_id: str, ahora: float):
+        fila = con.execute("SELECT resumen, turnos FROM sesiones WHERE id = ? AND visto >= ?",
+                           (sesion_id, ahora - self.ttl_segundos)).fetchone()
+        if fila is None:
+            return [], []
+        return json.loads(fila[0]), [tuple(t) for t in json.loads(fila[1])]
+
+    def mensajes(self, sesion_id: str, ahora: float = None) -> list:
+        ahora = time.time() if ahora is None else ahora
+        con = self._conexion()
+        resumen, turnos = self._leer(con, sesion_id, ahora)
+        if turnos:
+            con.execute("UPDATE sesiones SET visto = ? WHERE id = ?", (ahora, sesion_id))
+        return mensajes(resumen, turnos)
+
+    def agregar(self, sesion_id: str, pregunta: str, respuesta: str, ahora: float = None):
+        ahora = time.time() if ahora is None else ahora
+        con = self._conexion()
+        # BEGIN IMMEDIATE: leer y reescribir la sesion es atomico entre procesos
+        con.execute("BEGIN IMMEDIATE")
+        try:
+            resumen, turnos = self._leer(con, sesion_id, ahora)
+            resumen, turnos = plegar(resumen, turnos, pregunta, respuesta, self.max_turnos,
+                                     self.tokens_mensaje, self.tokens_resumen)
+            con.execute(
+                "INSERT INTO sesiones (id, resumen, turnos, visto) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET resumen = excluded.resumen, turnos = excluded.turnos, "
+                "visto = excluded.visto",
+                (sesion_id, json.dumps(resumen, ensure_ascii=False), json.dumps(turnos, ensure_ascii=False), ahora)
+            )
+            self._agregados += 1
+            if self._agregados % self.intervalo_limpieza == 0:
+                con.execute("DELETE FROM sesiones WHERE visto < ?", (ahora - self.ttl_segundos,))
+                con.execute("DELETE FROM sesiones WHERE id NOT IN "
+                            "(SELECT id FROM sesiones ORDER BY visto DESC LIMIT ?)", (self.max_sesiones,))
+            con.execute("COMMIT")
+        except Exception:
+            con.execute("ROLLBACK")
+            raise
+
+    def borrar(self, sesion_id: str):
+        self._conexion().execute("DELETE FROM sesiones WHERE id = ?", (sesion_id,))
+
+    def __len__(self):
+        return self._conexion().execute("SELECT COUNT(*) FROM sesiones").fetchone()[0]
+
+    def stats(self) -> dict:
+        sesiones, bytes_ = self._conexion().execute(
+            "SELECT COUNT(*), COALESCE(SUM(LENGTH(resumen) + LENGTH(turnos)), 0) FROM sesiones").fetchone()
+        return {"backend": "sqlite", "sesiones": sesiones, "bytes": bytes_}
+
+
+def desde_entorno():
+    """Sesiones segun SESSION_BACKEND: memory (por defecto) o sqlite. Devuelve None si SESSION_ENABLED=false."""
+    if os.getenv("SESSION_ENABLED", "true").lower() != "true":
+        return None
+    config = {
+        "max_turnos": int(os.getenv("SESSION_MAX_TURNOS", "4")),
+        "tokens_mensaje": int(os.getenv("SESSION_TOKENS_MENSAJE", "120")),
+        "tokens_resumen": int(os.getenv("SESSION_RESUMEN_TOKENS", "200")),
+        "ttl_segundos": float(os.getenv("SESSION_TTL", "1800")),
+        "max_sesiones": int(os.getenv("SESSION_MAX_SESSIONS", "10000")),
+    }
+    if os.getenv("SESSION_BACKEND", "memory").lower() == "sqlite":
+        path = os.getenv("SESSION_SQLITE_PATH", str(BASE_DIR / ".cache" / "sesiones.sqlite"))
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        return SesionesSQLite(path, **config)
+    return SesionesMemoria(max_bytes=int(float(os.getenv("SESSION_MAX_MB", "64")) * 1024 * 1024), **config)
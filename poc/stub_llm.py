@@ -0,0 +1,149 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+"""
+Servidor HTTP local que imita la API de OpenAI (chat completions y embeddings).
+Se usa en los benchmarks para medir el grafo y la API sin gastar tokens ni depender de la red.
+Responde con latencia fija configurable para simular la espera de la LLM.
+Si el pedido trae stream=true, devuelve la respuesta de a tokens como hace la API real (SSE).
+Tambien responde /query con el formato de Pinecone y cuenta las conexiones TCP nuevas que recibe,
+para medir cuanto se reusan las conexiones (keep-alive).
+"""
+
+# Respuesta que sirve tanto para el detector (json valido) como para el response_node (texto).
+RESPUESTA_STUB = json.dumps({
+    "tipo": "factual",
+    "topic": "trabajo",
+    "emotion": "others",
+    "skills": ["python"],
+    "empresa": None,
+    "rango_temporal": None,
+    "conector_temporal": None
+})
+
+
+class ServidorStub(ThreadingHTTPServer):
+    """ThreadingHTTPServer que cuenta cada conexion TCP aceptada."""
+    daemon_threads = True
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.conexiones = 0
+        self._lock = threading.Lock()
+
+    def process_request(self, request, client_address):
+        with self._lock:
+            self.conexiones += 1
+        super().process_request(request, client_address)
+
+
+class StubLLMHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 para que los clientes puedan mantener la conexion abierta (keep-alive)
+    protocol_version = "HTTP/1.1"
+    latencia_llm_ms = 300
+    latencia_embedding_ms = 50
+    latencia_token_ms = 10
+    dimension = 1536
+
+    def log_message(self, format, *args):
+        pass
+
+    def _responder(self, cuerpo: dict):
+        data = json.dumps(cuerpo).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _responder_stream(self, pedido: dict):
+        """Manda la respuesta como chunks SSE, un token (palabra) por evento."""
+        # Sin Content-Length, el fin de la respuesta se marca cerrando la conexion
+        self.close_connection = True
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        tokens = [t + " " for t in RESPUESTA_STUB.split(" ")]
+        for i, token in enumerate(tokens + [None]):
+            chunk = {
+                "id": "chatcmpl-stub",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": pedido.get("model", "stub"),
+                "choices": [{
+                    "index": 0,
+                    "delta": {"content": token} if token is not None else {},
+                    "finish_reason": None if token is not None else "stop"
+                }]
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+            if token is not None:
+                time.sleep(self.latencia_token_ms / 1000)
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+    def do_POST(self):
+        largo = int(self.headers.get("Content-Length", 0))
+        pedido = json.loads(self.rfile.read(largo) or b"{}")
+
+        if self.path.endswith("/embeddings"):
+            time.sleep(self.latencia_embedding_ms / 1000)
+            entradas = pedido.get("input", [])
+            entradas = entradas if isinstance(entradas, list) else [entradas]
+            self._responder({
+                "object": "list",
+                "model": pedido.get("model", "stub"),
+                "data": [
+                    {"object": "embedding", "index": i, "embedding": [0.0] * self.dimension}
+                    for i in range(len(entradas))
+                ],
+                "usage": {"prompt_tokens": 0, "total_tokens": 0}
+            })
+            return
+
+        if self.path.endswith("/query"):
+            time.sleep(self.latencia_embedding_ms / 1000)
+            self._responder({
+                "matches": [{
+                    "id": "0-python",
+                    "score": 0.9,
+                    "values": [],
+                    "metadata": {"empresa": "Meton", "rol": "AI Engineer", "periodo": "2023-2024", "skill": "python"}
+                }],
+                "namespace": "",
+                "usage": {"readUnits": 1}
+            })
+            return
+
+        time.sleep(self.latencia_llm_ms / 1000)
+        if pedido.get("stream"):
+            self._responder_stream(pedido)
+            return
+        self._responder({
+            "id": "chatcmpl-stub",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": pedido.get("model", "stub"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": RESPUESTA_STUB},
+                "finish_reason": "stop"
+            }],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+        })
+
+
+def levantar_stub_llm(latencia_llm_ms: float = 300, latencia_embedding_ms: float = 50, handler=StubLLMHandler):
+    """Levanta el stub en un thread daemon en un puerto libre.
+    Devuelve (servidor, base_url) con base_url listo para OPENAI_BASE_URL."""
+    handler = type("Handler", (handler,), {
+        "latencia_llm_ms": latencia_llm_ms,
+        "latencia_embedding_ms": latencia_embedding_ms
+    })
+    servidor = ServidorStub(("127.0.0.1", 0), handler)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor, f"http://127.0.0.1:{servidor.server_address[1]}/v1"
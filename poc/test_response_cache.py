@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+import response_cache
+from response_cache import CacheRespuestas
+
+"""
+Casos borde del cache de respuestas con entradas vencidas (python -m pytest test_response_cache.py).
+"""
+
+VECTORES = {
+    "sabes python": [1.0, 0.0, 0.0],
+    "sabes python che": [1.0, 0.0, 0.0],
+    "hiciste python": [0.95, 0.312, 0.0],
+    "programas en python": [0.93, -0.368, 0.0],
+}
+
+
+@pytest.fixture
+def reloj(monkeypatch):
+    ahora = [1000.0]
+    monkeypatch.setattr(response_cache.time, "monotonic", lambda: ahora[0])
+    return ahora
+
+
+def nuevo_cache(llamadas: list) -> CacheRespuestas:
+    def embed(pregunta):
+        llamadas.append(pregunta)
+        return np.array(VECTORES[response_cache.normalizar_pregunta(pregunta)])
+    return CacheRespuestas(embed=embed, umbral_similitud=0.9, ttl_segundos=60, archivos_fuente=())
+
+
+def test_entrada_vencida_se_vuelve_a_guardar_con_embedding(reloj):
+    llamadas = []
+    cache = nuevo_cache(llamadas)
+    assert cache.buscar("¿Sabés Python?") is None
+    cache.guardar("¿Sabés Python?", "si")
+
+    reloj[0] += 61
+    llamadas.clear()
+    assert cache.buscar("¿Sabés Python?") is None
+    assert llamadas == ["¿Sabés Python?"]  # la clave existe pero vencio: se calcula el embedding
+    cache.guardar("¿Sabés Python?", "si, de nuevo")
+
+    assert cache._entradas["sabes python"]["slot"] is not None
+    assert cache.buscar("Sabés Python, che") == "si, de nuevo"
+    assert cache.hits_semanticos == 1
+
+
+def test_mejor_candidato_vencido_no_tapa_al_segundo(reloj):
+    cache = nuevo_cache([])
+    cache.buscar("¿Hiciste Python?")
+    cache.guardar("¿Hiciste Python?", "viejo")
+    reloj[0] += 30
+    cache.buscar("¿Programás en Python?")
+    cache.guardar("¿Programás en Python?", "vigente")
+
+    # "hiciste python" es el mas parecido pero ya vencio; "programas en python" sigue vigente y supera el umbral
+    reloj[0] += 40
+    assert cache.buscar("Sabés Python") == "vigente"
+    assert cache.hits_semanticos == 1
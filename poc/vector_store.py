@@ -0,0 +1,264 @@
+import json
+import os
+from pathlib import Path
+import numpy as np
+
+
+"""
+Indice vectorial local, en proceso, que reemplaza a Pinecone para el factual_node.
+El corpus factual son unas decenas de vectores (un skill por empresa), asi que ir a un servicio remoto
+en cada turno solo agrega un round-trip de red y hace imposible probar sin conexion.
+
+- IndiceLocal: matriz float32 normalizada y coseno por fuerza bruta. Ideal para corpus chicos.
+- IndiceIVF: misma interfaz, con k-means sobre los vectores (listas invertidas). Solo se comparan
+  los vectores de las `nprobe` listas mas cercanas a la consulta. Para corpus grandes.
+
+Ambos responden igual que Pinecone (`results.matches` con `.id`, `.score` y `.metadata`) y aceptan los
+mismos filtros de metadata que arma filtros_factual: `$eq`, `$ne`, `$in`, `$nin` (y `$and`/`$or`).
+Si el campo de metadata es una lista, el filtro se cumple si alguno de sus elementos coincide.
+
+En disco el indice es una carpeta con `vectores.npy` (se puede abrir memory-mapped) y `metadata.jsonl`
+(una linea por vector con su id y su metadata).
+"""
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+DEFAULT_DIR = BASE_DIR / "data_ing" / "Factica" / "db_personality" / "factual_index"
+
+# Por encima de esta cantidad de vectores el backend "auto" usa IVF
+IVF_MIN_VECTORES = int(os.getenv("VECTOR_IVF_MIN", "20000"))
+
+
+class Match:
+    def __init__(self, id: str, score: float, metadata: dict = None):
+        self.id = id
+        self.score = score
+        self.metadata = metadata
+
+    def __repr__(self):
+        return f"Match(id={self.id!r}, score={self.score:.4f})"
+
+
+class ResultadoQuery:
+    def __init__(self, matches: list):
+        self.matches = matches
+
+
+def _normalizar_filas(vectores: np.ndarray) -> np.ndarray:
+    normas = np.linalg.norm(vectores, axis=1, keepdims=True)
+    normas[normas == 0] = 1.0
+    return (vectores / normas).astype(np.float32)
+
+
+class IndiceLocal:
+    """Indice de coseno por fuerza bruta sobre una matriz en memoria (o memory-mapped).
+    Args:
+        vectores (np.ndarray): matriz (n, dim). Se normaliza salvo que normalizados=True.
+        ids (list): id de cada fila.
+        metadatas (list): metadata de cada fila (dict).
+        normalizados (bool): True si las filas ya tienen norma 1 (ej: leidas de un snapshot).
+    """
+
+    def __init__(self, vectores, ids: list, metadatas: list = None, normalizados: bool = False):
+        vectores = np.asarray(vectores, dtype=np.float32)
+        if vectores.ndim != 2 or vectores.shape[0] != len(ids):
+            raise ValueError(f"Se esperaba una matriz de {len(ids)} filas, llego {vectores.shape}")
+        self.vectores = vectores if normalizados else _normalizar_filas(vectores)
+        self.ids = list(ids)
+        self.metadatas = list(metadatas) if metadatas is not None else [{} for _ in ids]
+        self._invertido = self._indexar_metadata()
+
+    # ---------- filtros ----------
+    def _indexar_metadata(self) -> dict:
+        """campo -> valor -> array de filas. Los campos lista indexan cada elemento."""
+        invertido = {}
+        for fila, metadata in enumerate(self.metadatas):
+            for campo, valor in (metadata or {}).items():
+                valores = valor if isinstance(valor, list) else [valor]
+                por_valor = invertido.setdefault(campo, {})
+                for v in valores:
+                    if isinstance(v, (str, int, float, bool)):
+                        por_valor.setdefault(v, []).append(fila)
+        return {campo: {v: np.unique(filas) for v, filas in por_valor.items()}
+                for campo, por_valor in invertido.items()}
+
+    def _filas_con(self, campo: str, valores) -> np.ndarray:
+        mascara = np.zeros(len(self.ids), dtype=bool)
+        por_valor = self._invertido.get(campo, {})
+        for v in valores:
+            filas = por_valor.get(v)
+            if filas is not None:
+                mascara[filas] = True
+        return mascara
+
+    def mascara_filtro(self, filtro: dict) -> np.ndarray:
+        """Mascara booleana de las filas que cumplen el filtro (sintaxis de Pinecone)."""
+        mascara = np.ones(len(self.ids), dtype=bool)
+        for campo, condicion in (filtro or {}).items():
+            if campo == "$and":
+                for sub in condicion:
+                    mascara &= self.mascara_filtro(sub)
+                continue
+            if campo == "$or":
+                alguna = np.zeros(len(self.ids), dtype=bool)
+                for sub in condicion:
+                    alguna |= self.mascara_filtro(sub)
+                mascara &= alguna
+                continue
+            if not isinstance(condicion, dict):
+                condicion = {"$eq": condicion}
+            for operador, valor in condicion.items():
+                if operador == "$eq":
+                    mascara &= self._filas_con(campo, [valor])
+                elif operador == "$ne":
+                    mascara &= ~self._filas_con(campo, [valor])
+                elif operador == "$in":
+                    mascara &= self._filas_con(campo, valor)
+                elif operador == "$nin":
+                    mascara &= ~self._filas_con(campo, valor)
+                else:
+                    raise ValueError(f"Operador de filtro no soportado: {operador}")
+        return mascara
+
+    # ---------- busqueda ----------
+    def _candidatos(self, q: np.ndarray, mascara):
+        """Filas a comparar contra la consulta (None significa todas). `mascara` es el filtro de metadata o None."""
+        return None if mascara is None else np.flatnonzero(mascara)
+
+    def _top_k(self, q: np.ndarray, filas, top_k: int):
+        if filas is None:
+            scores = self.vectores @ q
+            filas = np.arange(len(self.ids))
+        else:
+            if len(filas) == 0:
+                return [], []
+            scores = self.vectores[filas] @ q
+        k = min(top_k, len(filas))
+        mejores = np.argpartition(-scores, k - 1)[:k] if k < len(filas) else np.arange(len(filas))
+        mejores = mejores[np.argsort(-scores[mejores], kind="stable")]
+        return filas[mejores], scores[mejores]
+
+    def query(self, vector, top_k: int = 10, include_metadata: bool = True, filter: dict = None, **kwargs):
+        """Misma firma que Index.query de Pinecone (los kwargs extra se ignoran)."""
+        if not self.ids:
+            return ResultadoQuery([])
+        q = np.asarray(vector, dtype=np.float32)
+        norma = np.linalg.norm(q)
+        q = q / norma if norma > 0 else q
+
+        mascara = self.mascara_filtro(filter) if filter else None
+        filas, scores = self._top_k(q, self._candidatos(q, mascara), top_k)
+        return ResultadoQuery([
+            Match(self.ids[f], float(s), self.metadatas[f] if include_metadata else None)
+            for f, s in zip(filas, scores)
+        ])
+
+    def __len__(self):
+        return len(self.ids)
+
+    # ---------- persistencia ----------
+    def guardar(self, directorio=DEFAULT_DIR):
+        """Escribe vectores.npy (normalizados) y metadata.jsonl en `directorio`.
+        Cada archivo se escribe en un temporal y se reemplaza con os.replace (metadata.jsonl ultimo): un proceso
+        que tiene el snapshot anterior memory-mapped lo sigue leyendo entero, y nunca se ven archivos a medias."""
+        directorio = Path(directorio)
+        directorio.mkdir(parents=True, exist_ok=True)
+        temporal = directorio / "vectores.npy.tmp"
+        with open(temporal, "wb") as f:
+            np.save(f, np.asarray(self.vectores, dtype=np.float32))
+        os.replace(temporal, directorio / "vectores.npy")
+        temporal = directorio / "metadata.jsonl.tmp"
+        with open(temporal, "w", encoding="utf-8") as f:
+            for id_, metadata in zip(self.ids, self.metadatas):
+                f.write(json.dumps({"id": id_, "metadata": metadata}, ensure_ascii=False) + "\n")
+        os.replace(temporal, directorio / "metadata.jsonl")
+
+    @classmethod
+    def cargar(cls, directorio=DEFAULT_DIR, mmap: bool = False, **kwargs):
+        """Lee un indice escrito por guardar(). Con mmap=True la matriz queda memory-mapped."""
+        directorio = Path(directorio)
+        vectores = np.load(directorio / "vectores.npy", mmap_mode="r" if mmap else None)
+        ids, metadatas = [], []
+        with open(directorio / "metadata.jsonl", "r", encoding="utf-8") as f:
+            for linea in f:
+                if linea.strip():
+                    registro = json.loads(linea)
+                    ids.append(registro["id"])
+                    metadatas.append(registro.get("metadata", {}))
+        return cls(vectores, ids, metadatas, normalizados=True, **kwargs)
+
+    @classmethod
+    def desde_vectores(cls, vectores: list, **kwargs):
+        """Construye el indice desde la lista de dicts {"id", "values", "metadata"} que se sube a Pinecone."""
+        return cls(
+            np.array([v["values"] for v in vectores], dtype=np.float32),
+            [v["id"] for v in vectores],
+            [v.get("metadata", {}) for v in vectores],
+            **kwargs
+        )
+
+
+class IndiceIVF(IndiceLocal):
+    """Indice de listas invertidas: k-means sobre los vectores normalizados y busqueda solo en las
+    `nprobe` listas mas cercanas a la consulta. Los filtros de metadata se aplican sobre los candidatos.
+    Args:
+        n_listas (int): cantidad de centroides. Por defecto ~sqrt(n).
+        nprobe (int): listas a recorrer por consulta (mas listas, mas recall y mas latencia).
+        iteraciones (int): iteraciones de k-means.
+    """
+
+    def __init__(self, vectores, ids: list, metadatas: list = None, normalizados: bool = False,
+                 n_listas: int = None, nprobe: int = 8, iteraciones: int = 10, semilla: int = 0):
+        super().__init__(vectores, ids, metadatas, normalizados=normalizados)
+        n = len(self.ids)
+        self.n_listas = max(1, min(n_listas or int(np.sqrt(n)), n))
+        self.nprobe = min(nprobe, self.n_listas)
+        self._entrenar(iteraciones, semilla)
+
+    def _entrenar(self, iteraciones: int, semilla: int):
+        n = len(self.ids)
+        if n == 0:
+            self.centroides = np.zeros((0, self.vectores.shape[1]), dtype=np.float32)
+            self.listas = []
+            return
+        rng = np.random.default_rng(semilla)
+        # Se entrena sobre una muestra para que el costo no crezca con el corpus
+        muestra = self.vectores[np.sort(rng.choice(n, size=min(n, 256 * self.n_listas), replace=False))]
+        centroides = muestra[rng.choice(len(muestra), size=self.n_listas, replace=False)].copy()
+        for _ in range(iteraciones):
+            asignacion = np.argmax(muestra @ centroides.T, axis=1)
+            for c in range(self.n_listas):
+                miembros = muestra[asignacion == c]
+                if len(miembros):
+                    centroides[c] = miembros.mean(axis=0)
+            centroides = _normalizar_filas(centroides)
+        self.centroides = centroides
+
+        # Asignacion final del corpus completo, por bloques para acotar memoria
+        asignacion = np.empty(n, dtype=np.int64)
+        for inicio in range(0, n, 65536):
+            bloque = np.asarray(self.vectores[inicio:inicio + 65536])
+            asignacion[inicio:inicio + len(bloque)] = np.argmax(bloque @ centroides.T, axis=1)
+        orden = np.argsort(asignacion, kind="stable")
+        cortes = np.searchsorted(asignacion[orden], np.arange(self.n_listas + 1))
+        self.listas = [orden[cortes[c]:cortes[c + 1]] for c in range(self.n_listas)]
+
+    def _candidatos(self, q: np.ndarray, mascara):
+        if not self.listas:
+            return super()._candidatos(q, mascara)
+        # Un filtro selectivo deja menos filas que las listas a recorrer: se comparan todas, exacto
+        esperadas = len(self.ids) * self.nprobe / self.n_listas
+        if mascara is not None and np.count_nonzero(mascara) <= esperadas:
+            return np.flatnonzero(mascara)
+        sims = self.centroides @ q
+        cercanas = np.argpartition(-sims, self.nprobe - 1)[:self.nprobe] if self.nprobe < self.n_listas \
+            else np.arange(self.n_listas)
+        filas = np.sort(np.concatenate([self.listas[c] for c in cercanas]))
+        return filas if mascara is None else filas[mascara[filas]]
+
+def cargar_indice(directorio=DEFAULT_DIR, backend: str = "auto", mmap: bool = True):
+    """Abre el snapshot local con el backend pedido: "local" (fuerza bruta), "ivf" o "auto"."""
+    indice = IndiceLocal.cargar(directorio, mmap=mmap)
+    if backend == "ivf" or (backend == "auto" and len(indice) >= IVF_MIN_VECTORES):
+        return IndiceIVF(indice.vectores, indice.ids, indice.metadatas, normalizados=True,
+                         nprobe=int(os.getenv("VECTOR_IVF_NPROBE", "8")))
+    return indice